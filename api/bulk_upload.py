@@ -0,0 +1,41 @@
+from typing import Dict, Iterable
+
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import as_serializer_error
+
+from core.product_bulk import create_products
+
+from .models import Product
+from .serializers import ProductWithCategoryPathSerializer
+from .utils_hierarchy import CategoryPathResolver
+
+
+def bulk_upload_products(items: Iterable, batch_size: int = 1000) -> Dict[str, list]:
+    """Validate, resolve and insert a whole upload in a few batched steps.
+
+    1. every item is validated with one shared serializer instance;
+    2. all category paths are resolved at once, creating missing nodes in bulk;
+    3. products and their category links are written with ``bulk_create``.
+
+    Invalid items are reported by index and skipped; the valid ones are written
+    in one transaction. Returns dict with created_ids and errors.
+    """
+    serializer = ProductWithCategoryPathSerializer()
+    valid, errors = [], []
+    for idx, item in enumerate(items):
+        try:
+            valid.append(serializer.run_validation(item))
+        except ValidationError as exc:
+            errors.append({"index": idx, "errors": as_serializer_error(exc)})
+    if not valid:
+        return {"created_ids": [], "errors": errors}
+
+    with transaction.atomic():
+        category_ids = CategoryPathResolver().resolve_many(data["category_path"] for data in valid)
+        entries = []
+        for data in valid:
+            path = tuple(data.pop("category_path"))
+            entries.append((Product(**data), [category_ids[path]]))
+        products = create_products(entries, batch_size=batch_size)
+    return {"created_ids": [p.pk for p in products], "errors": errors}
@@ -1,6 +1,11 @@
 from rest_framework import serializers
 from django.db import transaction
+from core.inventory import reserve_stock
+from core.orders import create_order_items
+from core.serializers import ProductImportSerializer
+
 from .models import Category, Product, Order, OrderItem
+from .utils_hierarchy import CategoryPathResolver
 
 class CategorySerializer(serializers.ModelSerializer):
     parent = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all(), allow_null=True, required=False)
@@ -18,17 +23,13 @@ class ProductSerializer(serializers.ModelSerializer):
         model = Product
         fields = ["id", "name", "description", "price", "category", "stock_quantity"]
 
-class ProductWithCategoryPathSerializer(serializers.Serializer):
-    name = serializers.CharField()
-    description = serializers.CharField(required=False, allow_blank=True)
-    price = serializers.DecimalField(max_digits=10, decimal_places=2)
-    stock_quantity = serializers.IntegerField(required=False, min_value=0, default=0)
-    category_path = serializers.ListField(child=serializers.CharField(), allow_empty=False)
+class ProductWithCategoryPathSerializer(ProductImportSerializer):
 
     def create(self, validated_data):
+        """Pass ``category_resolver`` in the context to share one resolver across a bulk upload."""
         path = validated_data.pop("category_path")
-        category = get_or_create_category_by_path(path)
-        return Product.objects.create(category=category, **validated_data)
+        resolver = self.context.get("category_resolver") or CategoryPathResolver()
+        return Product.objects.create(category_id=resolver.resolve(path), **validated_data)
 
 class OrderItemWriteSerializer(serializers.ModelSerializer):
     class Meta:
@@ -37,16 +38,13 @@ class OrderItemWriteSerializer(serializers.ModelSerializer):
 
 class OrderItemReadSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source="product.name", read_only=True)
-    price = serializers.DecimalField(source="product.price", max_digits=10, decimal_places=2, read_only=True)
-    total_price = serializers.SerializerMethodField()
+    price = serializers.DecimalField(source="unit_price", max_digits=10, decimal_places=2, read_only=True)
+    total_price = serializers.DecimalField(source="line_total", max_digits=12, decimal_places=2, read_only=True)
 
     class Meta:
         model = OrderItem
         fields = ["id", "product", "product_name", "price", "quantity", "total_price"]
 
-    def get_total_price(self, obj):
-        return obj.product.price * obj.quantity
-
 class OrderSerializer(serializers.ModelSerializer):
     items = OrderItemWriteSerializer(many=True)
     total_price = serializers.SerializerMethodField(read_only=True)
@@ -57,14 +55,13 @@ class OrderSerializer(serializers.ModelSerializer):
         read_only_fields = ["customer", "created_at", "status", "total_price"]
 
     def get_total_price(self, obj):
-        return sum(item.product.price * item.quantity for item in obj.items.select_related("product"))
+        return obj.total_amount
 
     @transaction.atomic
     def create(self, validated_data):
         items_data = validated_data.pop("items")
+        reserve_stock((item["product"].pk, item["quantity"]) for item in items_data)
         customer = self.context["request"].user
         order = Order.objects.create(customer=customer)
-        OrderItem.objects.bulk_create([
-            OrderItem(order=order, **item) for item in items_data
-        ])
+        create_order_items(order, [(item["product"].pk, item["quantity"]) for item in items_data])
         return order
\ No newline at end of file
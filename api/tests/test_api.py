@@ -3,12 +3,20 @@ import csv
 from decimal import Decimal
 from unittest.mock import patch
 
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth.models import User
-from rest_framework.test import APITestCase, APIClient
+from rest_framework.test import APITestCase, APIClient, APIRequestFactory, force_authenticate
 from rest_framework import status
 
-from api.models import Category, Product, Order
+from api.bulk_upload import bulk_upload_products
+from api.csv_upload import import_products_csv
+from api.models import Category, Customer, Product, Order
+from api.views import OrderViewSet
+from api.utils_hierarchy import CategoryPathResolver, get_descendant_ids
+from core.orders import create_order_items
 
 
 class BaseAuthMixin:
@@ -85,6 +93,153 @@ class ProductAveragePriceTests(APITestCase):
         self.assertAlmostEqual(Decimal(str(res.data["average_price"])), Decimal("3.00"))
 
 
+class DescendantIdsTests(APITestCase):
+    def setUp(self):
+        self.root = Category.objects.create(name="All Products")
+        bakery = Category.objects.create(name="Bakery", parent=self.root)
+        bread = Category.objects.create(name="Bread", parent=bakery)
+        produce = Category.objects.create(name="Produce", parent=self.root)
+        self.expected = {self.root.id, bakery.id, bread.id, produce.id}
+        self.bakery_ids = {bakery.id, bread.id}
+        self.bakery = bakery
+        Category.objects.create(name="Other Tree")
+
+    def test_descendants_served_from_tree_snapshot(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(get_descendant_ids(self.root.id), self.expected)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_descendant_ids(self.bakery.id), self.bakery_ids)
+
+    def test_unknown_root_returns_itself(self):
+        self.assertEqual(get_descendant_ids(999999), {999999})
+
+
+class CategoryPathResolverTests(APITestCase):
+    def setUp(self):
+        root = Category.objects.create(name="All Products")
+        self.bakery = Category.objects.create(name="Bakery", parent=root)
+
+    def test_known_paths_resolve_without_queries(self):
+        resolver = CategoryPathResolver()
+        with self.assertNumQueries(0):
+            for _ in range(100):
+                self.assertEqual(resolver.resolve(["All Products", "Bakery"]), self.bakery.id)
+
+    def test_missing_nodes_created_once_and_tree_stays_consistent(self):
+        resolver = CategoryPathResolver()
+        ids = resolver.resolve_many([
+            ["All Products", "Bakery", "Bread"],
+            ["All Products", "Bakery", "Cakes"],
+            ["All Products", "Produce", "Fruits"],
+            ["All Products", "Produce", "Fruits"],
+            ["Seasonal", "Winter"],
+        ])
+        self.assertEqual(len(ids), 4)
+        self.assertEqual(Category.objects.filter(name="Produce").count(), 1)
+        bread = Category.objects.get(id=ids[("All Products", "Bakery", "Bread")])
+        self.assertEqual(bread.parent_id, self.bakery.id)
+        self.assertEqual(
+            set(Category.objects.get(name="All Products").get_descendants().values_list("name", flat=True)),
+            {"Bakery", "Bread", "Cakes", "Produce", "Fruits"},
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(resolver.resolve(["Seasonal", "Winter"]), ids[("Seasonal", "Winter")])
+
+
+class BulkUploadTests(APITestCase):
+    def setUp(self):
+        cache.clear()  # category snapshot and generations from earlier tests
+
+    def _items(self, count):
+        return [
+            {"name": f"Item {i}", "price": "2.00", "category_path": ["All Products", f"Aisle {i % 3}"]}
+            for i in range(count)
+        ]
+
+    def test_valid_items_created_and_errors_keep_their_index(self):
+        items = self._items(4)
+        items.insert(2, {"name": "No price", "category_path": ["All Products"]})
+        result = bulk_upload_products(items)
+        self.assertEqual(len(result["created_ids"]), 4)
+        self.assertEqual([e["index"] for e in result["errors"]], [2])
+        self.assertIn("price", result["errors"][0]["errors"])
+        aisle = Category.objects.get(name="Aisle 0")
+        self.assertEqual(set(aisle.products.values_list("name", flat=True)), {"Item 0", "Item 3"})
+        root = Category.objects.get(name="All Products")
+        self.assertEqual(root.price_rollup.product_count, 4)
+
+    def test_query_count_does_not_grow_with_items(self):
+        bulk_upload_products(self._items(3))  # create the categories
+        with CaptureQueriesContext(connection) as small:
+            bulk_upload_products(self._items(10))
+        # Stay within one SQLite insert batch (999 parameters / 5 columns).
+        with self.assertNumQueries(len(small)):
+            bulk_upload_products(self._items(150))
+
+
+class StreamingCSVImportTests(APITestCase):
+    def setUp(self):
+        cache.clear()  # category snapshot and generations from earlier tests
+
+    def _csv(self, rows):
+        lines = ["name,price,category_path,description,stock_quantity"]
+        lines += [",".join(row) for row in rows]
+        return BytesIO(("\n".join(lines) + "\n").encode())
+
+    def test_chunks_report_progress_and_errors(self):
+        rows = [(f"P{i}", "1.00", "All Products>Bakery", "", "1") for i in range(7)]
+        rows[3] = ("P3", "oops", "All Products>Bakery", "", "1")
+        seen = []
+        report = import_products_csv(self._csv(rows), chunk_size=3, progress=lambda r: seen.append(r["processed"]))
+        self.assertEqual(seen, [3, 6, 7])
+        self.assertEqual((report["created"], report["error_count"], report["line"]), (6, 1, 8))
+        self.assertEqual(report["errors"], [{"index": 5, "errors": {"price": ["A valid number is required."]}}])
+        self.assertEqual(Category.objects.get(name="Bakery").products.count(), 6)
+
+    def test_out_of_range_values_are_reported_per_row(self):
+        rows = [
+            ("Ok", "1.00", "All Products", "", "3"),
+            ("Negative stock", "1.00", "All Products", "", "-1"),
+            ("Huge", "123456789012", "All Products", "", ""),
+            ("Too precise", "1.234", "All Products", "", ""),
+            ("", "1.00", "All Products", "", ""),
+            ("Also ok", "2.00", "All Products", "", ""),
+            ("N" * 256, "1.00", "All Products", "", ""),
+            ("Deep", "1.00", "All Products>" + "C" * 256, "", ""),
+        ]
+        report = import_products_csv(self._csv(rows))
+        self.assertEqual((report["created"], report["error_count"]), (2, 6))
+        self.assertEqual(
+            [(e["index"], sorted(e["errors"])) for e in report["errors"]],
+            [
+                (3, ["stock_quantity"]), (4, ["price"]), (5, ["price"]), (6, ["name"]),
+                (8, ["name"]), (9, ["category_path"]),
+            ],
+        )
+        self.assertEqual(sorted(Product.objects.values_list("name", flat=True)), ["Also ok", "Ok"])
+
+    def test_upsert_updates_by_name_instead_of_duplicating(self):
+        import_products_csv(self._csv([("Bread", "2.00", "All Products>Bakery", "", "5")]))
+        report = import_products_csv(self._csv([
+            ("Bread", "3.00", "All Products>Bakery>Loaves", "Fresh", "7"),
+            ("Roll", "0.50", "All Products>Bakery", "", "9"),
+            ("Roll", "0.60", "All Products>Bakery", "", "9"),
+        ]), upsert=True)
+        self.assertEqual((report["created"], report["updated"]), (1, 2))
+        bread = Product.objects.get(name="Bread")
+        self.assertEqual((bread.price, bread.stock_quantity, bread.description), (Decimal("3.00"), 7, "Fresh"))
+        self.assertEqual(list(bread.categories.values_list("name", flat=True)), ["Loaves"])
+        self.assertEqual(Product.objects.get(name="Roll").price, Decimal("0.60"))
+        root = Category.objects.get(name="All Products")
+        self.assertEqual((root.price_rollup.product_count, root.price_rollup.price_sum), (2, Decimal("3.60")))
+
+    def test_resume_from_line(self):
+        rows = [(f"P{i}", "1.00", "All Products", "", "") for i in range(5)]
+        report = import_products_csv(self._csv(rows), start_line=5)
+        self.assertEqual(report["created"], 2)
+        self.assertEqual(sorted(Product.objects.values_list("name", flat=True)), ["P3", "P4"])
+
+
 class OrderFlowTests(APITestCase, BaseAuthMixin):
     def setUp(self):
         self.client = APIClient()
@@ -107,3 +262,43 @@ class OrderFlowTests(APITestCase, BaseAuthMixin):
         # ensure notification helpers were called
         self.assertTrue(mock_sms.called)
         self.assertTrue(mock_email.called)
+
+
+class OrderReadQueryTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="bob", password="pass")
+        self.customer = Customer.objects.create(user=self.user, name="Bob", email="bob@example.com", phone_number="+254700000003")
+        self.bread = Product.objects.create(name="Bread", price=Decimal("2.50"))
+        self.milk = Product.objects.create(name="Milk", price=Decimal("1.20"))
+        self.factory = APIRequestFactory()
+
+    def _place(self, count):
+        for _ in range(count):
+            order = Order.objects.create(customer=self.customer)
+            create_order_items(order, [(self.bread.id, 2), (self.milk.id, 1)])
+        return order
+
+    def _get(self, actions, **kwargs):
+        request = self.factory.get("/orders/")
+        force_authenticate(request, user=self.user)
+        return OrderViewSet.as_view(actions)(request, **kwargs)
+
+    def test_list_takes_two_queries_however_many_orders(self):
+        self._place(2)
+        with self.assertNumQueries(2):
+            self.assertEqual(len(self._get({"get": "list"}).data), 2)
+        self._place(3)
+        with self.assertNumQueries(2):
+            data = self._get({"get": "list"}).data
+        self.assertEqual([len(order["items"]) for order in data], [2] * 5)
+        self.assertEqual({order["total_price"] for order in data}, {Decimal("6.20")})
+
+    def test_retrieve_and_summary_take_two_queries(self):
+        order = self._place(1)
+        with self.assertNumQueries(2):
+            self.assertEqual(self._get({"get": "retrieve"}, pk=order.id).data["total_price"], Decimal("6.20"))
+        with self.assertNumQueries(2):
+            data = self._get({"get": "summary"}, pk=order.id).data
+        self.assertEqual([item["product_name"] for item in data["items"]], ["Bread", "Milk"])
+        self.assertEqual([item["total_price"] for item in data["items"]], ["5.00", "1.20"])
+        self.assertEqual(data["total_price"], Decimal("6.20"))
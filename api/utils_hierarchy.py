@@ -1,4 +1,6 @@
-from collections import deque
+from core.category_bulk import CategoryPathResolver  # noqa: F401
+from core.category_tree import get_category_tree
+
 from .models import Category
 
 
@@ -15,13 +17,12 @@ def get_or_create_category_by_path(path_names):
 
 
 def get_descendant_ids(root_id):
-    """Return a set of all descendant category IDs including the root."""
-    ids = set()
-    q = deque([root_id])
-    while q:
-        cid = q.popleft()
-        ids.add(cid)
-        for child in Category.objects.filter(parent_id=cid).values_list("id", flat=True):
-            if child not in ids:
-                q.append(child)
-    return ids
\ No newline at end of file
+    """Return a set of all descendant category IDs including the root.
+
+    Served from the worker's in-process category tree snapshot; the database
+    is only read when the tree has changed since the snapshot was built.
+    """
+    tree = get_category_tree()
+    if root_id not in tree:
+        return {root_id}
+    return set(tree.descendant_ids(root_id))
@@ -1,10 +1,13 @@
-from django.db.models import Avg
+from django.db.models import Avg, Prefetch
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 
-from .models import Category, Product, Order
+from core.category_tree import get_category_tree
+
+from .models import Category, Product, Order, OrderItem
 from .serializers import (
     CategorySerializer,
     ProductSerializer,
@@ -12,8 +15,9 @@ from .serializers import (
     OrderSerializer,
     OrderItemReadSerializer,
 )
+from .bulk_upload import bulk_upload_products
 from .permissions import IsAuthenticatedOrReadOnly
-from .utils_hierarchy import get_or_create_category_by_path, get_descendant_ids
+from .utils_hierarchy import CategoryPathResolver, get_descendant_ids
 from .utils import send_sms, send_admin_email
 
 class CategoryViewSet(viewsets.ModelViewSet):
@@ -23,8 +27,9 @@ class CategoryViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=["get"], permission_classes=[AllowAny])
     def descendants(self, request, pk=None):
-        ids = get_descendant_ids(int(pk))
-        data = CategorySerializer(Category.objects.filter(id__in=ids), many=True).data
+        tree = get_category_tree()
+        root_id = int(pk)
+        data = list(tree.nodes(tree.descendant_ids(root_id))) if root_id in tree else []
         return Response({"category": pk, "descendants": data})
 
 class ProductViewSet(viewsets.ModelViewSet):
@@ -44,17 +49,9 @@ class ProductViewSet(viewsets.ModelViewSet):
         many = isinstance(request.data, list)
         if not many:
             return Response({"detail": "Expected a JSON array."}, status=400)
-        created = []
-        errors = []
-        for idx, item in enumerate(request.data):
-            ser = ProductWithCategoryPathSerializer(data=item)
-            if ser.is_valid():
-                product = ser.save()
-                created.append(product.id)
-            else:
-                errors.append({"index": idx, "errors": ser.errors})
-        status_code = status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST
-        return Response({"created_ids": created, "errors": errors}, status=status_code)
+        result = bulk_upload_products(request.data)
+        status_code = status.HTTP_201_CREATED if result["created_ids"] else status.HTTP_400_BAD_REQUEST
+        return Response(result, status=status_code)
 
     @action(detail=False, methods=["get"], url_path="avg-price/(?P<category_id>[^/.]+)")
     def average_price(self, request, category_id=None):
@@ -68,10 +65,18 @@ class ProductViewSet(viewsets.ModelViewSet):
         return Response({"category_id": root_id, "average_price": avg_price})
 
 class OrderViewSet(viewsets.ModelViewSet):
-    queryset = Order.objects.prefetch_related("items__product").all()
+    queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_queryset(self):
+        # Totals are stored on the order and its items, so a read is the orders
+        # plus one prefetch of all their items (with products for the summary).
+        items = OrderItem.objects.order_by("id")
+        if self.action == "summary":
+            items = items.select_related("product")
+        return Order.objects.select_related("customer").prefetch_related(Prefetch("items", queryset=items))
+
     def perform_create(self, serializer):
         order = serializer.save()
         # notify customer and admin
@@ -87,16 +92,14 @@ class OrderViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=["get"], permission_classes=[IsAuthenticated])
     def summary(self, request, pk=None):
         order = self.get_object()
-        items = OrderItemReadSerializer(order.items.select_related("product"), many=True).data
+        items = OrderItemReadSerializer(order.items.all(), many=True).data
         return Response({
             "order_id": order.id,
             "customer": getattr(order.customer, "username", str(order.customer)),
             "created_at": order.created_at,
             "status": order.status,
             "items": items,
-            "total_price": sum([i["price"] * i["quantity"] for i in [
-                {"price": item.product.price, "quantity": item.quantity} for item in order.items.all()
-            ]])
+            "total_price": order.total_amount,
         })
 
     class ProductViewSet(viewsets.ModelViewSet):
@@ -113,8 +116,9 @@ class OrderViewSet(viewsets.ModelViewSet):
                 return Response({"detail": "Expected a JSON array."}, status=400)
             created = []
             errors = []
+            context = {"request": request, "category_resolver": CategoryPathResolver()}
             for idx, item in enumerate(request.data):
-                ser = ProductWithCategoryPathSerializer(data=item)
+                ser = ProductWithCategoryPathSerializer(data=item, context=context)
                 if ser.is_valid():
                     product = ser.save()
                     created.append(product.id)
@@ -126,11 +130,14 @@ class OrderViewSet(viewsets.ModelViewSet):
         @action(detail=False, methods=["post"], url_path="upload-csv", parser_classes=[MultiPartParser])
         def upload_csv(self, request):
             """Upload CSV file with columns: name, price, category_path[, description, stock_quantity].
-            Accepts multipart/form-data with `file` field.
+            Accepts multipart/form-data with `file` field; `upsert=true` updates products
+            matched by name instead of adding duplicates.
             """
             file_obj = request.data.get("file")
             if not file_obj:
                 return Response({"detail": "Missing 'file' field."}, status=400)
-            result = import_products_csv(file_obj)
-            http_status = status.HTTP_201_CREATED if result.get("created_ids") else status.HTTP_400_BAD_REQUEST
+            upsert = str(request.data.get("upsert", "")).lower() in ("1", "true")
+            result = import_products_csv(file_obj, upsert=upsert)
+            written = result["created"] or result["updated"]
+            http_status = status.HTTP_201_CREATED if written else status.HTTP_400_BAD_REQUEST
             return Response(result, status=http_status)
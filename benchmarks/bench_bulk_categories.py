@@ -0,0 +1,64 @@
+"""Inserting many categories with and without deferred MPTT renumbering.
+
+    python -m benchmarks.bench_bulk_categories [count]
+
+Builds one root with ``sqrt(count)`` children, each with the same number of
+leaves, inserted in shuffled name order so regular inserts land mid-tree.
+"""
+import math
+import random
+import sys
+import time
+
+from benchmarks.common import QueryCounter, print_table, test_database
+
+from django.db import connection, transaction  # noqa: E402
+
+from core.category_bulk import deferred_category_tree  # noqa: E402
+from core.models import Category  # noqa: E402
+
+
+def shape(count):
+    width = max(1, int(math.sqrt(count)))
+    rng = random.Random(42)
+    branches = [f"Branch {i:05d}" for i in range(width)]
+    rng.shuffle(branches)
+    leaves = [f"Leaf {i:05d}" for i in range(width)]
+    rng.shuffle(leaves)
+    return branches, leaves
+
+
+def insert_one_by_one(branches, leaves):
+    with transaction.atomic():
+        root = Category.objects.create(name="All Products")
+        for branch in branches:
+            parent = Category.objects.create(name=branch, parent=root)
+            for leaf in leaves:
+                Category.objects.create(name=leaf, parent=parent)
+
+
+def insert_deferred(branches, leaves):
+    with deferred_category_tree() as creator:
+        (root,) = creator.create([("All Products", None)])
+        parents = creator.create((branch, root.id) for branch in branches)
+        creator.create((leaf, parent.id) for parent in parents for leaf in leaves)
+
+
+def main(count):
+    branches, leaves = shape(count)
+    rows = []
+    for label, fn in [("one by one", insert_one_by_one), ("deferred", insert_deferred)]:
+        Category.objects.all().delete()
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            start = time.perf_counter()
+            fn(branches, leaves)
+            elapsed = time.perf_counter() - start
+        nodes = Category.objects.count()
+        rows.append((label, nodes, counter.count, f"{elapsed:.2f}", f"{nodes / elapsed:,.0f}"))
+    print_table(["mode", "categories", "queries", "seconds", "categories/s"], rows)
+
+
+if __name__ == "__main__":
+    with test_database():
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
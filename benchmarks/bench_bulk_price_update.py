@@ -0,0 +1,68 @@
+"""ERP price/stock push: per-product saves vs ``update_price_and_stock``.
+
+    python -m benchmarks.bench_bulk_price_update [products]
+
+Loads ``products`` products (10k by default) over 100 leaf categories, then
+changes the price and stock of every one of them, once through a per-product
+serializer save (what a PATCH per SKU costs, minus HTTP) and once through the
+bulk path behind ``POST /api/products/bulk-update/``.
+"""
+import sys
+import time
+from decimal import Decimal
+
+from benchmarks.common import QueryCounter, print_table, test_database
+
+from django.db import connection, transaction  # noqa: E402
+
+from api.bulk_upload import bulk_upload_products  # noqa: E402
+from core.models import Product  # noqa: E402
+from core.product_bulk import update_price_and_stock  # noqa: E402
+from core.serializers import ProductSerializer  # noqa: E402
+
+
+def load(count):
+    bulk_upload_products([
+        {
+            "name": f"Product {i}",
+            "price": f"{1 + i % 97}.50",
+            "stock_quantity": i % 20,
+            "category_path": ["All Products", f"Department {i % 10}", f"Aisle {i % 100}"],
+        }
+        for i in range(count)
+    ])
+
+
+def changes(step):
+    return {
+        pid: {"price": price + step, "stock_quantity": stock + 1}
+        for pid, price, stock in Product.objects.values_list("id", "price", "stock_quantity")
+    }
+
+
+def one_by_one(data):
+    with transaction.atomic():
+        for product in Product.objects.filter(pk__in=list(data)):
+            values = data[product.pk]
+            serializer = ProductSerializer(product, data={key: str(v) for key, v in values.items()}, partial=True)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+
+
+def main(count):
+    load(count)
+    rows = []
+    for step, (label, fn) in enumerate([("one by one", one_by_one), ("bulk", update_price_and_stock)], start=1):
+        data = changes(Decimal(step))
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            start = time.perf_counter()
+            fn(data)
+            elapsed = time.perf_counter() - start
+        rows.append((label, len(data), counter.count, f"{elapsed:.2f}", f"{len(data) / elapsed:,.0f}"))
+    print_table(["mode", "rows", "queries", "seconds", "rows/s"], rows)
+
+
+if __name__ == "__main__":
+    with test_database():
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
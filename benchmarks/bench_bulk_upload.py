@@ -0,0 +1,63 @@
+"""JSON bulk upload: item-by-item saves vs the batched pipeline.
+
+    python -m benchmarks.bench_bulk_upload [items]
+
+Uploads ``items`` products (10k by default) spread over 100 leaf categories,
+once through the old per-item loop (validate, resolve, create, link) and once
+through ``api.bulk_upload.bulk_upload_products``, each on an empty catalog.
+"""
+import sys
+import time
+
+from benchmarks.common import QueryCounter, print_table, test_database
+
+from django.db import connection, transaction  # noqa: E402
+
+from api.bulk_upload import bulk_upload_products  # noqa: E402
+from api.serializers import ProductWithCategoryPathSerializer  # noqa: E402
+from api.utils_hierarchy import CategoryPathResolver  # noqa: E402
+from core.models import Category, Product  # noqa: E402
+
+
+def items(count):
+    return [
+        {
+            "name": f"Product {i}",
+            "price": f"{1 + i % 97}.50",
+            "stock_quantity": i % 20,
+            "category_path": ["All Products", f"Department {i % 10}", f"Aisle {i % 100}"],
+        }
+        for i in range(count)
+    ]
+
+
+def one_by_one(data):
+    resolver = CategoryPathResolver()
+    with transaction.atomic():
+        for item in data:
+            serializer = ProductWithCategoryPathSerializer(data=item)
+            serializer.is_valid(raise_exception=True)
+            fields = dict(serializer.validated_data)
+            path = fields.pop("category_path")
+            product = Product.objects.create(**fields)
+            product.categories.add(resolver.resolve(path))
+
+
+def main(count):
+    data = items(count)
+    rows = []
+    for label, fn in [("one by one", one_by_one), ("batched", bulk_upload_products)]:
+        Product.objects.all().delete()
+        Category.objects.all().delete()
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            start = time.perf_counter()
+            fn(data)
+            elapsed = time.perf_counter() - start
+        rows.append((label, Product.objects.count(), counter.count, f"{elapsed:.2f}", f"{count / elapsed:,.0f}"))
+    print_table(["mode", "products", "queries", "seconds", "items/s"], rows)
+
+
+if __name__ == "__main__":
+    with test_database():
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
@@ -0,0 +1,55 @@
+"""Peak memory and throughput of the streaming CSV importer as the file grows.
+
+    python -m benchmarks.bench_csv_import [rows ...]
+
+Writes a supplier-style CSV of each size to a temporary file and imports it
+with ``core.product_import.import_products_csv``; peak traced memory should stay
+flat while the row count grows. A second pass re-imports the same file in
+upsert mode.
+"""
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.common import print_table, test_database
+
+from django.conf import settings  # noqa: E402
+
+from core.product_import import import_products_csv  # noqa: E402
+
+
+def write_csv(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("name,price,category_path,description,stock_quantity\n")
+        for i in range(rows):
+            f.write(f"Product {i},{1 + i % 97}.25,All Products>Department {i % 10}>Aisle {i % 100},,{i % 20}\n")
+
+
+def run(path, upsert):
+    tracemalloc.start()
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        report = import_products_csv(f, upsert=upsert)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return report, elapsed, peak
+
+
+def main(sizes):
+    settings.DEBUG = False  # the DEBUG query log would grow with the file
+    table = []
+    for rows in sizes:
+        # A fresh database per size: deleting products one by one would dominate.
+        with test_database(), tempfile.NamedTemporaryFile(suffix=".csv") as tmp:
+            write_csv(tmp.name, rows)
+            for mode, upsert in [("insert", False), ("upsert", True)]:
+                report, elapsed, peak = run(tmp.name, upsert)
+                written = report["created"] + report["updated"]
+                table.append((f"{rows:,}", mode, written, f"{elapsed:.1f}", f"{rows / elapsed:,.0f}", f"{peak:.1f}"))
+    print_table(["rows", "mode", "written", "seconds", "rows/s", "peak MB"], table)
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [50_000, 200_000])
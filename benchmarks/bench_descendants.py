@@ -0,0 +1,90 @@
+"""Query count and latency of descendant resolution across tree sizes.
+
+Compares the old breadth-first walk (one query per node), a single MPTT
+range query, a cold rebuild of the in-process tree snapshot and the warm
+snapshot lookup used by ``api.utils_hierarchy.get_descendant_ids``.
+
+    python -m benchmarks.bench_descendants
+"""
+from collections import deque
+
+from benchmarks.common import measure, print_table, test_database
+
+from django.db import transaction  # noqa: E402
+
+from api.models import Category  # noqa: E402
+from api.utils_hierarchy import get_descendant_ids  # noqa: E402
+from core.category_tree import CategoryTree  # noqa: E402
+
+# (depth, fanout) -> 1 + f + f^2 + ... + f^depth nodes
+SHAPES = [(2, 5), (3, 10), (4, 8), (6, 4), (12, 2)]
+
+
+def bfs_descendant_ids(root_id):
+    ids = set()
+    q = deque([root_id])
+    while q:
+        cid = q.popleft()
+        ids.add(cid)
+        for child in Category.objects.filter(parent_id=cid).values_list("id", flat=True):
+            if child not in ids:
+                q.append(child)
+    return ids
+
+
+def range_descendant_ids(root_id):
+    tree_id, lft, rght = Category.objects.filter(id=root_id).values_list("tree_id", "lft", "rght").get()
+    return set(Category.objects.filter(tree_id=tree_id, lft__gte=lft, rght__lte=rght).values_list("id", flat=True))
+
+
+def cold_snapshot_descendant_ids(root_id):
+    return set(CategoryTree.build().descendant_ids(root_id))
+
+
+def build_tree(depth, fanout):
+    with transaction.atomic():
+        with Category.objects.disable_mptt_updates():
+            root = Category.objects.create(name="root", lft=0, rght=0, tree_id=0, level=0)
+            level = [root]
+            for d in range(depth):
+                level = Category.objects.bulk_create([
+                    Category(name=f"n{d}-{i}-{j}", parent=parent, lft=0, rght=0, tree_id=0, level=0)
+                    for i, parent in enumerate(level)
+                    for j in range(fanout)
+                ])
+        Category.objects.rebuild()
+    return root
+
+
+def main():
+    rows = []
+    for depth, fanout in SHAPES:
+        Category.objects.all().delete()
+        root = build_tree(depth, fanout)
+        nodes = Category.objects.count()
+        assert bfs_descendant_ids(root.id) == range_descendant_ids(root.id) == get_descendant_ids(root.id)
+        row = [depth, fanout, nodes]
+        for fn, repeat in [
+            (bfs_descendant_ids, 3),
+            (range_descendant_ids, 5),
+            (cold_snapshot_descendant_ids, 5),
+            (get_descendant_ids, 5),
+        ]:
+            queries, ms = measure(lambda: fn(root.id), repeat=repeat)
+            row += [queries, f"{ms:.1f}"]
+        rows.append(row)
+    print_table(
+        [
+            "depth", "fanout", "nodes",
+            "bfs q", "bfs ms",
+            "range q", "range ms",
+            "cold snap q", "cold snap ms",
+            "warm snap q", "warm snap ms",
+        ],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    with test_database():
+        main()
@@ -0,0 +1,94 @@
+"""CPU time and peak memory of building a product list: DRF serializer vs values().
+
+    python -m benchmarks.bench_list_fastpath [rows]
+
+Fills the product table (50k rows by default) and renders every row as the
+list endpoint would: through ``ProductSerializer`` over model instances, and
+through the ``values()`` fast path for all fields and for ``?fields=id,name,price``.
+Peak memory is measured with tracemalloc in a separate run from the timing.
+"""
+import sys
+import time
+import tracemalloc
+from decimal import Decimal
+
+from benchmarks.common import print_table, test_database
+
+from rest_framework import serializers  # noqa: E402
+from rest_framework.request import Request  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from core.models import Product  # noqa: E402
+from core.serializers import ProductSerializer  # noqa: E402
+from core.views import ProductViewSet  # noqa: E402
+
+ALL_FIELDS = ["id", "name", "description", "price", "stock_quantity"]
+SPARSE_FIELDS = ["id", "name", "price"]
+
+
+def fill(rows, batch=10_000):
+    for start in range(0, rows, batch):
+        Product.objects.bulk_create(
+            Product(name=f"Product {i}", description="A product description " * 4, price=Decimal("9.99"),
+                    stock_quantity=i % 50)
+            for i in range(start, min(start + batch, rows))
+        )
+
+
+def view():
+    v = ProductViewSet(action="list", format_kwarg=None)
+    v.request = Request(APIRequestFactory().get("/api/products/"))
+    return v
+
+
+def with_serializer():
+    # A plain ListSerializer, so the fragment cache is not involved.
+    return serializers.ListSerializer(child=ProductSerializer(), instance=Product.objects.order_by("id")).data
+
+
+def with_values(fields):
+    def run():
+        rows = Product.objects.order_by("id").values(*fields)
+        return view().values_representation(rows, fields)
+    return run
+
+
+def cpu_ms(fn, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.process_time()
+        fn()
+        elapsed = (time.process_time() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def peak_mb(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def main(rows):
+    fill(rows)
+    assert with_values(ALL_FIELDS)() == [dict(r) for r in with_serializer()]
+    table = []
+    base_ms = base_mb = None
+    for label, fn in [
+        ("serializer", with_serializer),
+        ("values()", with_values(ALL_FIELDS)),
+        ("values() ?fields=", with_values(SPARSE_FIELDS)),
+    ]:
+        ms, mb = cpu_ms(fn), peak_mb(fn)
+        base_ms, base_mb = base_ms or ms, base_mb or mb
+        table.append((label, f"{ms:.0f}", f"{base_ms / ms:.1f}x", f"{mb:.1f}", f"{base_mb / mb:.1f}x"))
+    print(f"{rows:,} products")
+    print_table(["path", "cpu ms", "speedup", "peak MB", "less memory"], table)
+
+
+if __name__ == "__main__":
+    with test_database():
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
@@ -0,0 +1,103 @@
+"""One customer's order history: page 1 vs the last page.
+
+    python -m benchmarks.bench_order_history [orders] [other_orders]
+
+One customer with ``orders`` orders (10,000 by default) among ``other_orders``
+(100,000) placed by 100 other customers, interleaved and a second apart. Times
+fetching page 1 and the last page of 50 through offset pagination, through the
+keyset paginator without the ``(customer, created_at, id)`` index, and through
+the keyset paginator with it.
+"""
+import sys
+from datetime import timedelta
+
+from benchmarks.common import measure, print_table, test_database
+
+from django.db import connection  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework.pagination import LimitOffsetPagination  # noqa: E402
+from rest_framework.request import Request  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from core.models import Customer, Order  # noqa: E402
+from core.pagination import KeysetPagination  # noqa: E402
+
+PAGE_SIZE = 50
+ORDERING = ("-created_at", "-id")
+
+
+class View:
+    keyset_ordering = ORDERING
+
+
+def fill(orders, other_orders, batch=20_000):
+    customer = Customer.objects.create(name="Regular", email="regular@example.com", phone_number="+254700000000")
+    others = Customer.objects.bulk_create(
+        Customer(name=f"C{i}", email=f"c{i}@example.com", phone_number=f"+2548{i:08d}") for i in range(100)
+    )
+    total = orders + other_orders
+    every = max(1, total // orders)
+    owners = [customer if i % every == 0 and i // every < orders else others[i % len(others)] for i in range(total)]
+    for start in range(0, total, batch):
+        Order.objects.bulk_create(Order(customer=owner) for owner in owners[start:start + batch])
+    # auto_now_add stamps every row with the same instant; spread them out.
+    began = timezone.now() - timedelta(seconds=total)
+    ids = Order.objects.order_by("id").values_list("id", flat=True)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            "UPDATE core_order SET created_at = %s WHERE id = %s",
+            [(began + timedelta(seconds=n), pk) for n, pk in enumerate(ids)],
+        )
+    return customer
+
+
+def request(query):
+    return Request(APIRequestFactory().get("/api/orders/mine/", query))
+
+
+def offset_page(customer, page):
+    paginator = LimitOffsetPagination()
+    req = request({"limit": PAGE_SIZE, "offset": (page - 1) * PAGE_SIZE})
+    queryset = Order.objects.filter(customer=customer).order_by(*ORDERING)
+    return lambda: paginator.paginate_queryset(queryset, req)
+
+
+def keyset_page(customer, page):
+    paginator = KeysetPagination()
+    query = {"page_size": PAGE_SIZE}
+    queryset = Order.objects.filter(customer=customer)
+    if page > 1:
+        # The cursor a client would hold after reading page - 1.
+        last = queryset.order_by(*ORDERING).values_list("created_at", "id")[(page - 1) * PAGE_SIZE - 1]
+        paginator.fields = [Order._meta.get_field(name) for name in ("created_at", "id")]
+        query["cursor"] = paginator.encode_cursor(False, list(last))
+    req = request(query)
+    return lambda: paginator.paginate_queryset(queryset, req, view=View())
+
+
+def timings(customer, make, last):
+    q1, ms1 = measure(make(customer, 1))
+    qn, msn = measure(make(customer, last))
+    return q1, f"{ms1:.2f}", last, qn, f"{msn:.2f}", f"{msn / ms1:.1f}x"
+
+
+def main(orders, other_orders):
+    customer = fill(orders, other_orders)
+    last = -(-orders // PAGE_SIZE)
+    index = next(i for i in Order._meta.indexes if i.name == "order_customer_created_idx")
+    with connection.schema_editor() as editor:
+        editor.remove_index(Order, index)
+    table = [("offset, no index", *timings(customer, offset_page, last))]
+    table.append(("keyset, no index", *timings(customer, keyset_page, last)))
+    with connection.schema_editor() as editor:
+        editor.add_index(Order, index)
+    table.append(("offset", *timings(customer, offset_page, last)))
+    table.append(("keyset", *timings(customer, keyset_page, last)))
+    print(f"{orders:,} orders for one customer among {orders + other_orders:,}, {PAGE_SIZE} per page")
+    print_table(["paginator", "queries", "page 1 ms", "page", "queries", "last ms", "last/page 1"], table)
+
+
+if __name__ == "__main__":
+    with test_database():
+        args = [int(a) for a in sys.argv[1:3]]
+        main(*(args + [10_000, 100_000][len(args):]))
@@ -0,0 +1,71 @@
+"""Latency of page 1 vs a deep page: offset pagination vs keyset pagination.
+
+    python -m benchmarks.bench_pagination [rows]
+
+Fills the product table (1M rows by default) and times fetching the first and
+the 10,000th page of 100 rows through each paginator.
+"""
+import sys
+from decimal import Decimal
+
+from benchmarks.common import measure, print_table, test_database
+
+from rest_framework.pagination import LimitOffsetPagination  # noqa: E402
+from rest_framework.request import Request  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from core.models import Product  # noqa: E402
+from core.pagination import KeysetPagination  # noqa: E402
+
+PAGE_SIZE = 100
+DEEP_PAGE = 10_000
+
+
+class View:
+    keyset_ordering = ("id",)
+
+
+def fill(rows, batch=20_000):
+    for start in range(0, rows, batch):
+        Product.objects.bulk_create(
+            Product(name=f"Product {i}", price=Decimal("9.99")) for i in range(start, min(start + batch, rows))
+        )
+
+
+def request(query):
+    return Request(APIRequestFactory().get("/api/products/", query))
+
+
+def offset_page(page):
+    paginator = LimitOffsetPagination()
+    req = request({"limit": PAGE_SIZE, "offset": (page - 1) * PAGE_SIZE})
+    return lambda: paginator.paginate_queryset(Product.objects.order_by("id"), req)
+
+
+def keyset_page(page):
+    paginator = KeysetPagination()
+    query = {"page_size": PAGE_SIZE}
+    if page > 1:
+        # The cursor a client would hold after reading page - 1.
+        last = Product.objects.order_by("id").values_list("id", flat=True)[(page - 1) * PAGE_SIZE - 1]
+        paginator.fields = [Product._meta.get_field("id")]
+        query["cursor"] = paginator.encode_cursor(False, [last])
+    req = request(query)
+    return lambda: paginator.paginate_queryset(Product.objects.all(), req, view=View())
+
+
+def main(rows):
+    fill(rows)
+    deep = min(DEEP_PAGE, rows // PAGE_SIZE)
+    table = []
+    for label, make in [("offset", offset_page), ("keyset", keyset_page)]:
+        q1, ms1 = measure(make(1))
+        qn, msn = measure(make(deep))
+        table.append((label, q1, f"{ms1:.2f}", deep, qn, f"{msn:.2f}", f"{msn / ms1:.1f}x"))
+    print(f"{rows:,} products, {PAGE_SIZE} per page")
+    print_table(["paginator", "queries", "page 1 ms", "page", "queries", "deep ms", "deep/page 1"], table)
+
+
+if __name__ == "__main__":
+    with test_database():
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,92 @@
+"""Many buyers, one SKU: read-modify-write vs the conditional UPDATE.
+
+    python -m benchmarks.bench_stock_reservation [threads] [orders_per_thread]
+
+``threads`` workers (16 by default) each place ``orders_per_thread`` single-item
+orders (50 by default) against one product stocked for half of them. The naive
+mode reads the stock, checks it in Python and saves; ``reserve_stock`` checks and
+decrements in one statement. "oversold" counts orders accepted beyond the
+stock; "retries" counts statements the database refused because
+of a held lock (SQLite) and that were run again after a short random pause.
+"""
+import random
+import sys
+import threading
+import time
+
+from benchmarks.common import print_table, test_database
+
+from django.db import OperationalError, connection, transaction  # noqa: E402
+
+from core.inventory import OutOfStock, reserve_stock, stock_levels  # noqa: E402
+from core.models import Product  # noqa: E402
+
+
+def read_modify_write(product_id):
+    with transaction.atomic():
+        product = Product.objects.get(pk=product_id)
+        if product.stock_quantity < 1:
+            raise OutOfStock([])
+        product.stock_quantity -= 1
+        product.save(update_fields=["stock_quantity"])
+
+
+def conditional_update(product_id):
+    with transaction.atomic():
+        reserve_stock([(product_id, 1)])
+
+
+def run(fn, threads, per_thread, prepare=None):
+    stock = threads * per_thread // 2
+    product = Product.objects.create(name="Hot SKU", price="9.99", stock_quantity=stock)
+    if prepare:
+        prepare(product.pk)
+    sold, retries = [0], [0]
+    lock = threading.Lock()
+    start = threading.Barrier(threads + 1)
+
+    def buyer():
+        start.wait()
+        try:
+            for _ in range(per_thread):
+                while True:
+                    try:
+                        fn(product.pk)
+                        with lock:
+                            sold[0] += 1
+                    except OutOfStock:
+                        pass
+                    except OperationalError:
+                        with lock:
+                            retries[0] += 1
+                        time.sleep(random.uniform(0, 0.002))
+                        continue
+                    break
+        finally:
+            connection.close()
+
+    workers = [threading.Thread(target=buyer) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    start.wait()
+    began = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - began
+    remaining = stock_levels([product.pk])[product.pk]
+    return sold[0], max(0, sold[0] - stock), remaining, retries[0], elapsed
+
+
+def main(threads, per_thread):
+    rows = []
+    for label, fn in [("read-modify-write", read_modify_write), ("conditional UPDATE", conditional_update)]:
+        sold, oversold, remaining, retries, elapsed = run(fn, threads, per_thread)
+        orders = threads * per_thread
+        rows.append((label, orders, sold, oversold, remaining, retries, f"{elapsed:.2f}", f"{orders / elapsed:,.0f}"))
+    print_table(["mode", "orders", "sold", "oversold", "stock left", "retries", "seconds", "orders/s"], rows)
+
+
+if __name__ == "__main__":
+    with test_database():
+        args = [int(a) for a in sys.argv[1:3]]
+        main(*(args + [16, 50][len(args):]))
@@ -0,0 +1,35 @@
+"""Orders on one hot SKU: stock on the product row vs sharded stock counters.
+
+    python -m benchmarks.bench_stock_shards [threads] [orders_per_thread] [shards]
+
+Same workload as ``bench_stock_reservation`` (every thread ordering the same
+product, stocked for half of the orders), placed through ``reserve_stock``
+with the product unsharded and then spread over ``shards`` counters (8 by
+default).
+
+SQLite takes one write lock for the whole database, so sharding cannot help
+there and only shows its overhead; run it against PostgreSQL
+(``DB_ENGINE=django.db.backends.postgresql``), where each shard is its own
+row lock, to see the contention it removes.
+"""
+import sys
+
+from benchmarks.common import print_table, test_database
+
+from benchmarks.bench_stock_reservation import conditional_update, run  # noqa: E402
+from core.inventory import shard_stock  # noqa: E402
+
+
+def main(threads, per_thread, shards):
+    rows = []
+    for label, prepare in [("product row", None), (f"{shards} shards", lambda pid: shard_stock(pid, shards))]:
+        sold, oversold, _, retries, elapsed = run(conditional_update, threads, per_thread, prepare)
+        orders = threads * per_thread
+        rows.append((label, orders, sold, oversold, retries, f"{elapsed:.2f}", f"{orders / elapsed:,.0f}"))
+    print_table(["stock", "orders", "sold", "oversold", "retries", "seconds", "orders/s"], rows)
+
+
+if __name__ == "__main__":
+    with test_database():
+        args = [int(a) for a in sys.argv[1:4]]
+        main(*(args + [16, 50, 8][len(args):]))
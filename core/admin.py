@@ -2,8 +2,16 @@ from django.contrib import admin
 from mptt.admin import MPTTModelAdmin
 from .models import Category, Product, Order, OrderItem, Customer
 
+
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    # Stored totals: the changelist never sums items.
+    list_display = ["id", "customer", "status", "item_count", "total_amount", "created_at"]
+    list_select_related = ["customer"]
+    readonly_fields = ["total_amount", "item_count"]
+
+
 admin.site.register(Category, MPTTModelAdmin)
 admin.site.register(Product)
-admin.site.register(Order)
 admin.site.register(OrderItem)
 admin.site.register(Customer)
@@ -6,4 +6,4 @@ class CoreConfig(AppConfig):
 
     def ready(self):
         # Import signals so receivers get registered
-        from . import signals  # noqa: F401
+        from . import checks, signals  # noqa: F401
@@ -0,0 +1,223 @@
+"""Bulk category creation with deferred MPTT renumbering.
+
+Every regular ``Category`` insert makes room in the nested-set numbering of its
+tree (and, with ``order_insertion_by``, finds its sorted slot first), so
+creating thousands of categories one by one is quadratic. Inside
+``deferred_category_tree()`` nodes are written with ``bulk_create`` and
+placeholder ``lft/rght`` values, and each affected tree is renumbered once when
+the block exits.
+
+    with deferred_category_tree() as creator:
+        fruit, veg = creator.create([("Fruit", root.id), ("Veg", root.id)])
+        creator.create([("Apples", fruit.id)])
+"""
+import contextlib
+
+from django.db import connection, transaction
+from django.db.models import Max
+
+from .category_tree import GENERATION, get_category_tree
+from .generations import bump_generation
+from .models import Category
+
+
+class BulkCategoryCreator:
+    """Collects new categories and the trees they touch; see ``deferred_category_tree``."""
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.created = 0
+        self._tree_ids = {}
+        self._touched_trees = set()
+        self._new_roots = False
+        self._next_tree_id = None
+
+    def create(self, nodes):
+        """Insert ``(name, parent_id)`` pairs in one ``bulk_create``; return the new categories.
+
+        Parents must already exist, either in the database or from an earlier
+        ``create`` call in the same block.
+        """
+        nodes = list(nodes)
+        self._load_tree_ids({parent_id for _, parent_id in nodes if parent_id is not None})
+        categories = []
+        for name, parent_id in nodes:
+            if parent_id is None:
+                tree_id = self._allocate_tree_id()
+                self._new_roots = True
+            else:
+                tree_id = self._tree_ids[parent_id]
+            self._touched_trees.add(tree_id)
+            categories.append(Category(name=name, parent_id=parent_id, tree_id=tree_id, lft=0, rght=0, level=0))
+        Category.objects.bulk_create(categories, batch_size=self.batch_size)
+        for category in categories:
+            self._tree_ids[category.id] = category.tree_id
+        self.created += len(categories)
+        return categories
+
+    def _load_tree_ids(self, parent_ids):
+        missing = [pid for pid in parent_ids if pid not in self._tree_ids]
+        if missing:
+            self._tree_ids.update(Category.objects.filter(id__in=missing).values_list("id", "tree_id"))
+
+    def _allocate_tree_id(self):
+        if self._next_tree_id is None:
+            self._next_tree_id = (Category.objects.aggregate(m=Max("tree_id"))["m"] or 0) + 1
+        tree_id = self._next_tree_id
+        self._next_tree_id += 1
+        return tree_id
+
+    def renumber(self):
+        """Renumber every tree touched so far, once."""
+        if not self.created:
+            return
+        if self._new_roots:
+            # New roots need tree ids in name order among the existing ones.
+            renumber_trees(batch_size=self.batch_size)
+        else:
+            renumber_trees(self._touched_trees, batch_size=self.batch_size)
+        bump_generation(GENERATION)
+
+
+def renumber_trees(tree_ids=None, batch_size=1000):
+    """Recompute nested-set numbering from ``parent`` links and write only the rows that changed.
+
+    Equivalent to ``Category.objects.rebuild()`` (or ``partial_rebuild`` per
+    tree when ``tree_ids`` is given) with siblings in ``order_insertion_by``
+    order, but reads the trees with one ``values_list`` query and writes with
+    ``executemany`` instead of ORM ``bulk_update``. Returns the number of rows
+    rewritten.
+    """
+    qs = Category.objects.all()
+    if tree_ids is not None:
+        qs = qs.filter(tree_id__in=list(tree_ids))
+    order = list(Category._mptt_meta.order_insertion_by) + ["id"]
+    rows = qs.order_by(*order).values_list("id", "parent_id", "tree_id", "lft", "rght", "level")
+
+    current = {}
+    children = {}
+    roots = []
+    for cid, parent_id, tree_id, lft, rght, level in rows:
+        current[cid] = (tree_id, lft, rght, level)
+        if parent_id is None:
+            roots.append(cid)
+        else:
+            children.setdefault(parent_id, []).append(cid)
+
+    changed = []
+    for index, root_id in enumerate(roots, start=1):
+        tree_id = current[root_id][0] if tree_ids is not None else index
+        counter = 1
+        lefts = {}
+        # Iterative pre/post-order walk; deep trees would overflow recursion.
+        stack = [(root_id, 0, False)]
+        while stack:
+            cid, level, done = stack.pop()
+            if not done:
+                lefts[cid] = counter
+                counter += 1
+                stack.append((cid, level, True))
+                for child in reversed(children.get(cid, ())):
+                    stack.append((child, level + 1, False))
+            else:
+                new = (tree_id, lefts.pop(cid), counter, level)
+                counter += 1
+                if current[cid] != new:
+                    changed.append(new + (cid,))
+
+    table = Category._meta.db_table
+    sql = f"UPDATE {table} SET tree_id = %s, lft = %s, rght = %s, level = %s WHERE id = %s"
+    with connection.cursor() as cursor:
+        for start in range(0, len(changed), batch_size):
+            cursor.executemany(sql, changed[start:start + batch_size])
+    return len(changed)
+
+
+@contextlib.contextmanager
+def deferred_category_tree(batch_size=1000):
+    """Create categories in bulk inside the block and renumber their trees once at the end.
+
+    Runs in one transaction; MPTT fields of the new nodes are meaningless until
+    the block exits. ``bulk_create`` sends no ``post_save``, so the category
+    generation is bumped once after renumbering.
+    """
+    creator = BulkCategoryCreator(batch_size=batch_size)
+    with transaction.atomic():
+        with Category.objects.disable_mptt_updates():
+            yield creator
+        creator.renumber()
+
+
+class _PathNode:
+    __slots__ = ("id", "children")
+
+    def __init__(self, category_id):
+        self.id = category_id
+        self.children = {}
+
+
+class CategoryPathResolver:
+    """Resolve category name paths to ids for the lifetime of one import.
+
+    The existing forest is prefetched once from the category tree snapshot into
+    a trie keyed by name, so every later lookup of a known path prefix is a
+    dictionary walk. Missing nodes are created level by level with
+    ``deferred_category_tree``, so the whole batch costs one renumbering.
+
+        resolver = CategoryPathResolver()
+        ids = resolver.resolve_many([["All Products", "Bakery", "Bread"], ...])
+        bread_id = resolver.resolve(["All Products", "Bakery", "Bread"])
+    """
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.created = 0
+        self._root = _PathNode(None)
+        tree = get_category_tree()
+        nodes = {None: self._root}
+        for cid in tree:
+            parent = nodes[tree.parent_id(cid)]
+            node = nodes[cid] = _PathNode(cid)
+            # Keep the first sibling in tree order if names are duplicated.
+            parent.children.setdefault(tree.name(cid), node)
+
+    def resolve(self, path_names):
+        """Return the id of the deepest category of ``path_names``, creating any missing nodes."""
+        return self.resolve_many([path_names])[tuple(path_names)]
+
+    def resolve_many(self, paths):
+        """Return ``{tuple(path): category_id}``, creating all missing nodes in one batch."""
+        paths = {tuple(p) for p in paths if p}
+        unresolved = [path for path in paths if self._walk(path) is None]
+        if unresolved:
+            self._create_missing(unresolved)
+        return {path: self._walk(path).id for path in paths}
+
+    def _create_missing(self, paths):
+        depth = 0
+        frontier = {path: self._root for path in paths}
+        with deferred_category_tree(batch_size=self.batch_size) as creator:
+            while frontier:
+                # Ordered and de-duplicated: each missing (parent, name) is created once.
+                missing = list(dict.fromkeys(
+                    (node, path[depth]) for path, node in frontier.items() if path[depth] not in node.children
+                ))
+                if missing:
+                    created = creator.create((name, node.id) for node, name in missing)
+                    for (node, name), category in zip(missing, created):
+                        node.children[name] = _PathNode(category.id)
+                frontier = {
+                    path: node.children[path[depth]]
+                    for path, node in frontier.items()
+                    if depth + 1 < len(path)
+                }
+                depth += 1
+        self.created += creator.created
+
+    def _walk(self, path):
+        node = self._root
+        for name in path:
+            node = node.children.get(name)
+            if node is None:
+                return None
+        return node
@@ -0,0 +1,127 @@
+"""In-process, versioned snapshot of the whole Category forest.
+
+Categories change rarely but are read on almost every catalog request, so each
+worker keeps one immutable snapshot built from a single ordered query and
+rebuilds it lazily when the ``category`` generation is bumped by the
+``post_save``/``post_delete`` receivers in ``core.signals``. A snapshot built
+inside a transaction that changed categories is only reused by that transaction:
+once it rolls back, the next reader rebuilds from the committed rows.
+
+Nodes are stored in MPTT pre-order (``tree_id, lft``) in parallel arrays, so
+every subtree is a contiguous slice: the descendants of the node at position
+``i`` are ``ids[i:i + sizes[i]]``.
+"""
+import threading
+from array import array
+
+from .generations import get_generation, pending_bumps
+from .models import Category
+
+GENERATION = "category"
+
+
+class CategoryTree:
+    """Immutable pre-order snapshot of the Category forest."""
+
+    __slots__ = ("generation", "pending", "_ids", "_parents", "_sizes", "_names", "_index")
+
+    def __init__(self, generation, rows, pending=frozenset()):
+        """``rows`` are ``(id, parent_id, name, lft, rght)`` ordered by ``tree_id, lft``."""
+        self.generation = generation
+        self.pending = pending
+        self._ids = array("q")
+        self._parents = array("q")
+        self._sizes = array("l")
+        self._names = []
+        for cid, parent_id, name, lft, rght in rows:
+            self._ids.append(cid)
+            self._parents.append(parent_id or 0)
+            self._sizes.append((rght - lft + 1) // 2)
+            self._names.append(name)
+        self._index = {cid: pos for pos, cid in enumerate(self._ids)}
+
+    @classmethod
+    def build(cls, generation=None, pending=frozenset()):
+        rows = Category.objects.order_by("tree_id", "lft").values_list("id", "parent_id", "name", "lft", "rght")
+        return cls(generation, rows.iterator(chunk_size=2000), pending)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def __contains__(self, category_id):
+        return category_id in self._index
+
+    def name(self, category_id):
+        return self._names[self._index[category_id]]
+
+    def parent_id(self, category_id):
+        return self._parents[self._index[category_id]] or None
+
+    def root_ids(self):
+        roots = []
+        pos = 0
+        while pos < len(self._ids):
+            roots.append(self._ids[pos])
+            pos += self._sizes[pos]
+        return roots
+
+    def children_ids(self, category_id):
+        pos = self._index[category_id]
+        end = pos + self._sizes[pos]
+        children = []
+        pos += 1
+        while pos < end:
+            children.append(self._ids[pos])
+            pos += self._sizes[pos]
+        return children
+
+    def ancestor_ids(self, category_id, include_self=True):
+        """Return ids from ``category_id`` up to its root."""
+        ids = [category_id] if include_self else []
+        parent = self._parents[self._index[category_id]]
+        while parent:
+            ids.append(parent)
+            parent = self._parents[self._index[parent]]
+        return ids
+
+    def path(self, category_id):
+        """Return the names from the root down to ``category_id``."""
+        return [self.name(cid) for cid in reversed(self.ancestor_ids(category_id))]
+
+    def descendant_range(self, category_id):
+        """Return the ``(start, stop)`` pre-order slice covering the subtree."""
+        pos = self._index[category_id]
+        return pos, pos + self._sizes[pos]
+
+    def descendant_ids(self, category_id, include_self=True):
+        start, stop = self.descendant_range(category_id)
+        if not include_self:
+            start += 1
+        return self._ids[start:stop].tolist()
+
+    def nodes(self, category_ids):
+        """Yield ``{"id", "name", "parent"}`` dicts for the given ids, in pre-order."""
+        for cid in category_ids:
+            pos = self._index[cid]
+            yield {"id": cid, "name": self._names[pos], "parent": self._parents[pos] or None}
+
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+def get_category_tree():
+    """Return this worker's snapshot, rebuilding it if the tree has changed."""
+    global _snapshot
+    generation = get_generation(GENERATION)
+    pending = pending_bumps(GENERATION)
+    snapshot = _snapshot
+    if snapshot is not None and (snapshot.generation, snapshot.pending) == (generation, pending):
+        return snapshot
+    with _lock:
+        if _snapshot is None or (_snapshot.generation, _snapshot.pending) != (generation, pending):
+            _snapshot = CategoryTree.build(generation, pending)
+        return _snapshot
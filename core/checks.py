@@ -0,0 +1,23 @@
+"""System checks for settings the catalog caches depend on."""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Backends whose entries are private to one process.
+PER_PROCESS_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Generations, the category tree, fragments and the sharded set need one cache for all workers."""
+    backend = settings.CACHES.get("default", {}).get("BACKEND")
+    if settings.DEBUG or backend not in PER_PROCESS_CACHES:
+        return []
+    return [Error(
+        f"The default cache ({backend}) is per process: a write in one worker would never "
+        "invalidate the category tree, ETags or product fragments cached by the others.",
+        hint="Set CACHE_URL to a shared cache such as Redis (e.g. redis://redis:6379/1).",
+        id="core.E001",
+    )]
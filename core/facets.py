@@ -0,0 +1,84 @@
+"""Facet counts for a filtered product queryset.
+
+Every facet is computed in a fixed number of grouped queries, whatever the
+number of facet values:
+
+* one conditional aggregate for the total, the price buckets and stock
+  availability (served by the ``price``/``stock_quantity`` composite indexes);
+* one grouped query joining each child category to its MPTT range, counting
+  distinct products so a product listed under several descendants counts once.
+"""
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import Count, Q
+
+from .category_tree import get_category_tree
+from .models import Category, Product
+
+# Bucket edges; each bucket is [low, high), the last one is open-ended.
+PRICE_BUCKETS = tuple(Decimal(edge) for edge in ("0", "10", "25", "50", "100", "250", "500", "1000"))
+
+
+def _price_buckets():
+    edges = list(PRICE_BUCKETS) + [None]
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def price_and_stock_facets(queryset):
+    buckets = _price_buckets()
+    aggregates = {"total": Count("pk"), "in_stock": Count("pk", filter=Q(stock_quantity__gt=0))}
+    for i, (low, high) in enumerate(buckets):
+        condition = Q(price__gte=low)
+        if high is not None:
+            condition &= Q(price__lt=high)
+        aggregates[f"price_{i}"] = Count("pk", filter=condition)
+    counts = queryset.order_by().aggregate(**aggregates)
+    return {
+        "count": counts["total"],
+        "price": [
+            {"min": low, "max": high, "count": counts[f"price_{i}"]}
+            for i, (low, high) in enumerate(buckets)
+        ],
+        "stock": {"in_stock": counts["in_stock"], "out_of_stock": counts["total"] - counts["in_stock"]},
+    }
+
+
+def category_facets(queryset, category_id=None):
+    """Products per child of ``category_id`` (per root category if ``None``).
+
+    Children with no matching product are listed with a count of 0.
+    """
+    tree = get_category_tree()
+    if category_id is None:
+        child_ids = tree.root_ids()
+    elif category_id in tree:
+        child_ids = tree.children_ids(category_id)
+    else:
+        child_ids = []
+    if not child_ids:
+        return []
+    if queryset.query.is_empty():
+        return [dict(node, count=0) for node in tree.nodes(child_ids)]
+
+    products_sql, products_params = queryset.order_by().values("pk").query.sql_with_params()
+    sql = f"""
+        SELECT root.id, COUNT(DISTINCT link.product_id)
+        FROM {Category._meta.db_table} root
+        JOIN {Category._meta.db_table} node
+            ON node.tree_id = root.tree_id AND node.lft >= root.lft AND node.rght <= root.rght
+        JOIN {Product.categories.through._meta.db_table} link ON link.category_id = node.id
+        WHERE root.id IN ({", ".join(["%s"] * len(child_ids))})
+            AND link.product_id IN ({products_sql})
+        GROUP BY root.id
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, list(child_ids) + list(products_params))
+        counts = dict(cursor.fetchall())
+    return [dict(node, count=counts.get(node["id"], 0)) for node in tree.nodes(child_ids)]
+
+
+def product_facets(queryset, category_id=None):
+    facets = price_and_stock_facets(queryset)
+    facets["categories"] = category_facets(queryset, category_id)
+    return facets
@@ -0,0 +1,42 @@
+from django import forms
+from django.db.models import Exists, OuterRef
+from django_filters import rest_framework as filters
+
+from .category_tree import get_category_tree
+from .models import Product
+
+
+class IntegerFilter(filters.NumberFilter):
+    """Whole numbers only: ``?category=1.5`` is a 400, not category 1."""
+    field_class = forms.IntegerField
+
+
+class ProductFilter(filters.FilterSet):
+    """Price range, stock availability and category subtree.
+
+    ``category`` matches products listed under that category or any of its
+    descendants (resolved from the category snapshot); a product listed under
+    several of them is still returned once.
+    """
+    min_price = filters.NumberFilter(field_name="price", lookup_expr="gte")
+    max_price = filters.NumberFilter(field_name="price", lookup_expr="lte")
+    in_stock = filters.BooleanFilter(method="filter_in_stock")
+    category = IntegerFilter(method="filter_category")
+
+    class Meta:
+        model = Product
+        fields = ["min_price", "max_price", "in_stock", "category"]
+
+    def filter_in_stock(self, queryset, name, value):
+        if value:
+            return queryset.filter(stock_quantity__gt=0)
+        return queryset.filter(stock_quantity=0)
+
+    def filter_category(self, queryset, name, value):
+        tree = get_category_tree()
+        if value not in tree:
+            return queryset.none()
+        links = Product.categories.through.objects.filter(
+            product_id=OuterRef("pk"), category_id__in=tree.descendant_ids(value)
+        )
+        return queryset.filter(Exists(links))
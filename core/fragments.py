@@ -0,0 +1,70 @@
+"""Cache of each product's serialized representation.
+
+Fragments are keyed by ``(product id, VERSION)`` in the default cache and
+dropped by the Product save/delete and ``categories`` M2M receivers in
+``core.signals``. A list is assembled with one ``get_many``; only the misses
+are serialized, then stored with one ``set_many``. Bump ``VERSION`` whenever
+``ProductSerializer``'s output changes so old fragments are never served.
+
+Hit and miss totals are kept in the cache too, so they add up across workers.
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+KEY_PREFIX = "product-fragment"
+VERSION = 1
+HITS_KEY = f"{KEY_PREFIX}:hits"
+MISSES_KEY = f"{KEY_PREFIX}:misses"
+
+
+def fragment_key(product_id):
+    return f"{KEY_PREFIX}:{VERSION}:{product_id}"
+
+
+def _count(key, amount):
+    if not amount:
+        return
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        if not cache.add(key, amount, timeout=None):
+            cache.incr(key, amount)
+
+
+def render_many(products, render):
+    """``render(product)`` for each product, served from cached fragments where possible."""
+    products = list(products)
+    keys = [fragment_key(p.pk) for p in products]
+    cached = cache.get_many(keys)
+    missing = {}
+    results = []
+    for product, key in zip(products, keys):
+        fragment = cached.get(key)
+        if fragment is None:
+            fragment = missing[key] = render(product)
+        results.append(fragment)
+    if missing:
+        cache.set_many(missing, timeout=None)
+    _count(HITS_KEY, len(products) - len(missing))
+    _count(MISSES_KEY, len(missing))
+    return results
+
+
+def invalidate(product_ids):
+    """Drop the fragments now and again on commit, like ``bump_generation``."""
+    keys = [fragment_key(pid) for pid in product_ids]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def stats():
+    counts = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits, misses = counts.get(HITS_KEY, 0), counts.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_ratio": hits / total if total else None}
+
+
+def reset_stats():
+    cache.delete_many([HITS_KEY, MISSES_KEY])
@@ -0,0 +1,84 @@
+"""Change-generation counters shared through the Django cache.
+
+A generation is an opaque integer that changes every time the data it guards
+changes. Readers remember the generation their derived state (an in-process
+snapshot, an ETag, ...) was built from and compare it on the next access.
+
+Counters live in the default cache, so every worker sees a bump as long as the
+cache backend is shared (``CACHE_URL``, e.g. Redis). The locmem default keeps
+them per process, which only a single development or test process may use: the
+``core.E001`` system check refuses it when DEBUG is off.
+"""
+import random
+import time
+from functools import partial
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+KEY_PREFIX = "generation:"
+PRODUCT_GENERATION = "product"
+
+
+def _key(name):
+    return f"{KEY_PREFIX}{name}"
+
+
+def _modified_key(key):
+    return f"{key}:modified"
+
+
+def get_generation(name):
+    """Return the current generation for ``name``, seeding it if missing."""
+    key = _key(name)
+    value = cache.get(key)
+    if value is None:
+        # Random seed so a counter evicted from the cache never comes back at
+        # a value a stale reader is still holding.
+        cache.add(key, random.randint(1, 2**31), timeout=None)
+        value = cache.get(key)
+    return value
+
+
+def last_modified(name):
+    """Unix time of the last bump of ``name``; "now" if the cache has lost it."""
+    key = _modified_key(_key(name))
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, time.time(), timeout=None)
+        value = cache.get(key)
+    return value
+
+
+def _incr(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, random.randint(1, 2**31), timeout=None)
+    cache.set(_modified_key(key), time.time(), timeout=None)
+
+
+def bump_generation(name):
+    """Invalidate everything derived from ``name``.
+
+    Bumps immediately, so the current process never serves data it has just
+    changed, and again once the surrounding transaction commits, so a reader in
+    another worker that rebuilt from pre-commit rows does not keep them.
+    """
+    key = _key(name)
+    _incr(key)
+    transaction.on_commit(partial(_incr, key))
+
+
+def pending_bumps(name):
+    """The commit-time bumps of ``name`` still queued on this connection.
+
+    Empty outside a transaction. A rolled-back savepoint or transaction drops
+    its bumps, so state derived while they were pending can tell that the rows
+    it saw are gone even though the generation is not bumped again.
+    """
+    key = _key(name)
+    return frozenset(
+        func for _, func, _ in connection.run_on_commit
+        if isinstance(func, partial) and func.func is _incr and func.args == (key,)
+    )
@@ -0,0 +1,161 @@
+"""Background product import jobs.
+
+An upload is stored on an ``ImportJob`` and processed off the request by
+``run_import_job``: on an in-process thread by default, or through Celery
+(``core.tasks.run_import_job``) with ``IMPORT_JOBS_BACKEND = "celery"`` once
+a Celery app and broker are configured.
+
+Progress is checkpointed from the importer's ``progress`` callback, inside
+each chunk's transaction, so ``last_line`` always matches what is committed.
+A job whose worker died stays ``running`` with a stale heartbeat;
+``manage.py resume_import_jobs`` hands such jobs to a worker again, and a
+failed job can be resumed through the API. Either way processing restarts
+at the line after the last committed chunk.
+"""
+import csv
+import json
+import logging
+import threading
+from datetime import timedelta
+from io import TextIOWrapper
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ImportJob
+from .product_import import MAX_REPORTED_ERRORS, import_products_csv, import_products_json_lines
+
+logger = logging.getLogger(__name__)
+
+STALE_AFTER = timedelta(minutes=5)
+IMPORTERS = {
+    ImportJob.KIND_CSV: import_products_csv,
+    ImportJob.KIND_JSON_LINES: import_products_json_lines,
+}
+# Line before the first data row: the CSV header, or nothing for JSON lines.
+FIRST_LINE = {ImportJob.KIND_CSV: 1, ImportJob.KIND_JSON_LINES: 0}
+
+_threads = set()
+
+
+def _count_rows(job):
+    with job.file.open("rb") as f:
+        text = TextIOWrapper(f, encoding="utf-8", newline="")
+        if job.kind == ImportJob.KIND_CSV:
+            return max(0, sum(1 for _ in csv.reader(text)) - 1)
+        return sum(1 for line in text if line.strip())
+
+
+def create_import_job(upload, kind, user=None, upsert=False, chunk_size=1000):
+    """Store ``upload`` (a Django ``File``) and queue it; returns the job."""
+    job = ImportJob(kind=kind, upsert=upsert, chunk_size=chunk_size, created_by=user, last_line=FIRST_LINE[kind])
+    job.file.save(upload.name or f"upload.{kind}", upload, save=False)
+    job.total_rows = _count_rows(job)
+    job.save()
+    enqueue(job)
+    return job
+
+
+def create_json_import_job(items, **kwargs):
+    """Queue a JSON array of products (as sent to the bulk upload), stored one object per line."""
+    body = "".join(json.dumps(item, default=str) + "\n" for item in items)
+    return create_import_job(ContentFile(body.encode(), name="upload.jsonl"), ImportJob.KIND_JSON_LINES, **kwargs)
+
+
+def enqueue(job):
+    transaction.on_commit(lambda: _dispatch(job.pk))
+
+
+def _dispatch(job_id):
+    if getattr(settings, "IMPORT_JOBS_BACKEND", "thread") == "celery":
+        from .tasks import run_import_job as task
+
+        task.delay(job_id)
+    else:
+        thread = threading.Thread(target=_run_in_thread, args=(job_id,), name=f"import-job-{job_id}", daemon=True)
+        _threads.add(thread)
+        thread.start()
+
+
+def _run_in_thread(job_id):
+    try:
+        run_import_job(job_id)
+    except Exception:
+        logger.exception("Import job %s failed", job_id)
+    finally:
+        connection.close()
+        _threads.discard(threading.current_thread())
+
+
+def wait_for_import_threads(timeout=None):
+    """Join the thread-backend workers started so far (tests, graceful shutdown)."""
+    for thread in list(_threads):
+        thread.join(timeout)
+
+
+def claim(job_id):
+    """Mark the job running if it is pending or its worker stopped heartbeating."""
+    now = timezone.now()
+    runnable = Q(status=ImportJob.STATUS_PENDING) | Q(status=ImportJob.STATUS_RUNNING, heartbeat_at__lt=now - STALE_AFTER)
+    return ImportJob.objects.filter(runnable, pk=job_id).update(status=ImportJob.STATUS_RUNNING, heartbeat_at=now) == 1
+
+
+def run_import_job(job_id):
+    """Process a job from its last checkpoint; returns the job, or ``None`` if another worker has it."""
+    close_old_connections()
+    if not claim(job_id):
+        return None
+    job = ImportJob.objects.get(pk=job_id)
+    base = {name: getattr(job, name) for name in ("processed", "created", "updated", "error_count")}
+    base_errors = list(job.errors)
+
+    def checkpoint(report):
+        ImportJob.objects.filter(pk=job.pk).update(
+            last_line=report["line"],
+            errors=(base_errors + report["errors"])[:MAX_REPORTED_ERRORS],
+            heartbeat_at=timezone.now(),
+            **{name: value + report[name] for name, value in base.items()},
+        )
+
+    try:
+        with job.file.open("rb") as f:
+            report = IMPORTERS[job.kind](
+                f, chunk_size=job.chunk_size, upsert=job.upsert, progress=checkpoint, start_line=job.last_line + 1
+            )
+    except Exception as exc:
+        ImportJob.objects.filter(pk=job.pk).update(
+            status=ImportJob.STATUS_FAILED, failure=f"{type(exc).__name__}: {exc}", finished_at=timezone.now()
+        )
+        raise
+    if not report["processed"] and report["errors"]:
+        # Rejected before any row was read (e.g. missing CSV columns).
+        outcome = {"status": ImportJob.STATUS_FAILED, "failure": str(report["errors"][0]["errors"])}
+    else:
+        outcome = {"status": ImportJob.STATUS_SUCCEEDED, "failure": ""}
+    ImportJob.objects.filter(pk=job.pk).update(finished_at=timezone.now(), **outcome)
+    job.refresh_from_db()
+    return job
+
+
+def resume(job):
+    """Queue a failed job again; it continues after its last committed chunk."""
+    updated = ImportJob.objects.filter(pk=job.pk, status=ImportJob.STATUS_FAILED).update(
+        status=ImportJob.STATUS_PENDING, failure="", finished_at=None
+    )
+    if updated:
+        enqueue(job)
+    return bool(updated)
+
+
+def resume_stalled_jobs():
+    """Queue every running job whose worker stopped heartbeating; returns their ids."""
+    stale = timezone.now() - STALE_AFTER
+    ids = list(
+        ImportJob.objects.filter(status=ImportJob.STATUS_RUNNING, heartbeat_at__lt=stale).values_list("id", flat=True)
+    )
+    for job_id in ids:
+        transaction.on_commit(lambda job_id=job_id: _dispatch(job_id))
+    return ids
@@ -0,0 +1,196 @@
+"""Stock reservation at order placement.
+
+Each product of an order is taken out of stock with one conditional
+statement::
+
+    UPDATE core_product SET stock_quantity = stock_quantity - n
+    WHERE id = ... AND stock_quantity >= n
+
+The check and the write are the same statement, so nothing is read into
+Python first and a hot row is locked only from its UPDATE to the end of the
+order's transaction. A concurrent order for the same product waits on that lock
+and then re-checks the condition against the committed stock. Products
+are updated in id order, so two orders sharing products lock them in the same
+order and cannot deadlock. A short product aborts the whole reservation with
+``OutOfStock``.
+
+Sharded products
+----------------
+A product every customer buys at once (a flash sale) still serializes its
+orders on that one row. ``shard_stock(product_id, n)`` moves its stock into
+``n`` ``StockShard`` rows; orders then decrement a random shard with the same
+conditional UPDATE, falling back to the other shards (in shard order) when the
+chosen one runs low. A shard another order drew on meanwhile is re-read, so
+contention alone never fails an order the total still covers.
+``Product.stock_quantity`` of a sharded product holds the total as of the last
+``shard_stock``/``rebalance_stock_shards``; filters and facets read that, while
+serializers show the live sum from ``stock_levels``.
+"""
+import random
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from . import fragments
+from .generations import PRODUCT_GENERATION, bump_generation
+from .models import Product, StockShard
+
+SHARDED_KEY = "inventory:sharded-products"
+
+
+class OutOfStock(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Insufficient stock."
+    default_code = "out_of_stock"
+
+    def __init__(self, shortages):
+        """``shortages`` are ``{"product", "requested", "available"}`` dicts."""
+        super().__init__()
+        self.shortages = shortages
+        # Keep ids and counts as numbers; APIException would turn them into strings.
+        self.detail = {"detail": self.default_detail, "code": self.default_code, "items": shortages}
+
+
+def reserve_stock(items):
+    """Take ``(product_id, quantity)`` pairs out of stock, all or nothing.
+
+    Call it inside the transaction that creates the order, so a failure later in
+    the order also returns the stock. Raises ``OutOfStock`` listing every
+    product that cannot be covered.
+    """
+    wanted = Counter()
+    for product_id, quantity in items:
+        wanted[product_id] += quantity
+    now = timezone.now()
+    with transaction.atomic():
+        for product_id in sorted(wanted):
+            reserved = Product.objects.filter(
+                pk=product_id, stock_shards=0, stock_quantity__gte=wanted[product_id],
+            ).update(stock_quantity=F("stock_quantity") - wanted[product_id], updated_at=now)
+            if not reserved and not _reserve_from_shards(product_id, wanted[product_id]):
+                # Stop taking row locks for an order that cannot go through; the
+                # rest of the report is read without them.
+                raise OutOfStock(_shortages(wanted, product_id))
+        fragments.invalidate(list(wanted))
+        bump_generation(PRODUCT_GENERATION)
+
+
+def _take(product_id, shard, quantity):
+    return StockShard.objects.filter(product_id=product_id, shard=shard, quantity__gte=quantity).update(
+        quantity=F("quantity") - quantity,
+    )
+
+
+def _reserve_from_shards(product_id, quantity):
+    shards = Product.objects.filter(pk=product_id).values_list("stock_shards", flat=True).first()
+    if not shards:
+        return False
+    if _take(product_id, random.randrange(shards), quantity):
+        return True
+    # The chosen shard ran low: take what is left elsewhere, in shard order.
+    levels = list(
+        StockShard.objects.filter(product_id=product_id, quantity__gt=0)
+        .order_by("shard").values_list("shard", "quantity")
+    )
+    if sum(level for _, level in levels) < quantity:
+        return False
+    # Undo partial takes if the shards run dry after all, so the shortage
+    # report sees the stock as it was.
+    savepoint = transaction.savepoint()
+    remaining = quantity
+    for shard, level in levels:
+        while level and remaining:
+            take = min(level, remaining)
+            if _take(product_id, shard, take):
+                remaining -= take
+                break
+            # Another order drew on this shard since it was read: take what it has
+            # now. A reshard may have removed it altogether: move on.
+            level = (
+                StockShard.objects.filter(product_id=product_id, shard=shard)
+                .values_list("quantity", flat=True).first() or 0
+            )
+        if not remaining:
+            transaction.savepoint_commit(savepoint)
+            return True
+    transaction.savepoint_rollback(savepoint)
+    return False
+
+
+def _shortages(wanted, failed_id):
+    available = stock_levels([pid for pid in wanted if pid >= failed_id])
+    return [
+        {"product": pid, "requested": wanted[pid], "available": available.get(pid, 0)}
+        for pid in sorted(available.keys() | {failed_id})
+        if pid == failed_id or available[pid] < wanted[pid]
+    ]
+
+
+def stock_levels(product_ids):
+    """Live ``{product_id: stock}``, summing the shards of sharded products."""
+    levels = dict(Product.objects.filter(pk__in=product_ids).values_list("id", "stock_quantity"))
+    sharded = sharded_product_ids() & set(levels)
+    if sharded:
+        totals = (
+            StockShard.objects.filter(product_id__in=sharded)
+            .values("product_id").annotate(total=Sum("quantity")).values_list("product_id", "total")
+        )
+        levels.update(totals)
+    return levels
+
+
+def sharded_product_ids():
+    """Ids of the products whose stock is sharded, cached until ``shard_stock`` changes them."""
+    ids = cache.get(SHARDED_KEY)
+    if ids is None:
+        ids = set(Product.objects.filter(stock_shards__gt=0).values_list("id", flat=True))
+        cache.set(SHARDED_KEY, ids, timeout=None)
+    return ids
+
+
+def shard_stock(product_id, shards, total=None):
+    """Spread a product's stock evenly over ``shards`` counters; 0 keeps it on the product row.
+
+    ``total`` replaces the stock; by default the current (summed) stock is
+    kept. Used to enable, resize and disable sharding, to rebalance, and to set
+    the stock of a sharded product.
+    """
+    with transaction.atomic():
+        product = Product.objects.select_for_update().get(pk=product_id)
+        held = list(StockShard.objects.select_for_update().filter(product_id=product_id).order_by("shard"))
+        if total is None:
+            total = sum(s.quantity for s in held) if product.stock_shards else product.stock_quantity
+        per_shard, extra = divmod(total, shards) if shards else (0, 0)
+        if len(held) == shards:
+            for shard in held:
+                shard.quantity = per_shard + (shard.shard < extra)
+            StockShard.objects.bulk_update(held, ["quantity"])
+        else:
+            StockShard.objects.filter(product_id=product_id).delete()
+            StockShard.objects.bulk_create(
+                StockShard(product_id=product_id, shard=i, quantity=per_shard + (i < extra)) for i in range(shards)
+            )
+        Product.objects.filter(pk=product_id).update(
+            stock_shards=shards, stock_quantity=total, updated_at=timezone.now(),
+        )
+        if bool(shards) != bool(product.stock_shards):
+            cache.delete(SHARDED_KEY)
+            transaction.on_commit(lambda: cache.delete(SHARDED_KEY))
+        fragments.invalidate([product_id])
+        bump_generation(PRODUCT_GENERATION)
+    return total
+
+
+def rebalance_stock_shards():
+    """Even out the shards of every sharded product and refresh its ``stock_quantity``.
+
+    Run periodically while a sale is on: orders drain random shards unevenly,
+    and a product whose stock is all in one shard loses the benefit of sharding.
+    """
+    products = Product.objects.filter(stock_shards__gt=0).values_list("id", "stock_shards")
+    return {product_id: shard_stock(product_id, shards) for product_id, shards in products}
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.category_bulk import CategoryPathResolver
+
+
+class Command(BaseCommand):
+    help = (
+        "Create every category path listed in a file (one path per line, e.g. 'All Products>Bakery>Bread') "
+        "in bulk, renumbering each affected tree once at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path_file", help="Text file with one category path per line.")
+        parser.add_argument("--separator", default=">", help="Separator between path segments (default '>').")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        sep = options["separator"]
+        try:
+            with open(options["path_file"], encoding="utf-8") as fh:
+                paths = [
+                    [seg.strip() for seg in line.split(sep) if seg.strip()]
+                    for line in fh
+                    if line.strip()
+                ]
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        resolver = CategoryPathResolver(batch_size=options["batch_size"])
+        resolved = resolver.resolve_many(paths)
+        self.stdout.write(self.style.SUCCESS(
+            f"Resolved {len(resolved)} paths; created {resolver.created} categories."
+        ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.inventory import rebalance_stock_shards, shard_stock
+
+
+class Command(BaseCommand):
+    help = (
+        "Even out the stock shards of every sharded product and refresh its stock_quantity. "
+        "With --product and --shards, (re)shard one product instead; --shards 0 turns sharding off."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--product", type=int, help="Product id to shard.")
+        parser.add_argument("--shards", type=int, help="Number of stock counters for --product.")
+
+    def handle(self, *args, **options):
+        if options["product"] is not None:
+            if options["shards"] is None or options["shards"] < 0:
+                raise CommandError("--product needs --shards N (N >= 0)")
+            total = shard_stock(options["product"], options["shards"])
+            self.stdout.write(f"Product {options['product']}: {total} in stock over {options['shards']} shard(s).")
+            return
+        totals = rebalance_stock_shards()
+        self.stdout.write(f"Rebalanced {len(totals)} sharded product(s).")
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Order
+from core.orders import refresh_order_totals
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored total_amount and item_count of every order from its items."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        ids = list(Order.objects.order_by("id").values_list("id", flat=True))
+        size = options["batch_size"]
+        for start in range(0, len(ids), size):
+            with transaction.atomic():
+                refresh_order_totals(ids[start:start + size])
+        self.stdout.write(f"Rebuilt totals of {len(ids)} order(s).")
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.category_tree import get_category_tree
+from core.models import CategoryPriceRollup
+from core.rollups import compute_rollups, subtree_price_stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild every CategoryPriceRollup row in bulk, then verify them against live aggregates."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true", help="Only verify the stored rollups; do not rebuild.")
+        parser.add_argument("--no-verify", action="store_true", help="Skip verification after rebuilding.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not options["check"]:
+            self.rebuild(options["batch_size"])
+            if options["no_verify"]:
+                return
+        mismatches = self.verify()
+        if mismatches:
+            for cid, stored, expected in mismatches[:20]:
+                self.stderr.write(f"category {cid}: stored {stored} != expected {expected}")
+            raise CommandError(f"{len(mismatches)} rollup(s) out of date")
+        self.stdout.write(self.style.SUCCESS("All price rollups verified."))
+
+    def rebuild(self, batch_size):
+        totals = compute_rollups()
+        rows = [
+            CategoryPriceRollup(category_id=cid, price_sum=s, product_count=c, min_price=lo, max_price=hi)
+            for cid, (s, c, lo, hi) in totals.items()
+        ]
+        with transaction.atomic():
+            CategoryPriceRollup.objects.all().delete()
+            CategoryPriceRollup.objects.bulk_create(rows, batch_size=batch_size)
+        self.stdout.write(f"Rebuilt {len(rows)} price rollups.")
+
+    def verify(self):
+        """Compare every category's stored rollup with the live grouped aggregate over its subtree."""
+        tree = get_category_tree()
+        stored = {
+            r.category_id: (r.price_sum, r.product_count, r.min_price, r.max_price)
+            for r in CategoryPriceRollup.objects.all()
+        }
+        live = subtree_price_stats()
+        mismatches = []
+        for cid in tree:
+            expected = live.get(cid, (0, 0, None, None))
+            current = stored.get(cid, (0, 0, None, None))
+            if current != expected:
+                mismatches.append((cid, current, expected))
+        return mismatches
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core.search import clear_index, ensure_search_index, fill_index
+
+
+class Command(BaseCommand):
+    help = "Create the product full-text index if needed and refill it from the product table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        ensure_search_index(connection)
+        with transaction.atomic():
+            clear_index()
+            total = fill_index(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} products."))
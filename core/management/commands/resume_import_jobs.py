@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.imports import STALE_AFTER, resume_stalled_jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-queue import jobs whose worker stopped heartbeating for more than "
+        f"{int(STALE_AFTER.total_seconds() // 60)} minutes; they resume after their last committed chunk."
+    )
+
+    def handle(self, *args, **options):
+        ids = resume_stalled_jobs()
+        self.stdout.write(f"Re-queued {len(ids)} stalled import job(s): {', '.join(map(str, ids)) or '-'}")
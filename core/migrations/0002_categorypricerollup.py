@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    """Roll up the existing catalog; writes keep the rollups current from here on."""
+    Category = apps.get_model("core", "Category")
+    Product = apps.get_model("core", "Product")
+    CategoryPriceRollup = apps.get_model("core", "CategoryPriceRollup")
+    parents = dict(Category.objects.values_list("id", "parent_id"))
+    links = (
+        Product.categories.through.objects.order_by("product_id")
+        .values_list("product_id", "category_id", "product__price")
+        .iterator(chunk_size=5000)
+    )
+    totals, seen, current = {}, set(), None
+    for product_id, category_id, price in links:
+        if product_id != current:
+            current, seen = product_id, set()
+        # A product listed under several descendants counts once per ancestor.
+        while category_id is not None and category_id not in seen:
+            seen.add(category_id)
+            entry = totals.setdefault(category_id, [0, 0, price, price])
+            entry[0] += price
+            entry[1] += 1
+            entry[2] = min(entry[2], price)
+            entry[3] = max(entry[3], price)
+            category_id = parents[category_id]
+    CategoryPriceRollup.objects.bulk_create(
+        [
+            CategoryPriceRollup(category_id=cid, price_sum=s, product_count=n, min_price=lo, max_price=hi)
+            for cid, (s, n, lo, hi) in totals.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryPriceRollup',
+            fields=[
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='price_rollup', serialize=False, to='core.category')),
+                ('price_sum', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('product_count', models.PositiveIntegerField(default=0)),
+                ('min_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('max_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+            ],
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
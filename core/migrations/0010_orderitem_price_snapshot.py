@@ -0,0 +1,47 @@
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill(apps, schema_editor):
+    """Price existing items at their product's current price: the price paid was never stored."""
+    OrderItem = apps.get_model("core", "OrderItem")
+    Product = apps.get_model("core", "Product")
+    Order = apps.get_model("core", "Order")
+    OrderItem.objects.update(
+        unit_price=Subquery(Product.objects.filter(pk=OuterRef("product_id")).values("price")[:1]),
+    )
+    OrderItem.objects.update(line_total=F("unit_price") * F("quantity"))
+    items = OrderItem.objects.filter(order_id=OuterRef("pk")).order_by().values("order_id")
+    Order.objects.update(
+        total_amount=Coalesce(
+            Subquery(items.annotate(total=Sum("line_total")).values("total")),
+            Value(Decimal("0.00")), output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        ),
+        item_count=Coalesce(Subquery(items.annotate(count=Sum("quantity")).values("count")), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_order_item_count_order_total_amount"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="orderitem",
+            name="unit_price",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="orderitem",
+            name="line_total",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.auth import get_user_model
 from mptt.models import MPTTModel, TreeForeignKey
 
@@ -39,10 +40,63 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     categories = models.ManyToManyField(Category, related_name='products')   # <-- many categories
     stock_quantity = models.PositiveIntegerField(default=0)
+    # >0: stock is held in that many StockShard rows and stock_quantity is the
+    # total as of the last rebalance (see core.inventory).
+    stock_shards = models.PositiveSmallIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Price-range and in-stock filters, and the facet aggregates over them.
+            models.Index(fields=["price", "stock_quantity"], name="product_price_stock_idx"),
+            models.Index(fields=["stock_quantity", "price"], name="product_stock_price_idx"),
+            # Upsert-by-name lookups in the CSV importer.
+            models.Index(fields=["name"], name="product_name_idx"),
+            # Incremental exports (?changed_since=).
+            models.Index(fields=["updated_at"], name="product_updated_idx"),
+        ]
 
     def __str__(self):
         return self.name
 
+class StockShard(models.Model):
+    """Part of a sharded product's stock, so concurrent orders update different rows.
+
+    Managed by ``core.inventory``; even out with ``manage.py rebalance_stock_shards``.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="stock_shard_rows")
+    shard = models.PositiveSmallIntegerField()
+    quantity = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["product", "shard"], name="stockshard_product_shard_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}#{self.shard}: {self.quantity}"
+
+class CategoryPriceRollup(models.Model):
+    """Price stats over every product in a category's subtree, each product counted once.
+
+    Maintained incrementally by ``core.rollups``; rebuild with
+    ``manage.py rebuild_price_rollups``.
+    """
+    category = models.OneToOneField(Category, on_delete=models.CASCADE, primary_key=True, related_name="price_rollup")
+    price_sum = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    product_count = models.PositiveIntegerField(default=0)
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.category_id}: {self.product_count} products"
+
+    @property
+    def average_price(self):
+        if not self.product_count:
+            return None
+        return self.price_sum / self.product_count
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -55,19 +109,134 @@ class Order(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name="orders")
     created_at = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    # Kept in step with the items by core.orders.
+    total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    item_count = models.PositiveIntegerField(default=0)  # units, not lines
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of order listings: ORDER BY created_at DESC, id DESC
+            models.Index(fields=["created_at", "id"], name="order_created_id_idx"),
+            # One customer's history in the same order: WHERE customer_id = ... ORDER BY created_at DESC, id DESC
+            models.Index(fields=["customer", "created_at", "id"], name="order_customer_created_idx"),
+        ]
 
     def __str__(self):
         return f"Order #{self.id}"
 
     @property
     def total_price(self):
-        return sum(item.total_price for item in self.items.all())
+        return self.total_amount
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.PROTECT)
     quantity = models.PositiveIntegerField(default=1)
+    # Price paid, copied from the product when the order is placed; order
+    # reads use these and never the live product price.
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    line_total = models.DecimalField(max_digits=12, decimal_places=2)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        item = super().from_db(db, field_names, values)
+        item._priced_product_id = item.__dict__.get("product_id")
+        return item
+
+    def save(self, *args, **kwargs):
+        # Snapshot on insert, and again if the line now points at another product.
+        repriced = self.product_id != getattr(self, "_priced_product_id", self.product_id)
+        price = self.product.price if self.unit_price is None or repriced else self.unit_price
+        self.unit_price = self._meta.get_field("unit_price").to_python(price)
+        self.line_total = self.unit_price * self.quantity
+        super().save(*args, **kwargs)
+        self._priced_product_id = self.product_id
 
     @property
     def total_price(self):
-        return self.product.price * self.quantity
+        return self.line_total
+
+class IdempotencyKey(models.Model):
+    """The response to an order POST that carried an ``Idempotency-Key`` header.
+
+    A client retrying with the same key gets this response back instead of a
+    second order. ``fingerprint`` hashes the request payload, so reusing a key
+    for a different order is refused rather than answered with the old one.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="idempotency_keys")
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    status_code = models.PositiveSmallIntegerField()
+    response = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # Also the index every replay is looked up by.
+            models.UniqueConstraint(fields=["user", "key"], name="idempotencykey_user_key_uniq"),
+        ]
+        indexes = [
+            # Purging expired keys.
+            models.Index(fields=["created_at"], name="idempotencykey_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.key} -> {self.status_code}"
+
+class ImportJob(models.Model):
+    """A stored product upload processed in the background by ``core.imports``.
+
+    ``last_line`` is the last line of the file whose chunk has been committed;
+    it is saved in the same transaction as that chunk, so a restarted job
+    continues right after it without duplicating or skipping rows.
+    """
+    KIND_CSV = "csv"
+    KIND_JSON_LINES = "jsonl"
+    KIND_CHOICES = [
+        (KIND_CSV, "CSV"),
+        (KIND_JSON_LINES, "JSON lines"),
+    ]
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_SUCCEEDED = "succeeded"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_SUCCEEDED, "Succeeded"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    file = models.FileField(upload_to="imports/")
+    upsert = models.BooleanField(default=False)
+    chunk_size = models.PositiveIntegerField(default=1000)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="import_jobs")
+    created_at = models.DateTimeField(auto_now_add=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    last_line = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    created = models.PositiveIntegerField(default=0)
+    updated = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    failure = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            # Finding stalled jobs to resume.
+            models.Index(fields=["status", "heartbeat_at"], name="importjob_status_beat_idx"),
+        ]
+
+    def __str__(self):
+        return f"Import #{self.id} ({self.status})"
+
+    @property
+    def progress(self):
+        if not self.total_rows:
+            return None
+        return min(1.0, self.processed / self.total_rows)
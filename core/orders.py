@@ -0,0 +1,95 @@
+"""Order items and stored order totals.
+
+Each ``OrderItem`` keeps the ``unit_price`` paid and its ``line_total``, copied
+from the product when the order is placed (``create_order_items``), so order
+reads never join products and old orders keep the prices they were sold at.
+
+``Order.total_amount`` and ``Order.item_count`` are computed once when an
+order is placed and again whenever one of its items is saved or deleted (the
+``OrderItem`` receivers in ``core.signals``), so reading an order never sums
+its items. Code that writes items in bulk sends no signals and must call
+``refresh_order_totals`` itself.
+
+Idempotency keys
+----------------
+An order POST may carry an ``Idempotency-Key`` header. The first successful
+response is stored as an ``IdempotencyKey`` row in the transaction that creates
+the order; a retry with the same key is answered from that row, found
+through its ``(user, key)`` unique index, without validating or creating
+anything. Keys are kept for ``IDEMPOTENCY_KEY_TTL`` (``purge_idempotency_keys``).
+"""
+import hashlib
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import IdempotencyKey, Order, OrderItem, Product
+
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+
+
+def product_prices(product_ids):
+    """``{product_id: price}`` for the ids that exist, from one query."""
+    return dict(Product.objects.filter(pk__in=set(product_ids)).values_list("id", "price"))
+
+
+def create_order_items(order, items, prices=None):
+    """Insert ``(product_id, quantity)`` lines for ``order`` with one ``bulk_create``.
+
+    ``prices`` is ``product_prices`` output already fetched while validating;
+    it is fetched here otherwise. Stores the order's totals as well; returns
+    the items.
+    """
+    items = list(items)
+    if prices is None:
+        prices = product_prices(product_id for product_id, _ in items)
+    rows = [
+        OrderItem(
+            order=order, product_id=product_id, quantity=quantity,
+            unit_price=prices[product_id], line_total=prices[product_id] * quantity,
+        )
+        for product_id, quantity in items
+    ]
+    OrderItem.objects.bulk_create(rows)
+    order.total_amount = sum((row.line_total for row in rows), Decimal("0.00"))
+    order.item_count = sum(row.quantity for row in rows)
+    Order.objects.filter(pk=order.pk).update(total_amount=order.total_amount, item_count=order.item_count)
+    return rows
+
+
+def order_totals(order_ids):
+    """``{order_id: (total_amount, item_count)}`` from one grouped query over the items."""
+    rows = (
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .values("order_id").annotate(total=Sum("line_total"), count=Sum("quantity"))
+        .values_list("order_id", "total", "count")
+    )
+    totals = {order_id: (Decimal("0.00"), 0) for order_id in order_ids}
+    totals.update((order_id, (total, count)) for order_id, total, count in rows)
+    return totals
+
+
+def refresh_order_totals(order_ids):
+    """Recompute and store the totals of ``order_ids``; return them as ``order_totals`` does."""
+    totals = order_totals(list(order_ids))
+    Order.objects.bulk_update(
+        [Order(pk=order_id, total_amount=total, item_count=count) for order_id, (total, count) in totals.items()],
+        ["total_amount", "item_count"],
+    )
+    return totals
+
+
+def request_fingerprint(data):
+    """A stable hash of a parsed request payload, to tell a retry from a reused key."""
+    payload = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def purge_idempotency_keys(older_than=IDEMPOTENCY_KEY_TTL):
+    """Delete keys stored more than ``older_than`` ago; return how many went."""
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=timezone.now() - older_than).delete()
+    return deleted
@@ -0,0 +1,161 @@
+"""Keyset (cursor) pagination.
+
+Pages are addressed by the sort key of the last row seen, not by an offset, so
+fetching page 10,000 is the same indexed range scan as fetching page 1. The
+view's ``keyset_ordering`` must end in a unique field (``id``) so the order is
+total and stable; back it with a matching index.
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def encode_cursor(payload):
+    """Opaque, URL-safe cursor for a JSON-serialisable payload."""
+    raw = json.dumps(payload, default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(encoded):
+    """Inverse of ``encode_cursor``; raises ``ValueError`` on anything malformed."""
+    try:
+        return json.loads(base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4)))
+    except Exception as exc:
+        raise ValueError("invalid cursor") from exc
+
+
+def cursor_link(request, cursor, param="cursor"):
+    """The current URL with ``param`` replaced by ``cursor``."""
+    url = remove_query_param(request.build_absolute_uri(), param)
+    return replace_query_param(url, param, cursor)
+
+
+class KeysetPagination(BasePagination):
+    page_size = 50
+    max_page_size = 500
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    ordering = ("id",)
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_ordering(self, view):
+        return tuple(getattr(view, "keyset_ordering", self.ordering))
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(view)
+        self.fields = [queryset.model._meta.get_field(f.lstrip("-")) for f in self.ordering]
+
+        reverse, key = self.decode_cursor(request)
+        ordering = [self._flip(f) for f in self.ordering] if reverse else list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if key is not None:
+            queryset = queryset.filter(self._after(ordering, key))
+
+        rows = list(queryset[: self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = key is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, key is not None
+        self.first_key = self._key(rows[0]) if rows else None
+        self.last_key = self._key(rows[-1]) if rows else None
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next or self.last_key is None:
+            return None
+        return self._link(False, self.last_key)
+
+    def get_previous_link(self):
+        if not self.has_previous or self.first_key is None:
+            return None
+        return self._link(True, self.first_key)
+
+    # -- cursor encoding ------------------------------------------------------
+
+    def encode_cursor(self, reverse, key):
+        values = [f.get_prep_value(v) if v is not None else None for f, v in zip(self.fields, key)]
+        return encode_cursor({"r": int(reverse), "k": values})
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return False, None
+        try:
+            payload = decode_cursor(encoded)
+            values = payload["k"]
+            if len(values) != len(self.fields):
+                raise ValueError
+            key = [f.to_python(v) for f, v in zip(self.fields, values)]
+            return bool(payload.get("r")), key
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def _link(self, reverse, key):
+        return cursor_link(self.request, self.encode_cursor(reverse, key), self.cursor_query_param)
+
+    # -- keyset predicate -------------------------------------------------------
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    def _key(self, obj):
+        if isinstance(obj, dict):  # values() rows
+            return [obj[f.name] for f in self.fields]
+        return [getattr(obj, f.attname) for f in self.fields]
+
+    @staticmethod
+    def _after(ordering, key):
+        """Rows strictly after ``key`` in ``ordering``: (a > x) or (a = x and b > y) ...
+
+        With more than one column the redundant ``a >= x`` is ANDed in front:
+        planners cannot seek an index on the OR alone, so without it a deep
+        page would scan every earlier entry of the index range.
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, key):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        if len(ordering) > 1:
+            first = ordering[0]
+            bound = "lte" if first.startswith("-") else "gte"
+            condition = Q(**{f"{first.lstrip('-')}__{bound}": key[0]}) & condition
+        return condition
@@ -0,0 +1,161 @@
+"""Bulk product writes that keep derived state in step.
+
+``bulk_create``/``bulk_update`` send no model signals, so everything the
+Product receivers in ``core.signals`` maintain is updated here once per batch
+instead: category price rollups, the search index, serialized fragments and
+the product change generation.
+
+    products = create_products([(Product(name="Apple", price=1), [fruit_id]), ...])
+"""
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import fragments
+from .category_tree import get_category_tree
+from .generations import PRODUCT_GENERATION, bump_generation
+from .inventory import shard_stock
+from .models import Product
+from .rollups import apply_bulk_changes, category_closure, product_closures
+from .search import index_products
+
+Link = Product.categories.through
+
+
+def _links(entries):
+    return [
+        Link(product_id=product.pk, category_id=cid)
+        for product, category_ids in entries
+        for cid in dict.fromkeys(category_ids)
+    ]
+
+
+def _closures(entries):
+    tree = get_category_tree()
+    return {product.pk: (category_closure(tree, category_ids), product.price) for product, category_ids in entries}
+
+
+def _write_fields(products, fields, batch_size):
+    """``bulk_update`` without the per-row CASE expressions: one ``executemany`` UPDATE.
+
+    Also stamps ``updated_at``, as ``save()`` would, so incremental exports see the rows.
+    """
+    now = timezone.now()
+    for product in products:
+        product.updated_at = now
+    fields = [*fields, "updated_at"]
+    model_fields = [Product._meta.get_field(name) for name in fields]
+    assignments = ", ".join(f"{connection.ops.quote_name(f.column)} = %s" for f in model_fields)
+    sql = f"UPDATE {Product._meta.db_table} SET {assignments} WHERE id = %s"
+    rows = [
+        [f.get_db_prep_save(getattr(product, f.attname), connection) for f in model_fields] + [product.pk]
+        for product in products
+    ]
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(sql, rows[start:start + batch_size])
+
+
+def create_products(entries, batch_size=1000):
+    """Insert ``(unsaved Product, category_ids)`` pairs; return the saved products."""
+    entries = list(entries)
+    products = [product for product, _ in entries]
+    if not products:
+        return []
+    with transaction.atomic():
+        Product.objects.bulk_create(products, batch_size=batch_size)
+        Link.objects.bulk_create(_links(entries), batch_size=batch_size)
+        apply_bulk_changes({}, _closures(entries))
+        index_products(products)
+        bump_generation(PRODUCT_GENERATION)
+    return products
+
+
+def update_products(entries, fields, batch_size=1000):
+    """Write ``fields`` of ``(saved Product, category_ids)`` pairs and replace their category links.
+
+    The stock of a sharded product is spread over its shards, as in
+    ``update_price_and_stock``.
+    """
+    entries = list(entries)
+    products = [product for product, _ in entries]
+    if not products:
+        return []
+    ids = [product.pk for product in products]
+    with transaction.atomic():
+        closures = product_closures(ids)
+        prices, shards = {}, {}
+        for pid, price, stock_shards in Product.objects.filter(pk__in=ids).values_list("id", "price", "stock_shards"):
+            prices[pid] = price
+            if stock_shards:
+                shards[pid] = stock_shards
+        before = {pid: (closures.get(pid, set()), price) for pid, price in prices.items()}
+        _write_fields(products, fields, batch_size)
+        if "stock_quantity" in fields:
+            for product in products:
+                if product.pk in shards:
+                    shard_stock(product.pk, shards[product.pk], total=product.stock_quantity)
+        Link.objects.filter(product_id__in=ids).delete()
+        Link.objects.bulk_create(_links(entries), batch_size=batch_size)
+        apply_bulk_changes(before, _closures(entries))
+        index_products(products)
+        fragments.invalidate(ids)
+        bump_generation(PRODUCT_GENERATION)
+    return products
+
+
+def update_price_and_stock(changes, batch_size=1000):
+    """Apply ``{product_id: {"price": ..., "stock_quantity": ...}}`` (either key optional).
+
+    Values already current are not written. Returns ``(updated_ids, missing_ids)``.
+    Only what the change can affect is invalidated: rollups for products whose
+    price moved, plus fragments and the product generation for every written
+    row; the search index covers name/description and is left alone. The
+    stock of a sharded product is always written, spread over its shards.
+    """
+    ids = list(changes)
+    with transaction.atomic():
+        # Lock the rows before reading them: the rollup deltas are computed from
+        # these prices, so a save landing between read and write would drift them.
+        current = {}
+        for start in range(0, len(ids), batch_size):
+            rows = Product.objects.select_for_update().filter(pk__in=ids[start:start + batch_size]).order_by("pk")
+            for pid, price, stock, shards in rows.values_list("id", "price", "stock_quantity", "stock_shards"):
+                current[pid] = {"price": price, "stock_quantity": stock, "shards": shards}
+        missing = [pid for pid in ids if pid not in current]
+
+        groups = defaultdict(list)
+        price_moves = {}
+        restocked = {}
+        for pid, values in changes.items():
+            if pid not in current:
+                continue
+            if current[pid]["shards"] and "stock_quantity" in values:
+                values = dict(values)
+                restocked[pid] = values.pop("stock_quantity")
+            new = {name: value for name, value in values.items() if value != current[pid][name]}
+            if not new:
+                continue
+            groups[tuple(sorted(new))].append(Product(pk=pid, **new))
+            if "price" in new:
+                price_moves[pid] = (current[pid]["price"], new["price"])
+        updated = [product.pk for products in groups.values() for product in products]
+        updated = list(dict.fromkeys(updated + list(restocked)))
+        if not updated:
+            return updated, missing
+
+        for fields, products in groups.items():
+            _write_fields(products, fields, batch_size)
+        for pid, quantity in restocked.items():
+            shard_stock(pid, current[pid]["shards"], total=quantity)
+        moved = list(price_moves)
+        for start in range(0, len(moved), batch_size):
+            closures = product_closures(moved[start:start + batch_size])
+            apply_bulk_changes(
+                {pid: (closure, price_moves[pid][0]) for pid, closure in closures.items()},
+                {pid: (closure, price_moves[pid][1]) for pid, closure in closures.items()},
+            )
+        fragments.invalidate(updated)
+        bump_generation(PRODUCT_GENERATION)
+    return updated, missing
@@ -0,0 +1,106 @@
+"""Streaming catalog export as CSV or NDJSON.
+
+Products are read in id order with ``iterator(chunk_size=...)``; the category
+links of each chunk come from one query on the through table and are turned
+into name paths with the worker's ``CategoryTree`` snapshot, so memory is
+bounded by the chunk size, not the catalog. Output is yielded in blocks of
+roughly ``buffer_size`` characters for ``StreamingHttpResponse``.
+
+With ``changed_since`` only products saved at or after that time are
+exported; category link changes and renamed, moved or deleted categories
+stamp their products too (``core.signals``). Deleted products leave no row
+behind and are not reported. Sharded products export their live stock, but
+orders drawing on the shards do not stamp the product, so a stock-only change
+of a sharded product shows up in the next full export (or after its next
+``shard_stock``/rebalance).
+"""
+import csv
+import json
+from collections import defaultdict
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .category_tree import get_category_tree
+from .inventory import sharded_product_ids, stock_levels
+from .models import Product
+from .product_import import iter_chunks
+
+EXPORT_CHUNK_SIZE = 2000
+BUFFER_SIZE = 64 * 1024
+COLUMNS = ["id", "name", "description", "price", "stock_quantity", "updated_at", "category_paths"]
+# CSV only: names within a path as the importer reads them, paths joined by ";".
+PATH_SEPARATOR = " > "
+PATHS_SEPARATOR = ";"
+
+Link = Product.categories.through
+
+
+def export_rows(queryset=None, changed_since=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield one dict per product of ``queryset`` (all by default), with ``category_paths`` as lists of names."""
+    tree = get_category_tree()
+    paths = {}
+    queryset = (Product.objects.all() if queryset is None else queryset).order_by("id")
+    if changed_since is not None:
+        queryset = queryset.filter(updated_at__gte=changed_since)
+    rows = queryset.values_list(*COLUMNS[:-1]).iterator(chunk_size=chunk_size)
+    sharded = sharded_product_ids()
+    for chunk in iter_chunks(rows, chunk_size):
+        sharded_ids = [row[0] for row in chunk if row[0] in sharded]
+        live = stock_levels(sharded_ids) if sharded_ids else {}
+        links = defaultdict(list)
+        linked = Link.objects.filter(product_id__in=[row[0] for row in chunk]).order_by("category_id")
+        for pid, cid in linked.values_list("product_id", "category_id"):
+            if cid not in paths and cid in tree:
+                paths[cid] = tree.path(cid)
+            if cid in paths:  # else created after the snapshot was taken
+                links[pid].append(paths[cid])
+        for row in chunk:
+            record = dict(zip(COLUMNS, row))
+            record["updated_at"] = record["updated_at"].isoformat()
+            record["category_paths"] = links[row[0]]
+            if row[0] in live:
+                record["stock_quantity"] = live[row[0]]
+            yield record
+
+
+class _Line:
+    """File-like for ``csv.writer`` that hands back what was written."""
+
+    def write(self, value):
+        return value
+
+
+def _buffered(pieces, buffer_size):
+    buf, size = [], 0
+    for piece in pieces:
+        buf.append(piece)
+        size += len(piece)
+        if size >= buffer_size:
+            yield "".join(buf)
+            buf, size = [], 0
+    if buf:
+        yield "".join(buf)
+
+
+def iter_csv(records, buffer_size=BUFFER_SIZE):
+    writer = csv.writer(_Line())
+
+    def lines():
+        yield writer.writerow(COLUMNS)
+        for record in records:
+            record["category_paths"] = PATHS_SEPARATOR.join(
+                PATH_SEPARATOR.join(path) for path in record["category_paths"]
+            )
+            yield writer.writerow([record[column] for column in COLUMNS])
+
+    return _buffered(lines(), buffer_size)
+
+
+def iter_ndjson(records, buffer_size=BUFFER_SIZE):
+    return _buffered((json.dumps(record, cls=DjangoJSONEncoder) + "\n" for record in records), buffer_size)
+
+
+FORMATS = {
+    "csv": (iter_csv, "text/csv"),
+    "ndjson": (iter_ndjson, "application/x-ndjson"),
+}
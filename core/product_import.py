@@ -0,0 +1,195 @@
+"""Streaming product imports from CSV and JSON-lines files.
+
+Rows are read incrementally and written every ``chunk_size`` rows with
+``bulk_create`` in their own transaction, so memory and transaction length
+stay bounded by the chunk size, not the file. The ``progress`` callback runs
+inside each chunk's transaction, after its rows are written: a checkpoint
+saved there commits (or rolls back) together with the rows it describes,
+which is what lets ``core.imports`` resume a crashed job from its last
+committed chunk via ``start_line``.
+"""
+import csv
+import json
+from io import TextIOWrapper
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import as_serializer_error
+
+from .category_bulk import CategoryPathResolver
+from .models import Product
+from .product_bulk import create_products, update_products
+from .serializers import ProductImportSerializer
+
+DEFAULT_CHUNK_SIZE = 1000
+# Only the first errors are kept in the report; ``error_count`` has the total.
+MAX_REPORTED_ERRORS = 100
+UPSERT_FIELDS = ["description", "price", "stock_quantity"]
+CSV_REQUIRED_COLUMNS = {"name", "price", "category_path"}
+_row_serializer = ProductImportSerializer()
+
+
+def parse_category_path(raw: str) -> list:
+    """Accept 'A>B>C' or 'A/B/C' or 'A|B|C' -> [A, B, C]."""
+    if not raw:
+        return []
+    for sep in [">", "/", "|"]:
+        if sep in raw:
+            return [seg.strip() for seg in raw.split(sep) if seg.strip()]
+    return [raw.strip()]
+
+
+def parse_row(row: Dict[str, str]) -> Tuple[dict, list]:
+    """Return ``(product fields, category path)`` for one CSV row.
+
+    The row is validated with ``ProductImportSerializer``, like a JSON-lines
+    row, so a bad value is reported against its line (``ValidationError``)
+    instead of failing the chunk's write.
+    """
+    data = {
+        "name": (row.get("name") or "").strip(),
+        "description": (row.get("description") or "").strip(),
+        "price": (row.get("price") or "").strip(),
+        "category_path": parse_category_path(row.get("category_path") or ""),
+    }
+    stock_quantity = (row.get("stock_quantity") or "").strip()
+    if stock_quantity:
+        data["stock_quantity"] = stock_quantity
+    fields = _row_serializer.run_validation(data)
+    return fields, fields.pop("category_path")
+
+
+def iter_chunks(rows, size: int) -> Iterator[list]:
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def new_report() -> Dict:
+    return {"processed": 0, "created": 0, "updated": 0, "line": 0, "error_count": 0, "errors": []}
+
+
+def add_error(report: Dict, line: int, message) -> None:
+    report["error_count"] += 1
+    if len(report["errors"]) < MAX_REPORTED_ERRORS:
+        report["errors"].append({"index": line, "errors": message})
+
+
+def _write_chunk(parsed, resolver, upsert, report):
+    """Write one chunk of ``(fields, path)``; the caller owns the transaction."""
+    category_ids = resolver.resolve_many(path for _, path in parsed)
+    existing = {}
+    if upsert:
+        # Later rows for the same name win, within the chunk and over the table.
+        by_name = {}
+        for fields, path in parsed:
+            by_name[fields["name"]] = (fields, path)
+        report["updated"] += len(parsed) - len(by_name)
+        for name, pk in Product.objects.filter(name__in=list(by_name)).order_by("id").values_list("name", "id"):
+            existing.setdefault(name, pk)
+        parsed = list(by_name.values())
+    new, changed = [], []
+    for fields, path in parsed:
+        pk = existing.get(fields["name"])
+        entry = (Product(pk=pk, **fields), [category_ids[tuple(path)]])
+        (changed if pk is not None else new).append(entry)
+    create_products(new)
+    update_products(changed, UPSERT_FIELDS)
+    report["created"] += len(new)
+    report["updated"] += len(changed)
+
+
+def import_rows(
+    rows: Iterable[Tuple[int, Callable[[], Tuple[dict, list]]]],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    upsert: bool = False,
+    progress: Optional[Callable[[dict], None]] = None,
+) -> Dict:
+    """Import ``(line, parse)`` pairs, where ``parse()`` returns ``(fields, path)`` or raises."""
+    report = new_report()
+    resolver = CategoryPathResolver()
+    for chunk in iter_chunks(rows, chunk_size):
+        parsed: List[Tuple[dict, list]] = []
+        for line, parse in chunk:
+            try:
+                parsed.append(parse())
+            except ValidationError as exc:
+                add_error(report, line, as_serializer_error(exc))
+            except Exception as e:
+                add_error(report, line, str(e))
+        with transaction.atomic():
+            if parsed:
+                _write_chunk(parsed, resolver, upsert, report)
+            report["processed"] += len(chunk)
+            report["line"] = chunk[-1][0]
+            if progress:
+                progress(report)
+    return report
+
+
+def import_products_csv(
+    file_obj,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    upsert: bool = False,
+    progress: Optional[Callable[[dict], None]] = None,
+    start_line: int = 2,
+) -> Dict:
+    """Stream products from a CSV file-like, committing every ``chunk_size`` rows.
+
+    Required columns: name, price, category_path
+    Optional columns: description, stock_quantity
+
+    With ``upsert`` a row whose name matches an existing product updates it
+    instead of adding a duplicate. ``progress`` is called with the running
+    report after every chunk. ``start_line`` skips data rows before that line
+    (e.g. to resume after the last committed chunk).
+
+    Returns dict with processed/created/updated counts, the last line read, and
+    errors (line-indexed, capped at MAX_REPORTED_ERRORS; see error_count).
+    """
+    reader = csv.DictReader(TextIOWrapper(file_obj, encoding="utf-8", newline=""))
+    missing = CSV_REQUIRED_COLUMNS - set([h.strip() for h in reader.fieldnames or []])
+    if missing:
+        report = new_report()
+        add_error(report, -1, f"Missing columns: {', '.join(sorted(missing))}")
+        return report
+
+    rows = enumerate(reader, start=2)  # 1-based header, so first data row is 2
+    if start_line > 2:
+        rows = islice(rows, start_line - 2, None)
+    return import_rows(
+        ((line, lambda row=row: parse_row(row)) for line, row in rows),
+        chunk_size=chunk_size, upsert=upsert, progress=progress,
+    )
+
+
+def import_products_json_lines(
+    file_obj,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    upsert: bool = False,
+    progress: Optional[Callable[[dict], None]] = None,
+    start_line: int = 1,
+) -> Dict:
+    """Like ``import_products_csv`` for one JSON object per line, as accepted by the bulk upload.
+
+    Each object is validated with ``ProductImportSerializer``; its
+    ``category_path`` is a list of names.
+    """
+    serializer = ProductImportSerializer()
+
+    def parse(raw):
+        data = serializer.run_validation(json.loads(raw))
+        return data, data.pop("category_path")
+
+    lines = enumerate(TextIOWrapper(file_obj, encoding="utf-8"), start=1)
+    if start_line > 1:
+        lines = islice(lines, start_line - 1, None)
+    return import_rows(
+        ((line, lambda raw=raw: parse(raw)) for line, raw in lines if raw.strip()),
+        chunk_size=chunk_size, upsert=upsert, progress=progress,
+    )
@@ -0,0 +1,280 @@
+"""Incremental maintenance of ``CategoryPriceRollup``.
+
+A product contributes its price once to every category in the *closure* of its
+categories: the categories themselves plus all of their ancestors. When a
+product's price or its ``categories`` change, only the categories whose closure
+membership or totals actually changed are touched, with one UPDATE per distinct
+delta. Sum and count are pure deltas; min/max are widened in place and only
+re-aggregated for categories whose current bound was the price that went away.
+
+Moving or deleting a category changes the closures of the products under it;
+``core.signals`` diffs those closures around the change the same way.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import DecimalField, F, Max, Min, Q, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+
+from .category_tree import get_category_tree
+from .models import Category, CategoryPriceRollup, Product
+
+PRICE_FIELD = Product._meta.get_field("price")
+
+
+def category_closure(tree, category_ids):
+    """Return ``category_ids`` plus every ancestor of them."""
+    closure = set()
+    for cid in category_ids:
+        if cid in tree and cid not in closure:
+            closure.update(tree.ancestor_ids(cid))
+    return closure
+
+
+def product_closures(product_ids):
+    """Return ``{product_id: closure}`` for the given products, in one query."""
+    tree = get_category_tree()
+    links = defaultdict(list)
+    rows = Product.categories.through.objects.filter(product_id__in=product_ids).values_list("product_id", "category_id")
+    for product_id, category_id in rows:
+        links[product_id].append(category_id)
+    return {pid: category_closure(tree, links.get(pid, ())) for pid in product_ids}
+
+
+def _price(value):
+    return Value(value, output_field=DecimalField(max_digits=PRICE_FIELD.max_digits, decimal_places=PRICE_FIELD.decimal_places))
+
+
+def apply_price_change(category_ids, removed_price=None, added_price=None):
+    """Move one product's contribution on ``category_ids`` from ``removed_price`` to ``added_price``.
+
+    ``None`` on either side means the product is leaving or joining those
+    categories rather than changing price.
+    """
+    removed_price = PRICE_FIELD.to_python(removed_price)
+    added_price = PRICE_FIELD.to_python(added_price)
+    if not category_ids or removed_price == added_price:
+        return
+    category_ids = list(category_ids)
+    delta_sum = (added_price or 0) - (removed_price or 0)
+    delta_count = (added_price is not None) - (removed_price is not None)
+    updates = {"price_sum": F("price_sum") + delta_sum, "product_count": F("product_count") + delta_count}
+    if added_price is not None:
+        updates["min_price"] = Least(Coalesce("min_price", _price(added_price)), _price(added_price))
+        updates["max_price"] = Greatest(Coalesce("max_price", _price(added_price)), _price(added_price))
+
+    with transaction.atomic():
+        CategoryPriceRollup.objects.bulk_create(
+            [CategoryPriceRollup(category_id=cid) for cid in category_ids], ignore_conflicts=True
+        )
+        CategoryPriceRollup.objects.filter(category_id__in=category_ids).update(**updates)
+        if removed_price is not None:
+            stale = CategoryPriceRollup.objects.filter(category_id__in=category_ids).filter(
+                Q(min_price=removed_price) | Q(max_price=removed_price) | Q(product_count=0)
+            )
+            refresh_bounds(stale.values_list("category_id", flat=True))
+
+
+def refresh_bounds(category_ids):
+    """Re-aggregate min/max price for the given categories from their subtrees."""
+    tree = get_category_tree()
+    for cid in list(category_ids):
+        bounds = Product.objects.filter(categories__in=tree.descendant_ids(cid)).aggregate(
+            min_price=Min("price"), max_price=Max("price")
+        )
+        CategoryPriceRollup.objects.filter(category_id=cid).update(**bounds)
+
+
+def apply_closure_changes(before, after, prices):
+    """Apply membership changes between two ``{product_id: closure}`` maps."""
+    for product_id, old in before.items():
+        new = after.get(product_id, set())
+        price = prices.get(product_id)
+        if price is None:
+            continue
+        apply_price_change(new - old, added_price=price)
+        apply_price_change(old - new, removed_price=price)
+
+
+def subtree_products(category_id):
+    """Return ``{product_id: (category_ids, price)}`` for every product linked under ``category_id``."""
+    tree = get_category_tree()
+    through = Product.categories.through.objects
+    under = through.filter(category_id__in=tree.descendant_ids(category_id)).values("product_id")
+    products = {}
+    for product_id, cid, price in through.filter(product_id__in=under).values_list(
+        "product_id", "category_id", "product__price"
+    ):
+        products.setdefault(product_id, ([], price))[0].append(cid)
+    return products
+
+
+def apply_category_move(category_id, old_parent_id):
+    """Move the contribution of a re-parented subtree from its old ancestors to its new ones.
+
+    Call it once the tree has moved: inside the subtree and outside it, every
+    ancestry is unchanged except that the old parent's chain is swapped for the
+    new one.
+    """
+    tree = get_category_tree()
+    subtree = set(tree.descendant_ids(category_id))
+    old_chain = tree.ancestor_ids(old_parent_id) if old_parent_id in tree else []
+    before, after = {}, {}
+    for product_id, (category_ids, price) in subtree_products(category_id).items():
+        closure = category_closure(tree, [cid for cid in category_ids if cid not in subtree])
+        for cid in category_ids:
+            if cid in subtree:
+                closure.update(c for c in tree.ancestor_ids(cid) if c in subtree)
+                closure.update(old_chain)
+        before[product_id] = (closure, price)
+        after[product_id] = (category_closure(tree, category_ids), price)
+    apply_bulk_changes(before, after)
+
+
+def apply_bulk_changes(before, after):
+    """Apply many products' changes at once.
+
+    ``before`` and ``after`` map ``product_id`` to ``(closure, price)``; a
+    product missing from one side is joining or leaving. Deltas are summed per
+    category first, so the cost follows the number of touched categories rather
+    than the number of products, and one ``executemany`` UPDATE covers them
+    all. Bounds are re-aggregated only where a removed price may have been the
+    current min/max.
+    """
+    deltas = {}
+    removed = defaultdict(set)
+
+    def move(cid, price, sign):
+        delta = deltas.setdefault(cid, [Decimal(0), 0, None, None])
+        delta[0] += sign * price
+        delta[1] += sign
+        if sign > 0:
+            delta[2] = price if delta[2] is None else min(delta[2], price)
+            delta[3] = price if delta[3] is None else max(delta[3], price)
+        else:
+            removed[cid].add(price)
+
+    for product_id in before.keys() | after.keys():
+        old_closure, old_price = before.get(product_id, ((), None))
+        new_closure, new_price = after.get(product_id, ((), None))
+        old_price, new_price = PRICE_FIELD.to_python(old_price), PRICE_FIELD.to_python(new_price)
+        leaving, joining = set(old_closure), set(new_closure)
+        if old_price == new_price:
+            leaving, joining = leaving - joining, joining - leaving
+        if old_price is not None:
+            for cid in leaving:
+                move(cid, old_price, -1)
+        if new_price is not None:
+            for cid in joining:
+                move(cid, new_price, 1)
+
+    changed = [(cid, delta) for cid, delta in deltas.items() if delta[1] or delta[0] or delta[2] is not None]
+    if not changed:
+        return
+
+    table = CategoryPriceRollup._meta.db_table
+    adapt = connection.ops.adapt_decimalfield_value
+    # Plain-SQL min/max so one statement serves every category via executemany.
+    sql = (
+        f"UPDATE {table} SET price_sum = price_sum + %s, product_count = product_count + %s, "
+        f"min_price = CASE WHEN %s IS NULL THEN min_price WHEN min_price IS NULL OR min_price > %s THEN %s ELSE min_price END, "
+        f"max_price = CASE WHEN %s IS NULL THEN max_price WHEN max_price IS NULL OR max_price < %s THEN %s ELSE max_price END "
+        f"WHERE category_id = %s"
+    )
+    params = []
+    for cid, (total, count, low, high) in changed:
+        low, high = adapt(low, 10, 2), adapt(high, 10, 2)
+        params.append((adapt(total, 16, 2), count, low, low, low, high, high, high, cid))
+    with transaction.atomic():
+        CategoryPriceRollup.objects.bulk_create(
+            [CategoryPriceRollup(category_id=cid) for cid, _ in changed], ignore_conflicts=True
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+        if removed:
+            prices = set().union(*removed.values())
+            stale = CategoryPriceRollup.objects.filter(category_id__in=list(removed)).filter(
+                Q(min_price__in=prices) | Q(max_price__in=prices) | Q(product_count=0)
+            )
+            refresh_bounds(stale.values_list("category_id", flat=True))
+
+
+def compute_rollups():
+    """Compute every rollup from scratch: ``{category_id: [sum, count, min, max]}``.
+
+    Reads each (product, category, price) link once, ordered by product, so
+    memory is bounded by the number of categories rather than products.
+    """
+    tree = get_category_tree()
+    totals = {}
+    rows = (
+        Product.categories.through.objects.order_by("product_id")
+        .values_list("product_id", "category_id", "product__price")
+        .iterator(chunk_size=5000)
+    )
+
+    def flush(category_ids, price):
+        for cid in category_closure(tree, category_ids):
+            entry = totals.get(cid)
+            if entry is None:
+                totals[cid] = [price, 1, price, price]
+            else:
+                entry[0] += price
+                entry[1] += 1
+                entry[2] = min(entry[2], price)
+                entry[3] = max(entry[3], price)
+
+    current, current_price, current_categories = None, None, []
+    for product_id, category_id, price in rows:
+        if product_id != current:
+            if current is not None:
+                flush(current_categories, current_price)
+            current, current_price, current_categories = product_id, price, []
+        current_categories.append(category_id)
+    if current is not None:
+        flush(current_categories, current_price)
+    return totals
+
+
+def _to_price(value):
+    if value is None or isinstance(value, Decimal):
+        return value
+    # SQLite hands back float/int aggregates for decimal columns.
+    return Decimal(str(value)).quantize(Decimal("0.01"))
+
+
+def subtree_price_stats(category_ids=None):
+    """Live ``{category_id: (sum, count, min, max)}`` for each category's subtree.
+
+    One grouped query: every requested category is joined to the products of
+    its MPTT range, ``(category, product)`` pairs are de-duplicated so a product
+    listed under several descendants counts once, and the pairs are grouped per
+    category. Categories without products are absent from the result.
+    ``None`` computes every category.
+    """
+    where, params = "", []
+    if category_ids is not None:
+        params = list(category_ids)
+        if not params:
+            return {}
+        where = "WHERE root.id IN ({})".format(", ".join(["%s"] * len(params)))
+    sql = f"""
+        SELECT pairs.root_id, SUM(pairs.price), COUNT(*), MIN(pairs.price), MAX(pairs.price)
+        FROM (
+            SELECT DISTINCT root.id AS root_id, p.id AS product_id, p.price AS price
+            FROM {Category._meta.db_table} root
+            JOIN {Category._meta.db_table} node
+                ON node.tree_id = root.tree_id AND node.lft >= root.lft AND node.rght <= root.rght
+            JOIN {Product.categories.through._meta.db_table} link ON link.category_id = node.id
+            JOIN {Product._meta.db_table} p ON p.id = link.product_id
+            {where}
+        ) pairs
+        GROUP BY pairs.root_id
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {
+            cid: (_to_price(total), count, _to_price(low), _to_price(high))
+            for cid, total, count, low, high in cursor.fetchall()
+        }
@@ -0,0 +1,167 @@
+"""Full-text product search.
+
+Products are indexed into a side table kept in sync by the Product
+``post_save``/``post_delete`` receivers in ``core.signals``:
+
+* SQLite (dev/test): an FTS5 virtual table keyed by product id, ranked with
+  ``bm25`` (name weighted over description).
+* PostgreSQL (prod): a ``tsvector`` column with a GIN index, ranked with
+  ``ts_rank`` over a weighted document.
+
+The table is created by a ``post_migrate`` receiver, which fills it from the
+product table when it is new, and can be refilled with
+``manage.py rebuild_search_index``. Results are ordered by ``(score DESC, id)``
+and paged with a ``(score, id)`` keyset rather than an offset.
+Code that writes products in bulk (``bulk_create``/``update``) sends no
+signals and must call ``index_products`` itself.
+"""
+import re
+
+from django.db import connection
+
+from .models import Product
+
+SQLITE_TABLE = "core_product_fts"
+POSTGRES_TABLE = "core_product_search"
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def ensure_search_index(using=connection):
+    """Create the side table for the current backend if it does not exist.
+
+    Returns whether it was created, i.e. whether it still needs filling.
+    """
+    table = {"sqlite": SQLITE_TABLE, "postgresql": POSTGRES_TABLE}.get(using.vendor)
+    if table is None or table in using.introspection.table_names():
+        return False
+    with using.cursor() as cursor:
+        if using.vendor == "sqlite":
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE} "
+                f"USING fts5(name, description, tokenize='unicode61 remove_diacritics 2')"
+            )
+        elif using.vendor == "postgresql":
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {POSTGRES_TABLE} ("
+                f" product_id bigint PRIMARY KEY REFERENCES {Product._meta.db_table}(id) ON DELETE CASCADE,"
+                f" document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {POSTGRES_TABLE}_document_gin "
+                f"ON {POSTGRES_TABLE} USING gin(document)"
+            )
+    return True
+
+
+def index_products(rows):
+    """Add or refresh ``(id, name, description)`` rows (or Product instances) in the index."""
+    rows = [
+        (r.pk, r.name, r.description or "") if isinstance(r, Product) else (r[0], r[1], r[2] or "")
+        for r in rows
+    ]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.executemany(f"DELETE FROM {SQLITE_TABLE} WHERE rowid = %s", [(r[0],) for r in rows])
+            cursor.executemany(
+                f"INSERT INTO {SQLITE_TABLE} (rowid, name, description) VALUES (%s, %s, %s)", rows
+            )
+        elif connection.vendor == "postgresql":
+            cursor.executemany(
+                f"INSERT INTO {POSTGRES_TABLE} (product_id, document) VALUES "
+                f"(%s, setweight(to_tsvector('english', %s), 'A') || setweight(to_tsvector('english', %s), 'B')) "
+                f"ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document",
+                rows,
+            )
+
+
+def fill_index(batch_size=5000):
+    """Index every product, ``batch_size`` rows per insert; returns how many."""
+    total = 0
+    batch = []
+    for row in Product.objects.order_by("id").values_list("id", "name", "description").iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            index_products(batch)
+            total += len(batch)
+            batch = []
+    index_products(batch)
+    return total + len(batch)
+
+
+def _index_table():
+    """``(table, key column)`` of the side table for this backend, or ``None``."""
+    if connection.vendor == "sqlite":
+        return SQLITE_TABLE, "rowid"
+    if connection.vendor == "postgresql":
+        return POSTGRES_TABLE, "product_id"
+    return None
+
+
+def remove_products(product_ids):
+    table = _index_table()
+    product_ids = [(pid,) for pid in product_ids]
+    if table is None or not product_ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {table[0]} WHERE {table[1]} = %s", product_ids)
+
+
+def clear_index():
+    table = _index_table()
+    if table is None:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table[0]}")
+
+
+def _fts5_query(text):
+    """Turn free text into a safe FTS5 query: every word must match, the last as a prefix."""
+    tokens = TOKEN_RE.findall(text)
+    if not tokens:
+        return None
+    quoted = ['"%s"' % t for t in tokens]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def search_product_ids(text, limit, after=None):
+    """Return up to ``limit`` ``(product_id, score)`` pairs, best first.
+
+    ``after`` is the ``(score, id)`` of the last row of the previous page.
+    """
+    after_sql, after_params = "", []
+    if after is not None:
+        after_sql = "WHERE hits.score < %s OR (hits.score = %s AND hits.id > %s)"
+        after_params = [after[0], after[0], after[1]]
+
+    if connection.vendor == "sqlite":
+        match = _fts5_query(text)
+        if match is None:
+            return []
+        inner = (
+            f"SELECT rowid AS id, -bm25({SQLITE_TABLE}, 10.0, 1.0) AS score "
+            f"FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s"
+        )
+        params = [match]
+    elif connection.vendor == "postgresql":
+        if not TOKEN_RE.search(text):
+            return []
+        inner = (
+            f"SELECT product_id AS id, ts_rank(document, query)::float8 AS score "
+            f"FROM {POSTGRES_TABLE}, websearch_to_tsquery('english', %s) query "
+            f"WHERE document @@ query"
+        )
+        params = [text]
+    else:
+        # No full-text engine: substring match, unranked.
+        qs = Product.objects.filter(name__icontains=text).order_by("id")
+        if after is not None:
+            qs = qs.filter(id__gt=after[1])
+        return [(pid, 0.0) for pid in qs.values_list("id", flat=True)[:limit]]
+
+    sql = f"SELECT hits.id, hits.score FROM ({inner}) hits {after_sql} ORDER BY hits.score DESC, hits.id LIMIT %s"
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + after_params + [limit])
+        return cursor.fetchall()
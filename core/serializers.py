@@ -1,6 +1,12 @@
 # core/serializers.py
+from django.db import models, transaction
+from django.utils.functional import cached_property
 from rest_framework import serializers
-from .models import Category, Product, Order, OrderItem
+from . import fragments
+from .inventory import reserve_stock, shard_stock, sharded_product_ids, stock_levels
+from .orders import create_order_items, product_prices
+from .models import Category, ImportJob, Product, Order, OrderItem
+from .sparse import SparseFieldsSerializerMixin
 from .signals import order_placed  # <-- import the signal
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -9,11 +15,22 @@ class CategorySerializer(serializers.ModelSerializer):
         model = Category
         fields = ["id", "name", "parent_id"]
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductListSerializer(serializers.ListSerializer):
+    """Assembles lists from per-product cached fragments (see ``core.fragments``)."""
+
+    def to_representation(self, data):
+        if self.child.requested_fields is not None:
+            return super().to_representation(data)  # fragments hold the full representation
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        return fragments.render_many(iterable, self.child.to_representation)
+
+class ProductSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     category_ids = serializers.ListField(child=serializers.IntegerField(), write_only=True)
     class Meta:
         model = Product
         fields = ["id", "name", "description", "price", "stock_quantity", "category_ids"]
+        # Fragments are shared by every request: output must not depend on context.
+        list_serializer_class = ProductListSerializer
 
     def create(self, validated_data):
         ids = validated_data.pop("category_ids", [])
@@ -21,24 +38,92 @@ class ProductSerializer(serializers.ModelSerializer):
         product.categories.set(Category.objects.filter(id__in=ids))
         return product
 
+    def update(self, instance, validated_data):
+        stock = validated_data.pop("stock_quantity", None) if instance.stock_shards else None
+        instance = super().update(instance, validated_data)
+        if stock is not None:
+            instance.stock_quantity = shard_stock(instance.pk, instance.stock_shards, total=stock)
+        return instance
+
+    @cached_property
+    def sharded_ids(self):
+        # Once per serializer: a list renders every item with the same child.
+        return sharded_product_ids()
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if "stock_quantity" in data and instance.pk in self.sharded_ids:
+            data["stock_quantity"] = stock_levels([instance.pk])[instance.pk]
+        return data
+
+class ProductImportSerializer(serializers.Serializer):
+    """One product of a bulk import, placed by a path of category names, e.g. ["All Products", "Bakery"]."""
+    name = serializers.CharField(max_length=Product._meta.get_field("name").max_length)
+    description = serializers.CharField(required=False, allow_blank=True)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    stock_quantity = serializers.IntegerField(required=False, min_value=0, default=0)
+    category_path = serializers.ListField(
+        child=serializers.CharField(max_length=Category._meta.get_field("name").max_length), allow_empty=False
+    )
+
+class ProductStockPriceSerializer(serializers.Serializer):
+    """One row of a bulk price/stock update."""
+    id = serializers.IntegerField()
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    stock_quantity = serializers.IntegerField(min_value=0, required=False)
+
+    def validate(self, attrs):
+        if "price" not in attrs and "stock_quantity" not in attrs:
+            raise serializers.ValidationError("price and/or stock_quantity is required")
+        return attrs
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    progress = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = ImportJob
+        fields = [
+            "id", "kind", "status", "upsert", "chunk_size", "created_at", "heartbeat_at", "finished_at",
+            "total_rows", "processed", "progress", "created", "updated", "error_count", "errors", "failure",
+        ]
+        read_only_fields = fields
+
 class OrderItemSerializer(serializers.ModelSerializer):
+    # A plain id: OrderSerializer.validate_items checks every product of the
+    # order in one query instead of a lookup per item.
+    product = serializers.IntegerField(source="product_id")
+
     class Meta:
         model = OrderItem
-        fields = ["product", "quantity"]
+        fields = ["product", "quantity", "unit_price", "line_total"]
+        read_only_fields = ["unit_price", "line_total"]
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True)
 
     class Meta:
         model = Order
-        fields = ["id", "customer", "created_at", "status", "items"]
-        read_only_fields = ["id", "created_at"]
+        fields = ["id", "customer", "created_at", "status", "items", "total_amount", "item_count"]
+        read_only_fields = ["id", "created_at", "total_amount", "item_count"]
+
+    def validate_items(self, items):
+        self._prices = product_prices(it["product_id"] for it in items)
+        missing = serializers.PrimaryKeyRelatedField.default_error_messages["does_not_exist"]
+        errors = [
+            {} if it["product_id"] in self._prices else {"product": [missing.format(pk_value=it["product_id"])]}
+            for it in items
+        ]
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return items
 
+    @transaction.atomic
     def create(self, validated_data):
-        items = validated_data.pop("items", [])
+        items = [(it["product_id"], it["quantity"]) for it in validated_data.pop("items", [])]
+        reserve_stock(items)
         order = Order.objects.create(**validated_data)
-        for it in items:
-            OrderItem.objects.create(order=order, **it)
-        # Now that items exist, fire order_placed
-        order_placed.send(sender=Order, instance=order)
+        create_order_items(order, items, prices=getattr(self, "_prices", None))
+        # Notify only once the order is committed: an order rolled back after
+        # this point (say, a retry losing its Idempotency-Key race) never existed.
+        transaction.on_commit(lambda: order_placed.send(sender=Order, instance=order))
         return order
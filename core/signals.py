@@ -1,12 +1,220 @@
 # core/signals.py
 from django.conf import settings
 from django.core.mail import send_mail
+from django.db import connections
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_migrate, post_save, pre_delete, pre_save
 from django.dispatch import Signal, receiver
+from django.utils import timezone
 import africastalking
+from mptt.signals import node_moved
+
+from . import fragments
+from .category_tree import GENERATION as CATEGORY_GENERATION, get_category_tree
+from .generations import PRODUCT_GENERATION, bump_generation
+from .models import Category, OrderItem, Product
+from .orders import refresh_order_totals
+from .rollups import (
+    apply_bulk_changes, apply_category_move, apply_closure_changes, apply_price_change, category_closure,
+    product_closures, subtree_products,
+)
+from .search import ensure_search_index, fill_index, index_products, remove_products
 
 # Custom signal fired after an order (and its items) are fully created
 order_placed = Signal()  # args: instance
 
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(node_moved, sender=Category)
+def invalidate_category_tree(sender, **kwargs):
+    """Any saved, moved (``move_to`` does not save) or deleted category invalidates every worker's tree snapshot."""
+    bump_generation(CATEGORY_GENERATION)
+
+# Category paths are part of a product's export row, so anything that changes
+# them moves the product's updated_at for ``?changed_since=`` exports.
+
+def stamp_products(product_ids=None, category_ids=None):
+    products = Product.objects.all()
+    if product_ids is not None:
+        products = products.filter(pk__in=list(product_ids))
+    if category_ids is not None:
+        products = products.filter(categories__in=list(category_ids))
+    products.update(updated_at=timezone.now())
+
+@receiver(m2m_changed, sender=Product.categories.through)
+def stamp_relinked_products(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == "pre_clear":
+        instance._stamp_product_ids = list(instance.products.values_list("id", flat=True))
+    elif action in ("post_add", "post_remove", "post_clear"):
+        if not reverse:
+            stamp_products(product_ids=[instance.pk])
+        else:
+            stamp_products(product_ids=pk_set if pk_set is not None else getattr(instance, "_stamp_product_ids", ()))
+
+@receiver(pre_save, sender=Category)
+def remember_category_name(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    instance._export_old_name = Category.objects.filter(pk=instance.pk).values_list("name", flat=True).first()
+
+@receiver(post_save, sender=Category)
+def stamp_renamed_category_products(sender, instance, created, raw=False, **kwargs):
+    old_name = getattr(instance, "_export_old_name", None)
+    instance._export_old_name = None
+    if not (raw or created or old_name is None or old_name == instance.name):
+        stamp_products(category_ids=instance.get_descendants(include_self=True).values_list("id", flat=True))
+
+@receiver(node_moved, sender=Category)
+def stamp_moved_category_products(sender, instance, **kwargs):
+    stamp_products(category_ids=instance.get_descendants(include_self=True).values_list("id", flat=True))
+
+@receiver(pre_delete, sender=Category)
+def stamp_products_of_deleted_category(sender, instance, **kwargs):
+    # Each category of a deleted subtree gets its own pre_delete.
+    stamp_products(category_ids=[instance.pk])
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_listings(sender, **kwargs):
+    bump_generation(PRODUCT_GENERATION)
+
+@receiver(m2m_changed, sender=Product.categories.through)
+def invalidate_product_links(sender, action, **kwargs):
+    if action.startswith("post_"):
+        bump_generation(PRODUCT_GENERATION)
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_fragment(sender, instance, **kwargs):
+    fragments.invalidate([instance.pk])
+
+@receiver(m2m_changed, sender=Product.categories.through)
+def invalidate_linked_product_fragments(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith("post_"):
+            fragments.invalidate([instance.pk])
+    elif action == "pre_clear":
+        instance._fragment_product_ids = list(instance.products.values_list("id", flat=True))
+    elif action.startswith("post_"):
+        fragments.invalidate(pk_set if pk_set is not None else getattr(instance, "_fragment_product_ids", ()))
+
+@receiver(pre_save, sender=Product)
+def remember_product_price(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    instance._rollup_old_price = Product.objects.filter(pk=instance.pk).values_list("price", flat=True).first()
+
+@receiver(post_save, sender=Product)
+def roll_up_price_change(sender, instance, created, raw=False, **kwargs):
+    """A price change moves the product's contribution on every category it rolls up into."""
+    old_price = getattr(instance, "_rollup_old_price", None)
+    instance._rollup_old_price = None
+    if raw or created or old_price is None:
+        return
+    closure = product_closures([instance.pk])[instance.pk]
+    apply_price_change(closure, removed_price=old_price, added_price=instance.price)
+
+@receiver(pre_delete, sender=Product)
+def remember_product_closure(sender, instance, **kwargs):
+    instance._rollup_closure = product_closures([instance.pk])[instance.pk]
+
+@receiver(post_delete, sender=Product)
+def roll_up_product_delete(sender, instance, **kwargs):
+    apply_price_change(getattr(instance, "_rollup_closure", ()), removed_price=instance.price)
+
+@receiver(m2m_changed, sender=Product.categories.through)
+def roll_up_category_links(sender, instance, action, reverse, pk_set, **kwargs):
+    """Diff each affected product's category closure around add/remove/clear."""
+    if action.startswith("pre_"):
+        if not reverse:
+            product_ids = [instance.pk]
+        elif pk_set is not None:
+            product_ids = list(pk_set)
+        else:
+            product_ids = list(instance.products.values_list("id", flat=True))
+        instance._rollup_closures = product_closures(product_ids)
+        return
+    before = getattr(instance, "_rollup_closures", None)
+    if not before:
+        return
+    del instance._rollup_closures
+    after = product_closures(list(before))
+    prices = dict(Product.objects.filter(pk__in=list(before)).values_list("id", "price"))
+    apply_closure_changes(before, after, prices)
+
+@receiver(post_init, sender=Category)
+def remember_category_parent(sender, instance, **kwargs):
+    # MPTT has already moved the node when node_moved is sent, so keep the
+    # parent it was loaded with (without loading a deferred one).
+    instance._rollup_parent_id = instance.__dict__.get("parent_id")
+
+@receiver(node_moved, sender=Category)
+def roll_up_category_move(sender, instance, **kwargs):
+    """A re-parented subtree moves its products' contribution from the old ancestors to the new ones."""
+    old_parent_id = getattr(instance, "_rollup_parent_id", None)
+    instance._rollup_parent_id = instance.parent_id
+    if old_parent_id == instance.parent_id:
+        return
+    if "position" in kwargs:
+        # move_to() has saved the node already.
+        apply_category_move(instance.pk, old_parent_id)
+    else:
+        # save() sends node_moved before writing the new parent.
+        instance._rollup_moved_from = old_parent_id
+
+@receiver(post_save, sender=Category)
+def roll_up_saved_category_move(sender, instance, raw=False, **kwargs):
+    if "_rollup_moved_from" in instance.__dict__:
+        apply_category_move(instance.pk, instance.__dict__.pop("_rollup_moved_from"))
+
+@receiver(pre_delete, sender=Category)
+def remember_deleted_category_closures(sender, instance, origin=None, **kwargs):
+    # Each category of a deleted subtree gets its own pre_delete: collect the
+    # products under all of them once per deletion, on its origin.
+    deletion = origin if origin is not None else instance
+    seen = deletion.__dict__.setdefault("_rollup_deleted_categories", set())
+    if instance.pk in seen:
+        return
+    tree = get_category_tree()
+    seen.update(tree.descendant_ids(instance.pk))
+    closures = deletion.__dict__.setdefault("_rollup_deleted_closures", {})
+    for product_id, (category_ids, price) in subtree_products(instance.pk).items():
+        closures[product_id] = (category_closure(tree, category_ids), price)
+
+@receiver(post_delete, sender=Category)
+def roll_up_category_delete(sender, instance, origin=None, **kwargs):
+    """Products linked under a deleted subtree leave its surviving ancestors."""
+    deletion = origin if origin is not None else instance
+    before = deletion.__dict__.pop("_rollup_deleted_closures", None)
+    deletion.__dict__.pop("_rollup_deleted_categories", None)
+    if not before:
+        return
+    tree = get_category_tree()
+    after = product_closures(list(before))
+    apply_bulk_changes(
+        {pid: ({cid for cid in closure if cid in tree}, price) for pid, (closure, price) in before.items()},
+        {pid: (after[pid], price) for pid, (_, price) in before.items()},
+    )
+
+@receiver(post_migrate)
+def create_search_index(sender, using="default", **kwargs):
+    # A new index on an existing catalog would find nothing until rebuilt.
+    if sender.name == "core" and ensure_search_index(connections[using]):
+        fill_index()
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    index_products([instance])
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    remove_products([instance.pk])
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def update_order_totals(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_order_totals([instance.order_id])
+
 @receiver(order_placed)
 def handle_order_placed(sender, instance, **kwargs):
     """
@@ -14,7 +222,7 @@ def handle_order_placed(sender, instance, **kwargs):
     """
     customer = instance.customer
     phone = getattr(customer, "phone_number", None)
-    total = instance.total_price
+    total = instance.total_amount
     item_lines = []
     for it in instance.items.select_related("product"):
         item_lines.append(f"- {it.product.name} x {it.quantity} = {it.total_price}")
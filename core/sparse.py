@@ -0,0 +1,111 @@
+"""``?fields=`` sparse fieldsets and a ``values()`` read path for list endpoints.
+
+``SparseFieldsMixin`` (viewsets) validates ``?fields=a,b`` against the
+serializer's readable fields and, on ``list``/``retrieve``, narrows both the
+SELECT (``only()``) and the serializer output. When every requested field is
+listed in the viewset's ``values_fields``, ``list`` skips model instances and
+DRF serialization entirely: rows come from ``values()`` and each value goes
+through its serializer field's ``to_representation`` only where that changes
+it (decimals, datetimes, choices).
+"""
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+# Serializer fields whose representation of a database value is the value itself.
+PASSTHROUGH_FIELDS = (
+    serializers.IntegerField,
+    serializers.CharField,
+    serializers.BooleanField,
+    serializers.RelatedField,
+)
+
+
+class SparseFieldsSerializerMixin:
+    """Serializer accepting ``fields=[...]`` to keep only those fields."""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.requested_fields = fields
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class SparseFieldsMixin:
+    fields_query_param = "fields"
+    # Read actions that honour ?fields=; anything else renders in full.
+    sparse_actions = ("list", "retrieve")
+    # Output field -> model field, for fields readable straight from values().
+    values_fields = {}
+
+    def get_requested_fields(self):
+        """Requested field names in order, or ``None`` for the full representation."""
+        if not hasattr(self, "_requested_fields"):
+            self._requested_fields = self._parse_fields()
+        return self._requested_fields
+
+    def _parse_fields(self):
+        if self.action not in self.sparse_actions:
+            return None
+        raw = self.request.query_params.get(self.fields_query_param)
+        if raw is None:
+            return None
+        names = list(dict.fromkeys(name.strip() for name in raw.split(",") if name.strip()))
+        readable = [name for name, field in self.get_serializer_class()().fields.items() if not field.write_only]
+        unknown = [name for name in names if name not in readable]
+        if unknown or not names:
+            raise ValidationError({
+                self.fields_query_param: f"choose from {', '.join(readable)}; unknown: {', '.join(unknown) or '-'}"
+            })
+        return names
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_requested_fields()
+        if fields is not None:
+            kwargs.setdefault("fields", fields)
+        return super().get_serializer(*args, **kwargs)
+
+    def _key_columns(self):
+        return [name.lstrip("-") for name in getattr(self, "keyset_ordering", ())]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.get_requested_fields()
+        if fields is None:
+            return queryset
+        columns = [self.values_fields[name] for name in fields if name in self.values_fields]
+        if len(columns) < len(fields):
+            # Nested/computed fields may need anything; only narrow fully mapped requests.
+            return queryset
+        return queryset.select_related(None).only(*columns, *self._key_columns())
+
+    def list(self, request, *args, **kwargs):
+        fields = self.get_requested_fields()
+        if fields is None or any(name not in self.values_fields for name in fields):
+            return super().list(request, *args, **kwargs)
+
+        columns = [self.values_fields[name] for name in fields]
+        queryset = self.filter_queryset(self.get_queryset()).values(*dict.fromkeys(columns + self._key_columns()))
+        page = self.paginate_queryset(queryset)
+        data = self.values_representation(page if page is not None else queryset, fields)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def values_representation(self, rows, fields):
+        """Render ``values()`` rows as the serializer would, without instances."""
+        serializer_fields = self.get_serializer(fields=fields).fields
+        plan = []
+        for name in fields:
+            field = serializer_fields[name]
+            convert = None if isinstance(field, PASSTHROUGH_FIELDS) else field.to_representation
+            plan.append((name, self.values_fields[name], convert))
+        data = []
+        for row in rows:
+            item = {}
+            for name, column, convert in plan:
+                value = row[column]
+                item[name] = value if convert is None or value is None else convert(value)
+            data.append(item)
+        return data
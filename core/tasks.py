@@ -34,3 +34,38 @@ def send_order_confirmation_email(self, order_id, user_email):
     except Exception as exc:
         logger.error("❌ Failed to send order confirmation email for order_id=%s: %s", order_id, exc)
         raise self.retry(exc=exc)
+
+
+@shared_task(acks_late=True)
+def run_import_job(job_id):
+    """
+    Process a stored product import (see core/imports.py).
+    acks_late: if the worker dies mid-job the message is redelivered, and the
+    job resumes from its last committed chunk once its heartbeat goes stale.
+    """
+    from .imports import run_import_job as run
+
+    job = run(job_id)
+    return job.status if job else None
+
+
+@shared_task
+def rebalance_stock_shards():
+    """
+    Even out sharded stock counters (see core/inventory.py).
+    Schedule it with celery beat (every minute or so) while a sale is running.
+    """
+    from .inventory import rebalance_stock_shards as rebalance
+
+    return len(rebalance())
+
+
+@shared_task
+def purge_idempotency_keys():
+    """
+    Drop stored order responses past their replay window (see core/orders.py).
+    Schedule it with celery beat, e.g. hourly.
+    """
+    from .orders import purge_idempotency_keys as purge
+
+    return purge()
@@ -0,0 +1,137 @@
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from core import fragments
+from core.generations import PRODUCT_GENERATION, get_generation
+from core.models import Category, CategoryPriceRollup, Product
+from core.product_bulk import update_price_and_stock
+from core.rollups import subtree_price_stats
+
+
+@pytest.fixture
+def client(db):
+    cache.clear()
+    client = APIClient()
+    client.force_authenticate(user=User.objects.create_user("hal", "hal@example.com", "pwd", is_staff=True))
+    return client
+
+
+@pytest.fixture
+def shelf(db):
+    root = Category.objects.create(name="All Products")
+    fruits = Category.objects.create(name="Fruits", parent=root)
+    products = []
+    for i in range(3):
+        product = Product.objects.create(name=f"P{i}", price=f"{10 * (i + 1)}.00", stock_quantity=5)
+        product.categories.set([fruits])
+        products.append(product)
+    return root, fruits, products
+
+
+def rollup(category):
+    r = CategoryPriceRollup.objects.get(category=category)
+    return r.price_sum, r.product_count, r.min_price, r.max_price
+
+
+def bulk_update(client, rows):
+    return client.post("/api/products/bulk-update/", rows, format="json")
+
+
+def test_updates_prices_and_stock_and_keeps_rollups_exact(client, shelf):
+    root, fruits, (a, b, c) = shelf
+    response = bulk_update(client, [
+        {"id": a.pk, "price": "99.00"},
+        {"id": b.pk, "stock_quantity": 0},
+        {"id": c.pk, "price": "1.50", "stock_quantity": 7},
+    ])
+    assert response.status_code == 200
+    assert response.data["updated"] == 3 and response.data["errors"] == []
+    assert response.data["rows_per_second"] > 0
+
+    assert Product.objects.get(pk=a.pk).price == Decimal("99.00")
+    assert Product.objects.get(pk=b.pk).stock_quantity == 0
+    assert Product.objects.values_list("price", "stock_quantity").get(pk=c.pk) == (Decimal("1.50"), 7)
+    for category in (root, fruits):
+        assert rollup(category) == subtree_price_stats([category.id])[category.id]
+    assert rollup(root) == (Decimal("120.50"), 3, Decimal("1.50"), Decimal("99.00"))
+
+
+def test_requires_staff(shelf):
+    _, _, (a, _, _) = shelf
+    client = APIClient()
+    client.force_authenticate(user=User.objects.create_user("kim", "kim@example.com", "pwd"))
+    assert bulk_update(client, [{"id": a.pk, "price": "0.01"}]).status_code == 403
+    assert Product.objects.get(pk=a.pk).price == Decimal("10.00")
+
+
+def test_reports_row_errors_and_applies_the_rest(client, shelf):
+    _, _, (a, b, _) = shelf
+    response = bulk_update(client, [
+        {"id": a.pk, "price": "-1"},
+        {"id": 999999, "price": "2.00"},
+        {"id": b.pk},
+        {"id": b.pk, "price": "12.00"},
+    ])
+    assert response.status_code == 200
+    assert [e["index"] for e in response.data["errors"]] == [0, 1, 2]
+    assert response.data["errors"][1]["errors"] == {"id": ["product not found"]}
+    assert response.data["updated"] == 1
+    assert Product.objects.get(pk=a.pk).price == Decimal("10.00")
+    assert Product.objects.get(pk=b.pk).price == Decimal("12.00")
+
+    assert bulk_update(client, {"id": a.pk}).status_code == 400
+
+
+def test_unchanged_rows_are_not_written_or_invalidated(client, shelf):
+    _, _, (a, _, _) = shelf
+    client.get("/api/products/")
+    generation = get_generation(PRODUCT_GENERATION)
+
+    response = bulk_update(client, [{"id": a.pk, "price": "10.00", "stock_quantity": 5}])
+    assert response.data["updated"] == 0 and response.data["unchanged"] == 1
+    assert get_generation(PRODUCT_GENERATION) == generation
+    assert cache.get(fragments.fragment_key(a.pk)) is not None
+
+
+def test_invalidates_only_changed_fragments(client, shelf, django_capture_on_commit_callbacks):
+    _, _, (a, b, _) = shelf
+    client.get("/api/products/")
+    generation = get_generation(PRODUCT_GENERATION)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        bulk_update(client, [{"id": a.pk, "stock_quantity": 0}])
+    assert cache.get(fragments.fragment_key(a.pk)) is None
+    assert cache.get(fragments.fragment_key(b.pk)) is not None
+    assert get_generation(PRODUCT_GENERATION) != generation
+    assert client.get(f"/api/products/{a.pk}/").data["stock_quantity"] == 0
+
+
+def test_query_count_does_not_grow_with_rows(client, shelf):
+    _, fruits, _ = shelf
+    more = Product.objects.bulk_create(Product(name=f"Q{i}", price="3.00") for i in range(40))
+    Product.categories.through.objects.bulk_create(
+        Product.categories.through(product_id=p.pk, category_id=fruits.pk) for p in more
+    )
+
+    def queries(products, price):
+        with CaptureQueriesContext(connection) as ctx:
+            bulk_update(client, [{"id": p.pk, "price": price} for p in products])
+        return len(ctx)
+
+    # Only lower the minimum, so neither call has to recompute stale bounds.
+    assert queries(more[:2], "2.00") == queries(more, "1.00")
+
+
+def test_current_prices_are_read_inside_the_write_transaction(shelf):
+    products = shelf[2]
+    with CaptureQueriesContext(connection) as ctx:
+        update_price_and_stock({p.pk: {"price": Decimal("1.00")} for p in products})
+    sql = [q["sql"] for q in ctx.captured_queries]
+    read = next(i for i, q in enumerate(sql) if q.startswith("SELECT") and 'FROM "core_product"' in q)
+    assert any(q.startswith("SAVEPOINT") for q in sql[:read])
@@ -0,0 +1,50 @@
+import pytest
+from django.core.management import call_command
+
+from core.category_bulk import deferred_category_tree
+from core.category_tree import get_category_tree
+from core.models import Category
+
+
+def mptt_fields():
+    return list(Category.objects.order_by("id").values_list("id", "tree_id", "lft", "rght", "level"))
+
+
+@pytest.mark.django_db
+def test_deferred_tree_matches_regular_inserts():
+    root = Category.objects.create(name="All Products")
+    Category.objects.create(name="Dairy", parent=root)
+    get_category_tree()
+
+    with deferred_category_tree() as creator:
+        fruit, bakery = creator.create([("Fruit", root.id), ("Bakery", root.id)])
+        creator.create([(f"Apple {i:02d}", fruit.id) for i in range(20)])
+        creator.create([("Bread", bakery.id)])
+    assert creator.created == 23
+
+    bulk = mptt_fields()
+    Category.objects.rebuild()
+    assert mptt_fields() == bulk
+    assert [c.name for c in root.get_children()] == ["Bakery", "Dairy", "Fruit"]
+    # bulk_create sends no post_save; the snapshot must still be invalidated.
+    assert len(get_category_tree().descendant_ids(root.id)) == 25
+
+
+@pytest.mark.django_db
+def test_new_roots_are_numbered_in_name_order():
+    Category.objects.create(name="Produce")
+    with deferred_category_tree() as creator:
+        creator.create([("Bakery", None), ("Seasonal", None)])
+    roots = Category.objects.filter(parent=None).order_by("tree_id")
+    assert [r.name for r in roots] == ["Bakery", "Produce", "Seasonal"]
+
+
+@pytest.mark.django_db
+def test_bulk_create_categories_command(tmp_path):
+    Category.objects.create(name="All Products")
+    paths = tmp_path / "paths.txt"
+    paths.write_text("All Products>Bakery>Bread\nAll Products>Bakery>Cakes\n\nSeasonal>Winter\n")
+    call_command("bulk_create_categories", str(paths))
+    bread = Category.objects.get(name="Bread")
+    assert [a.name for a in bread.get_ancestors()] == ["All Products", "Bakery"]
+    assert Category.objects.count() == 6
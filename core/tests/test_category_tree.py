@@ -0,0 +1,70 @@
+import pytest
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from core.category_tree import get_category_tree
+from core.checks import check_shared_cache
+from core.models import Category
+
+
+@pytest.fixture
+def tree_nodes(db):
+    root = Category.objects.create(name="All Products")
+    fruits = Category.objects.create(name="Fruits", parent=root)
+    apples = Category.objects.create(name="Apples", parent=fruits)
+    bakery = Category.objects.create(name="Bakery", parent=root)
+    other = Category.objects.create(name="Other")
+    return root, fruits, apples, bakery, other
+
+
+def test_snapshot_matches_mptt(tree_nodes):
+    root, fruits, apples, bakery, other = tree_nodes
+    tree = get_category_tree()
+    assert len(tree) == 5
+    assert tree.descendant_ids(root.id) == list(root.get_descendants(include_self=True).values_list("id", flat=True))
+    assert tree.descendant_ids(fruits.id, include_self=False) == [apples.id]
+    assert tree.children_ids(root.id) == [bakery.id, fruits.id]
+    assert tree.parent_id(apples.id) == fruits.id
+    assert tree.parent_id(other.id) is None
+    assert tree.name(bakery.id) == "Bakery"
+
+
+def test_snapshot_is_reused_until_category_changes(tree_nodes):
+    root = tree_nodes[0]
+    first = get_category_tree()
+    with CaptureQueriesContext(connection) as ctx:
+        assert get_category_tree() is first
+    assert len(ctx.captured_queries) == 0
+
+    dairy = Category.objects.create(name="Dairy", parent=root)
+    rebuilt = get_category_tree()
+    assert rebuilt is not first
+    assert dairy.id in rebuilt.descendant_ids(root.id)
+
+    dairy.delete()
+    assert dairy.id not in get_category_tree()
+
+
+def test_snapshot_built_in_a_rolled_back_transaction_is_dropped(tree_nodes):
+    root = tree_nodes[0]
+    get_category_tree()
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            ghost = Category.objects.create(name="Ghost", parent=root)
+            assert ghost.id in get_category_tree()
+            raise RuntimeError
+    assert not Category.objects.filter(pk=ghost.id).exists()
+    tree = get_category_tree()
+    assert ghost.id not in tree
+    assert len(tree) == 5
+
+
+def test_per_process_cache_is_refused_outside_debug(settings):
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    settings.DEBUG = False
+    assert [e.id for e in check_shared_cache(None)] == ["core.E001"]
+    settings.DEBUG = True
+    assert check_shared_cache(None) == []
+    settings.DEBUG = False
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://x"}}
+    assert check_shared_cache(None) == []
@@ -0,0 +1,56 @@
+import json
+
+import pytest
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+
+from core.models import Category
+
+
+@pytest.fixture
+def client(db):
+    client = APIClient()
+    client.force_authenticate(user=User.objects.create_user("bob", "bob@example.com", "pwd"))
+    return client
+
+
+def read(resp):
+    return json.loads(b"".join(resp.streaming_content))
+
+
+def test_tree_streams_nested_json(client):
+    root = Category.objects.create(name="All Products")
+    fruits = Category.objects.create(name="Fruits", parent=root)
+    apples = Category.objects.create(name="Apples", parent=fruits)
+    bakery = Category.objects.create(name='Bakery "fresh"', parent=root)
+    seasonal = Category.objects.create(name="Seasonal")
+
+    resp = client.get("/api/categories/tree/")
+    assert resp.status_code == 200
+    assert read(resp) == [
+        {"id": root.id, "name": "All Products", "parent": None, "children": [
+            {"id": bakery.id, "name": 'Bakery "fresh"', "parent": root.id, "children": []},
+            {"id": fruits.id, "name": "Fruits", "parent": root.id, "children": [
+                {"id": apples.id, "name": "Apples", "parent": fruits.id, "children": []},
+            ]},
+        ]},
+        {"id": seasonal.id, "name": "Seasonal", "parent": None, "children": []},
+    ]
+
+
+def test_tree_empty(client):
+    assert read(client.get("/api/categories/tree/")) == []
+
+
+def test_tree_etag_revalidation(client, django_assert_num_queries):
+    root = Category.objects.create(name="All Products")
+    etag = client.get("/api/categories/tree/")["ETag"]
+
+    with django_assert_num_queries(0):
+        resp = client.get("/api/categories/tree/", HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == 304
+
+    Category.objects.create(name="Dairy", parent=root)
+    resp = client.get("/api/categories/tree/", HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == 200
+    assert resp["ETag"] != etag
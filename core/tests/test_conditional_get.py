@@ -0,0 +1,77 @@
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils.http import http_date
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from core.generations import last_modified
+from core.models import Category, Product
+
+
+@pytest.fixture
+def client(db):
+    client = APIClient()
+    client.force_authenticate(user=User.objects.create_user("erin", "erin@example.com", "pwd"))
+    return client
+
+
+def revalidate(client, url, etag):
+    with CaptureQueriesContext(connection) as queries:
+        resp = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    return resp, queries
+
+
+def test_product_list_and_detail_304_without_queries(client):
+    product = Product.objects.create(name="Kettle", price="20.00")
+    for url in ["/api/products/", f"/api/products/{product.id}/"]:
+        first = client.get(url)
+        assert first.status_code == 200
+        assert first["Last-Modified"]
+        resp, queries = revalidate(client, url, first["ETag"])
+        assert resp.status_code == 304
+        assert resp["ETag"] == first["ETag"]
+        assert [q["sql"] for q in queries if "core_product" in q["sql"]] == []
+
+
+def test_product_etag_changes_on_writes(client):
+    product = Product.objects.create(name="Kettle", price="20.00")
+    category = Category.objects.create(name="Kitchen")
+    etag = client.get("/api/products/")["ETag"]
+
+    product.price = "25.00"
+    product.save()
+    resp, _ = revalidate(client, "/api/products/", etag)
+    assert resp.status_code == 200
+    etag = resp["ETag"]
+
+    product.categories.add(category)
+    resp, _ = revalidate(client, "/api/products/", etag)
+    assert resp.status_code == 200
+    assert resp["ETag"] != etag
+
+
+def test_category_list_follows_category_generation(client):
+    Category.objects.create(name="Garden")
+    first = client.get("/api/categories/")
+    assert revalidate(client, "/api/categories/", first["ETag"])[0].status_code == 304
+    Category.objects.create(name="Tools")
+    resp = client.get("/api/categories/", HTTP_IF_NONE_MATCH=first["ETag"])
+    assert resp.status_code == 200
+    assert len(resp.data) == 2
+
+
+def test_if_modified_since(client):
+    first = client.get("/api/categories/")
+    resp = client.get("/api/categories/", HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+    assert resp.status_code == 304
+
+
+def test_last_modified_rounds_up_a_bump_within_the_second(client):
+    client.get("/api/categories/")
+    seen = int(last_modified("category"))
+    cache.set("generation:category:modified", seen + 0.7, timeout=None)  # a bump later that second
+    resp = client.get("/api/categories/", HTTP_IF_MODIFIED_SINCE=http_date(seen))
+    assert resp.status_code == 200
+    assert resp["Last-Modified"] == http_date(seen + 1)
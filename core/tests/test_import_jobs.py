@@ -0,0 +1,110 @@
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core import imports, product_import
+from core.imports import create_import_job, resume, resume_stalled_jobs, run_import_job, wait_for_import_threads
+from core.models import ImportJob, Product
+
+
+@pytest.fixture(autouse=True)
+def media(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    cache.clear()  # category snapshot and generations from earlier tests
+
+
+@pytest.fixture
+def admin_client(db):
+    client = APIClient()
+    client.force_authenticate(user=User.objects.create_user("ivy", "ivy@example.com", "pwd", is_staff=True))
+    return client
+
+
+def csv_upload(count):
+    lines = ["name,price,category_path"] + [f"P{i},1.00,All Products>Bakery" for i in range(count)]
+    return ContentFile(("\n".join(lines) + "\n").encode(), name="products.csv")
+
+
+def test_crashed_job_resumes_after_last_committed_chunk(db, monkeypatch):
+    job = create_import_job(csv_upload(7), ImportJob.KIND_CSV, chunk_size=2)
+    assert job.total_rows == 7
+
+    real_create, calls = product_import.create_products, []
+
+    def crash_on_third_chunk(entries):
+        calls.append(1)
+        if len(calls) == 3:
+            raise RuntimeError("worker lost")
+        return real_create(entries)
+
+    monkeypatch.setattr(product_import, "create_products", crash_on_third_chunk)
+    with pytest.raises(RuntimeError):
+        run_import_job(job.id)
+    job.refresh_from_db()
+    assert (job.status, job.last_line, job.processed) == (ImportJob.STATUS_FAILED, 5, 4)
+    assert Product.objects.count() == 4
+
+    monkeypatch.setattr(product_import, "create_products", real_create)
+    assert resume(job)
+    job = run_import_job(job.id)
+    assert (job.status, job.processed, job.created, job.progress) == (ImportJob.STATUS_SUCCEEDED, 7, 7, 1.0)
+    assert sorted(Product.objects.values_list("name", flat=True)) == [f"P{i}" for i in range(7)]
+
+
+def test_job_with_invalid_rows_completes_and_reports_them(db):
+    lines = ["name,price,category_path,description,stock_quantity"]
+    lines += [f"P{i},1.00,All Products,," for i in range(5)]
+    lines[2] = "Bad stock,1.00,All Products,,-1"
+    lines[4] = "Bad price,123456789012,All Products,,"
+    upload = ContentFile(("\n".join(lines) + "\n").encode(), name="products.csv")
+    job = run_import_job(create_import_job(upload, ImportJob.KIND_CSV, chunk_size=2).id)
+    assert (job.status, job.processed, job.created, job.error_count) == (ImportJob.STATUS_SUCCEEDED, 5, 3, 2)
+    assert [(e["index"], list(e["errors"])) for e in job.errors] == [(3, ["stock_quantity"]), (5, ["price"])]
+
+
+def test_stalled_running_job_is_requeued(db, monkeypatch, django_capture_on_commit_callbacks):
+    job = create_import_job(csv_upload(1), ImportJob.KIND_CSV)
+    ImportJob.objects.filter(pk=job.pk).update(status=ImportJob.STATUS_RUNNING, heartbeat_at=timezone.now())
+    assert resume_stalled_jobs() == []
+    assert run_import_job(job.id) is None  # another worker still owns it
+
+    ImportJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - imports.STALE_AFTER - timedelta(seconds=1))
+    dispatched = []
+    monkeypatch.setattr(imports, "_dispatch", dispatched.append)
+    with django_capture_on_commit_callbacks(execute=True):
+        assert resume_stalled_jobs() == [job.id]
+    assert dispatched == [job.id]
+    assert run_import_job(job.id).status == ImportJob.STATUS_SUCCEEDED
+
+
+def test_api_queues_json_and_reports_progress(admin_client):
+    items = [{"name": "Apple", "price": "0.80", "category_path": ["All Products", "Produce"]}, {"name": "Bad"}]
+    resp = admin_client.post("/api/imports/?chunk_size=1", items, format="json")
+    assert resp.status_code == 202
+    assert resp.data["status"] == "pending" and resp.data["total_rows"] == 2
+    assert resp["Location"].endswith(f"/imports/{resp.data['id']}/")
+
+    run_import_job(resp.data["id"])
+    job = admin_client.get(f"/api/imports/{resp.data['id']}/").data
+    assert (job["status"], job["created"], job["error_count"]) == ("succeeded", 1, 1)
+    assert job["errors"][0]["index"] == 2 and "price" in job["errors"][0]["errors"]
+
+
+def test_api_requires_staff(db):
+    client = APIClient()
+    client.force_authenticate(user=User.objects.create_user("joe", "joe@example.com", "pwd"))
+    assert client.post("/api/imports/", [], format="json").status_code == 403
+
+
+@pytest.mark.django_db(transaction=True)
+def test_thread_backend_runs_csv_upload_by_default(admin_client):
+    resp = admin_client.post("/api/imports/", {"file": csv_upload(3), "chunk_size": "2"}, format="multipart")
+    assert resp.status_code == 202
+    wait_for_import_threads(timeout=30)
+    job = admin_client.get(f"/api/imports/{resp.data['id']}/").data
+    assert (job["status"], job["processed"], job["created"]) == ("succeeded", 3, 3)
@@ -0,0 +1,113 @@
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import Customer, IdempotencyKey, Order, OrderItem, Product
+from core.orders import purge_idempotency_keys
+from core.signals import order_placed
+
+
+@pytest.fixture
+def shop(db):
+    cache.clear()
+    user = User.objects.create_user("ada", "ada@example.com", "pwd")
+    customer = Customer.objects.create(user=user, name="Ada", email="ada@example.com", phone_number="+254700000004")
+    client = APIClient()
+    client.force_authenticate(user=user)
+    products = [Product.objects.create(name=f"P{i}", price="2.00", stock_quantity=10) for i in range(5)]
+    return client, customer, products
+
+
+def place(client, customer, items, key=None):
+    items = [{"product": product_id, "quantity": quantity} for product_id, quantity in items]
+    headers = {"HTTP_IDEMPOTENCY_KEY": key} if key else {}
+    return client.post("/api/orders/", {"customer": customer.pk, "items": items}, format="json", **headers)
+
+
+def test_products_are_checked_in_one_query_and_items_inserted_in_one(shop):
+    client, customer, products = shop
+    with CaptureQueriesContext(connection) as ctx:
+        response = place(client, customer, [(p.pk, 1) for p in products])
+    assert response.status_code == 201
+    sql = [q["sql"] for q in ctx.captured_queries]
+    assert len([q for q in sql if q.startswith("SELECT") and 'FROM "core_product"' in q]) == 1
+    assert len([q for q in sql if q.startswith('INSERT INTO "core_orderitem"')]) == 1
+    assert OrderItem.objects.filter(order_id=response.data["id"]).count() == 5
+
+
+def test_unknown_products_are_reported_by_item(shop):
+    client, customer, products = shop
+    response = place(client, customer, [(products[0].pk, 1), (999999, 1)])
+    assert response.status_code == 400
+    assert response.data["items"] == [{}, {"product": ['Invalid pk "999999" - object does not exist.']}]
+    assert not Order.objects.exists()
+
+
+def test_replayed_key_returns_the_stored_response(shop, django_assert_num_queries):
+    client, customer, products = shop
+    first = place(client, customer, [(products[0].pk, 3)], key="retry-1")
+    assert first.status_code == 201
+
+    # Just the indexed key lookup: nothing is validated or written.
+    with django_assert_num_queries(1):
+        again = place(client, customer, [(products[0].pk, 3)], key="retry-1")
+    assert (again.status_code, again.data) == (201, first.json())
+    assert again["Idempotent-Replayed"] == "true"
+    assert Order.objects.count() == 1
+    assert Product.objects.get(pk=products[0].pk).stock_quantity == 7
+
+    other = place(client, customer, [(products[0].pk, 1)], key="retry-2")
+    assert other.status_code == 201 and other.data["id"] != first.data["id"]
+
+
+def test_reusing_a_key_for_another_order_is_refused(shop):
+    client, customer, products = shop
+    place(client, customer, [(products[0].pk, 1)], key="k")
+    response = place(client, customer, [(products[1].pk, 1)], key="k")
+    assert response.status_code == 422
+    assert Order.objects.count() == 1
+
+
+def test_failed_requests_do_not_use_up_the_key(shop):
+    client, customer, products = shop
+    assert place(client, customer, [(products[0].pk, 50)], key="k").status_code == 409
+    assert place(client, customer, [(products[0].pk, 5)], key="k").status_code == 201
+
+
+def test_expired_keys_are_purged(shop):
+    client, customer, products = shop
+    place(client, customer, [(products[0].pk, 1)], key="old")
+    place(client, customer, [(products[0].pk, 1)], key="new")
+    IdempotencyKey.objects.filter(key="old").update(created_at=timezone.now() - timedelta(days=2))
+    assert purge_idempotency_keys() == 1
+    assert list(IdempotencyKey.objects.values_list("key", flat=True)) == ["new"]
+
+
+def test_retry_losing_the_key_race_sends_no_notification(request, shop, monkeypatch, django_capture_on_commit_callbacks):
+    client, customer, products = shop
+    sent = []
+
+    def notify(sender, instance, **kwargs):
+        sent.append(instance.pk)
+    order_placed.connect(notify)
+    request.addfinalizer(lambda: order_placed.disconnect(notify))
+    with django_capture_on_commit_callbacks(execute=True):
+        first = place(client, customer, [(products[0].pk, 1)], key="k")
+    assert sent == [first.data["id"]]
+
+    # The retry misses the key on its first lookup, as if the first request had
+    # not committed yet, then loses on the unique constraint and is rolled back.
+    def miss(**kwargs):
+        raise IdempotencyKey.DoesNotExist
+    monkeypatch.setattr(IdempotencyKey.objects, "get", miss)
+    with django_capture_on_commit_callbacks(execute=True):
+        again = place(client, customer, [(products[0].pk, 1)], key="k")
+    assert (again.status_code, again.data["id"]) == (201, first.data["id"])
+    assert Order.objects.count() == 1
+    assert sent == [first.data["id"]]
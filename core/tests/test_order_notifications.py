@@ -15,7 +15,7 @@ def client_and_user(db):
     return client, user, cust
 
 @pytest.mark.django_db
-def test_order_notifications_sms_and_email(monkeypatch, client_and_user):
+def test_order_notifications_sms_and_email(monkeypatch, client_and_user, django_capture_on_commit_callbacks):
     client, user, cust = client_and_user
 
     # Build category tree
@@ -52,15 +52,20 @@ def test_order_notifications_sms_and_email(monkeypatch, client_and_user):
     monkeypatch.setattr("core.signals.send_mail", mock_send_mail)
 
     # Place order via API (ensures serializer fires signal after items)
-    resp = client.post(
-        "/api/orders/",
-        {
-            "items": [{"product": p.id, "quantity": 2}],
-            # 'customer' field is set in perform_create; safe to omit
-        },
-        format="json",
-    )
-    assert resp.status_code == 201
+    with django_capture_on_commit_callbacks() as callbacks:
+        resp = client.post(
+            "/api/orders/",
+            {
+                "customer": cust.id,
+                "items": [{"product": p.id, "quantity": 2}],
+            },
+            format="json",
+        )
+        assert resp.status_code == 201
+        # Nothing is sent until the order's transaction commits.
+        assert sms_calls == {} and email_calls == {}
+    for callback in callbacks:
+        callback()
     order_id = resp.data["id"]
     order = Order.objects.get(id=order_id)
 
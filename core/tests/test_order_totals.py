@@ -0,0 +1,117 @@
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from core.models import Customer, Order, OrderItem, Product
+from core.orders import create_order_items
+
+
+@pytest.fixture
+def shop(db):
+    cache.clear()
+    user = User.objects.create_user("kai", "kai@example.com", "pwd")
+    customer = Customer.objects.create(user=user, name="Kai", email="kai@example.com", phone_number="+254700000002")
+    client = APIClient()
+    client.force_authenticate(user=user)
+    bread = Product.objects.create(name="Bread", price="2.50", stock_quantity=100)
+    milk = Product.objects.create(name="Milk", price="1.20", stock_quantity=100)
+    return client, customer, bread, milk
+
+
+def test_totals_are_stored_when_the_order_is_placed(shop, django_assert_num_queries):
+    client, customer, bread, milk = shop
+    items = [{"product": bread.pk, "quantity": 2}, {"product": milk.pk, "quantity": 3}]
+    response = client.post("/api/orders/", {"customer": customer.pk, "items": items}, format="json")
+    assert response.status_code == 201
+    assert (response.data["total_amount"], response.data["item_count"]) == ("8.60", 5)
+
+    order = Order.objects.get(pk=response.data["id"])
+    with django_assert_num_queries(0):
+        assert order.total_price == Decimal("8.60")
+
+
+def test_orders_keep_the_prices_they_were_placed_at(shop):
+    client, customer, bread, milk = shop
+    items = [{"product": bread.pk, "quantity": 2}, {"product": milk.pk, "quantity": 1}]
+    order_id = client.post("/api/orders/", {"customer": customer.pk, "items": items}, format="json").data["id"]
+    Product.objects.filter(pk=bread.pk).update(price="9.99")
+
+    with CaptureQueriesContext(connection) as ctx:
+        data = client.get(f"/api/orders/{order_id}/").data
+    assert not any('"core_product"' in q["sql"] for q in ctx.captured_queries)
+    assert data["total_amount"] == "6.20"
+    assert [(i["unit_price"], i["line_total"]) for i in data["items"]] == [("2.50", "5.00"), ("1.20", "1.20")]
+
+
+def test_item_changes_update_the_totals(shop):
+    _, customer, bread, milk = shop
+    order = Order.objects.create(customer=customer)
+    item = OrderItem.objects.create(order=order, product=bread, quantity=1)
+    OrderItem.objects.create(order=order, product=milk, quantity=1)
+    order.refresh_from_db()
+    assert (order.total_amount, order.item_count) == (Decimal("3.70"), 2)
+
+    item.quantity = 4
+    item.save()
+    order.refresh_from_db()
+    assert (order.total_amount, order.item_count) == (Decimal("11.20"), 5)
+
+    item.delete()
+    order.refresh_from_db()
+    assert (order.total_amount, order.item_count) == (Decimal("1.20"), 1)
+
+
+def test_changing_an_items_product_reprices_it(shop):
+    _, customer, bread, milk = shop
+    order = Order.objects.create(customer=customer)
+    item = OrderItem.objects.create(order=order, product=bread, quantity=2)
+    Product.objects.filter(pk=bread.pk).update(price="9.99")
+
+    item.quantity = 3
+    item.save()
+    assert (item.unit_price, item.line_total) == (Decimal("2.50"), Decimal("7.50"))
+
+    item.product = milk
+    item.save()
+    assert (item.unit_price, item.line_total) == (Decimal("1.20"), Decimal("3.60"))
+
+    loaded = OrderItem.objects.get(pk=item.pk)
+    loaded.product = Product.objects.get(pk=bread.pk)
+    loaded.save()
+    assert (loaded.unit_price, loaded.line_total) == (Decimal("9.99"), Decimal("29.97"))
+
+
+def test_rebuild_command_restores_totals(shop):
+    _, customer, bread, _ = shop
+    order = Order.objects.create(customer=customer)
+    OrderItem.objects.create(order=order, product=bread, quantity=2)
+    Order.objects.filter(pk=order.pk).update(total_amount=0, item_count=0)
+    call_command("rebuild_order_totals")
+    order.refresh_from_db()
+    assert (order.total_amount, order.item_count) == (Decimal("5.00"), 2)
+
+
+def test_order_reads_take_a_fixed_number_of_queries(shop, django_assert_num_queries):
+    client, customer, bread, milk = shop
+
+    def place(count):
+        for _ in range(count):
+            order = Order.objects.create(customer=customer)
+            create_order_items(order, [(bread.pk, 1), (milk.pk, 2)])
+
+    place(2)
+    with CaptureQueriesContext(connection) as small:
+        client.get("/api/orders/")
+    place(3)
+    # The orders of the page, then one prefetch for all of their items.
+    with django_assert_num_queries(len(small)):
+        results = client.get("/api/orders/").data["results"]
+    assert [len(order["items"]) for order in results] == [2] * 5
+    with django_assert_num_queries(len(small)):
+        assert client.get(f"/api/orders/{results[0]['id']}/").data["total_amount"] == "4.90"
@@ -0,0 +1,74 @@
+import pytest
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import Customer, Order, Product
+
+
+@pytest.fixture
+def client(db):
+    user = User.objects.create_user("carol", "carol@example.com", "pwd")
+    Customer.objects.create(user=user, name="Carol", email="carol@example.com", phone_number="+254700000002")
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+def walk(client, url):
+    ids, pages = [], 0
+    while url:
+        resp = client.get(url)
+        assert resp.status_code == 200
+        ids += [row["id"] for row in resp.data["results"]]
+        url = resp.data["next"]
+        pages += 1
+    return ids, pages
+
+
+def test_products_keyset_pages_forward_and_back(client):
+    products = [Product.objects.create(name=f"P{i}", price="1.00") for i in range(7)]
+    ids, pages = walk(client, "/api/products/?page_size=3")
+    assert ids == [p.id for p in products]
+    assert pages == 3
+
+    second = client.get("/api/products/?page_size=3").data["next"]
+    third = client.get(second).data["next"]
+    back = client.get(client.get(third).data["previous"]).data
+    assert [row["id"] for row in back["results"]] == [p.id for p in products[3:6]]
+    assert back["next"] and back["previous"]
+
+
+def test_orders_keyset_is_stable_across_equal_timestamps(client):
+    customer = Customer.objects.get()
+    orders = [Order.objects.create(customer=customer) for _ in range(5)]
+    same = timezone.now()
+    Order.objects.update(created_at=same)
+
+    ids, _ = walk(client, "/api/orders/?page_size=2")
+    assert ids == sorted((o.id for o in orders), reverse=True)
+
+
+def test_invalid_cursor_is_404(client):
+    assert client.get("/api/products/?cursor=not-a-cursor").status_code == 404
+
+
+def test_my_orders_are_scoped_paged_and_preloaded(client, django_assert_num_queries):
+    carol = Customer.objects.get()
+    dave = Customer.objects.create(name="Dave", email="dave@example.com", phone_number="+254700000005")
+    mine = [Order.objects.create(customer=carol, total_amount="3.00", item_count=2) for _ in range(5)]
+    theirs = Order.objects.create(customer=dave)
+
+    ids, pages = walk(client, "/api/orders/mine/?page_size=2&fields=id,total_amount,item_count")
+    assert ids == [o.id for o in reversed(mine)]
+    assert pages == 3
+    page = client.get("/api/orders/mine/?fields=id,total_amount,item_count").data["results"]
+    assert page[0] == {"id": mine[-1].id, "total_amount": "3.00", "item_count": 2}
+
+    # A deep page is the same single keyset query as the first.
+    first = client.get("/api/orders/mine/?page_size=2")
+    with django_assert_num_queries(2):  # the orders, then their items
+        client.get(first.data["next"])
+
+    assert [row["id"] for row in client.get("/api/orders/").data["results"]] == ids
+    assert client.get(f"/api/orders/{theirs.id}/").status_code == 404
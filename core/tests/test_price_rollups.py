@@ -0,0 +1,157 @@
+from decimal import Decimal
+
+import pytest
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+
+from core.models import Category, CategoryPriceRollup, Product
+from core.product_bulk import create_products, update_products
+from core.rollups import subtree_price_stats
+
+
+def rollup(category):
+    r = CategoryPriceRollup.objects.get(category=category)
+    return r.price_sum, r.product_count, r.min_price, r.max_price
+
+
+@pytest.fixture
+def tree(db):
+    root = Category.objects.create(name="All Products")
+    fruits = Category.objects.create(name="Fruits", parent=root)
+    apples = Category.objects.create(name="Apples", parent=fruits)
+    bakery = Category.objects.create(name="Bakery", parent=root)
+    return root, fruits, apples, bakery
+
+
+def test_links_and_price_changes_update_rollups(tree):
+    root, fruits, apples, bakery = tree
+    red = Product.objects.create(name="Red Apple", price="100.00")
+    red.categories.set([apples])
+    bread = Product.objects.create(name="Bread", price="40.00")
+    bread.categories.set([bakery])
+
+    assert rollup(fruits) == (Decimal("100.00"), 1, Decimal("100.00"), Decimal("100.00"))
+    assert rollup(root) == (Decimal("140.00"), 2, Decimal("40.00"), Decimal("100.00"))
+
+    # Listed in two categories of the same subtree: still counted once.
+    red.categories.add(fruits)
+    assert rollup(root)[1] == 2
+
+    bread.price = Decimal("150.00")
+    bread.save()
+    assert rollup(root) == (Decimal("250.00"), 2, Decimal("100.00"), Decimal("150.00"))
+
+    red.categories.clear()
+    assert rollup(fruits) == (Decimal("0.00"), 0, None, None)
+    assert rollup(root) == (Decimal("150.00"), 1, Decimal("150.00"), Decimal("150.00"))
+
+    bakery.products.remove(bread)
+    assert rollup(root)[1] == 0
+
+
+def test_delete_removes_contribution(tree):
+    root, fruits, apples, bakery = tree
+    p = Product.objects.create(name="Green Apple", price="10.00")
+    p.categories.set([apples])
+    p.delete()
+    assert rollup(root) == (Decimal("0.00"), 0, None, None)
+
+
+def test_avg_price_reads_rollup(tree, django_assert_max_num_queries):
+    root, fruits, apples, bakery = tree
+    for name, price in [("A", "100.00"), ("B", "200.00")]:
+        Product.objects.create(name=name, price=price).categories.set([apples])
+    user = User.objects.create_user("bob", "bob@example.com", "pwd")
+    client = APIClient()
+    client.force_authenticate(user=user)
+    client.get(f"/api/products/avg-price/?category_id={root.id}")
+
+    with django_assert_max_num_queries(1):
+        resp = client.get(f"/api/products/avg-price/?category_id={fruits.id}")
+    assert resp.status_code == 200
+    assert resp.data["average_price"] == Decimal("150")
+
+
+def test_rebuild_command_restores_drifted_rollups(tree):
+    root, fruits, apples, bakery = tree
+    p = Product.objects.create(name="Red Apple", price="30.00")
+    p.categories.set([apples, bakery])
+    expected = rollup(root)
+    CategoryPriceRollup.objects.update(price_sum=0, product_count=0)
+
+    with pytest.raises(Exception):
+        call_command("rebuild_price_rollups", "--check")
+    call_command("rebuild_price_rollups")
+    assert rollup(root) == expected
+
+
+def test_avg_price_batch_counts_each_product_once(tree, django_assert_max_num_queries):
+    root, fruits, apples, bakery = tree
+    Product.objects.create(name="A", price="100.00").categories.set([apples, fruits])
+    Product.objects.create(name="B", price="200.00").categories.set([apples])
+    Product.objects.create(name="C", price="60.00").categories.set([bakery])
+    user = User.objects.create_user("bob", "bob@example.com", "pwd")
+    client = APIClient()
+    client.force_authenticate(user=user)
+    client.get(f"/api/products/avg-price/?category_id={root.id}")
+
+    with django_assert_max_num_queries(1):
+        resp = client.get(f"/api/products/avg-price/batch/?category_ids={fruits.id},{root.id},999999,{apples.id}")
+    assert resp.status_code == 200
+    results = {r["category_id"]: r for r in resp.data["results"]}
+    assert [r["category_id"] for r in resp.data["results"]] == [fruits.id, root.id, apples.id]
+    assert results[fruits.id]["average_price"] == Decimal("150")
+    assert results[fruits.id]["product_count"] == 2
+    assert results[root.id]["average_price"] == Decimal("120")
+    assert resp.data["not_found"] == [999999]
+
+
+def test_subtree_price_stats_matches_rollups(tree):
+    root, fruits, apples, bakery = tree
+    Product.objects.create(name="A", price="10.50").categories.set([apples, fruits])
+    Product.objects.create(name="B", price="4.00").categories.set([bakery])
+    live = subtree_price_stats([root.id, fruits.id, bakery.id])
+    for category in (root, fruits, bakery):
+        assert live[category.id] == rollup(category)
+
+
+def test_bulk_create_and_update_keep_rollups_exact(tree):
+    root, fruits, apples, bakery = tree
+    cheap, dear = create_products([
+        (Product(name="Cheap", price=Decimal("1.00")), [apples.id]),
+        (Product(name="Dear", price=Decimal("90.00")), [apples.id, bakery.id]),
+    ])
+    assert rollup(root) == (Decimal("91.00"), 2, Decimal("1.00"), Decimal("90.00"))
+
+    # Cheap moves to the bakery at a new price, Dear drops out of fruit: bounds must shrink.
+    cheap.price = Decimal("5.00")
+    update_products([(cheap, [bakery.id]), (dear, [bakery.id])], ["price"])
+    for category in (root, fruits, apples, bakery):
+        live = subtree_price_stats([category.id]).get(category.id, (Decimal("0.00"), 0, None, None))
+        assert rollup(category) == live
+
+
+def test_moving_and_deleting_categories_keep_rollups_exact(tree):
+    root, fruits, apples, bakery = tree
+    other = Category.objects.create(name="Other")
+    Product.objects.create(name="A", price="10.00").categories.set([apples])
+    Product.objects.create(name="B", price="20.00").categories.set([apples, bakery])
+    Product.objects.create(name="C", price="30.00").categories.set([fruits])
+
+    # Fruits moves to another tree by setting its parent, then under Bakery with move_to.
+    fruits = Category.objects.get(pk=fruits.pk)  # Bakery shifted its MPTT fields
+    fruits.parent = other
+    fruits.save()
+    assert rollup(other) == (Decimal("60.00"), 3, Decimal("10.00"), Decimal("30.00"))
+    assert rollup(root) == (Decimal("20.00"), 1, Decimal("20.00"), Decimal("20.00"))
+    fruits.move_to(bakery)
+    assert rollup(other) == (Decimal("0.00"), 0, None, None)
+    assert rollup(bakery) == (Decimal("60.00"), 3, Decimal("10.00"), Decimal("30.00"))
+    call_command("rebuild_price_rollups", "--check")
+
+    # Deleting Fruits deletes Apples too: A and C leave every ancestor, B stays in Bakery.
+    Category.objects.get(pk=fruits.pk).delete()
+    assert rollup(bakery) == (Decimal("20.00"), 1, Decimal("20.00"), Decimal("20.00"))
+    assert rollup(root) == (Decimal("20.00"), 1, Decimal("20.00"), Decimal("20.00"))
+    call_command("rebuild_price_rollups", "--check")
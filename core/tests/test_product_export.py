@@ -0,0 +1,123 @@
+import csv
+import io
+import json
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.inventory import reserve_stock, shard_stock
+from core.models import Category, Product
+from core.product_bulk import update_price_and_stock
+from core.product_export import export_rows
+
+
+@pytest.fixture
+def client(db):
+    cache.clear()
+    client = APIClient()
+    client.force_authenticate(user=User.objects.create_user("ida", "ida@example.com", "pwd"))
+    return client
+
+
+@pytest.fixture
+def catalog(db):
+    root = Category.objects.create(name="All Products")
+    bakery = Category.objects.create(name="Bakery", parent=root)
+    bread = Category.objects.create(name="Bread", parent=bakery)
+    fruit = Category.objects.create(name="Fruit", parent=root)
+    loaf = Product.objects.create(name="Loaf", description='Big, "crusty"', price="2.50", stock_quantity=4)
+    loaf.categories.set([bread, fruit])
+    apple = Product.objects.create(name="Apple", price="0.80")
+    apple.categories.set([fruit])
+    return loaf, apple
+
+
+def export(client, **params):
+    response = client.get("/api/products/export/", params)
+    assert response.status_code == 200
+    return response, b"".join(response.streaming_content).decode()
+
+
+def test_csv_export_has_category_paths(client, catalog):
+    response, body = export(client)
+    assert response["Content-Type"] == "text/csv"
+    rows = list(csv.DictReader(io.StringIO(body)))
+    assert [row["name"] for row in rows] == ["Loaf", "Apple"]
+    assert rows[0]["description"] == 'Big, "crusty"'
+    assert rows[0]["price"] == "2.50"
+    assert rows[0]["category_paths"] == "All Products > Bakery > Bread;All Products > Fruit"
+
+
+def test_ndjson_export_and_filters(client, catalog):
+    response, body = export(client, kind="ndjson", max_price="1.00")
+    assert response["Content-Type"] == "application/x-ndjson"
+    records = [json.loads(line) for line in body.splitlines()]
+    assert len(records) == 1
+    assert records[0]["name"] == "Apple"
+    assert records[0]["price"] == "0.80"
+    assert records[0]["category_paths"] == [["All Products", "Fruit"]]
+
+
+def test_changed_since_includes_bulk_writes(client, catalog):
+    loaf, apple = catalog
+    later = timezone.now() + timedelta(seconds=1)
+    Product.objects.filter(pk=apple.pk).update(updated_at=later - timedelta(days=1))
+    Product.objects.filter(pk=loaf.pk).update(updated_at=later - timedelta(days=1))
+    assert export(client, kind="ndjson", changed_since=later.isoformat())[1] == ""
+
+    update_price_and_stock({apple.pk: {"stock_quantity": 9}})
+    response, body = export(client, kind="ndjson", changed_since=(later - timedelta(hours=1)).isoformat())
+    assert [json.loads(line)["id"] for line in body.splitlines()] == [apple.pk]
+    assert response["X-Next-Changed-Since"]
+
+
+def test_bad_parameters_are_400(client, catalog):
+    assert client.get("/api/products/export/", {"kind": "xml"}).status_code == 400
+    assert client.get("/api/products/export/", {"changed_since": "yesterday"}).status_code == 400
+
+
+def test_changed_since_sees_category_changes(client, catalog):
+    loaf, apple = catalog
+
+    def changed_by(change):
+        Product.objects.update(updated_at=timezone.now() - timedelta(days=1))
+        since = timezone.now()
+        change()
+        body = export(client, kind="ndjson", changed_since=since.isoformat())[1]
+        return {record["name"]: record["category_paths"] for record in map(json.loads, body.splitlines())}
+
+    bakery, bread, fruit = (Category.objects.get(name=name) for name in ("Bakery", "Bread", "Fruit"))
+    assert changed_by(lambda: apple.categories.add(bakery)) == {
+        "Apple": [["All Products", "Bakery"], ["All Products", "Fruit"]],
+    }
+    bread.name = "Loaves"
+    assert changed_by(bread.save) == {"Loaf": [["All Products", "Bakery", "Loaves"], ["All Products", "Fruit"]]}
+    assert changed_by(lambda: Category.objects.get(pk=bakery.pk).move_to(fruit)) == {
+        "Apple": [["All Products", "Fruit", "Bakery"], ["All Products", "Fruit"]],
+        "Loaf": [["All Products", "Fruit", "Bakery", "Loaves"], ["All Products", "Fruit"]],
+    }
+    assert changed_by(fruit.products.clear) == {
+        "Apple": [["All Products", "Fruit", "Bakery"]], "Loaf": [["All Products", "Fruit", "Bakery", "Loaves"]],
+    }
+    assert changed_by(lambda: Category.objects.get(pk=bread.pk).delete()) == {"Loaf": []}
+
+
+def test_sharded_products_export_live_stock(client, catalog):
+    loaf, _ = catalog
+    shard_stock(loaf.pk, 2)
+    reserve_stock([(loaf.pk, 3)])
+    records = [json.loads(line) for line in export(client, kind="ndjson")[1].splitlines()]
+    assert [r["stock_quantity"] for r in records if r["id"] == loaf.pk] == [1]
+
+
+def test_export_reads_links_once_per_chunk(catalog, django_assert_num_queries):
+    cache.clear()
+    list(export_rows())  # warm the tree snapshot and the set of sharded products
+    with django_assert_num_queries(2):  # products, then their links; the tree snapshot is cached
+        list(export_rows(chunk_size=10))
+    with django_assert_num_queries(3):
+        assert len(list(export_rows(chunk_size=1))) == 2
@@ -0,0 +1,78 @@
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from core.models import Category, Product
+
+
+@pytest.fixture
+def client(db):
+    client = APIClient()
+    client.force_authenticate(user=User.objects.create_user("dave", "dave@example.com", "pwd"))
+    return client
+
+
+@pytest.fixture
+def catalog(db):
+    food = Category.objects.create(name="Food")
+    fruit = Category.objects.create(name="Fruit", parent=food)
+    apples = Category.objects.create(name="Apples", parent=fruit)
+    dairy = Category.objects.create(name="Dairy", parent=food)
+    tools = Category.objects.create(name="Tools")
+
+    def product(name, price, stock, *categories):
+        p = Product.objects.create(name=name, price=price, stock_quantity=stock)
+        p.categories.set(categories)
+        return p
+
+    return {
+        "cats": {"food": food, "fruit": fruit, "apples": apples, "dairy": dairy, "tools": tools},
+        "gala": product("Gala", "4.00", 10, apples, fruit),
+        "pear": product("Pear", "12.00", 0, fruit),
+        "milk": product("Milk", "30.00", 5, dairy),
+        "hammer": product("Hammer", "120.00", 2, tools),
+    }
+
+
+def ids(resp):
+    return [row["id"] for row in resp.data["results"]]
+
+
+def test_filters_by_price_stock_and_subtree(client, catalog):
+    cats = catalog["cats"]
+    assert ids(client.get("/api/products/?min_price=10&max_price=100")) == [catalog["pear"].id, catalog["milk"].id]
+    assert ids(client.get("/api/products/?in_stock=false")) == [catalog["pear"].id]
+    # Gala is listed under two categories of the subtree but returned once.
+    assert ids(client.get(f"/api/products/?category={cats['fruit'].id}")) == [catalog["gala"].id, catalog["pear"].id]
+    assert ids(client.get(f"/api/products/?category={cats['food'].id}&in_stock=true")) == [
+        catalog["gala"].id, catalog["milk"].id,
+    ]
+    assert ids(client.get("/api/products/?category=999999")) == []
+    assert client.get("/api/products/?category=1.5").status_code == 400
+
+
+def test_facets_for_category_children(client, catalog):
+    cats = catalog["cats"]
+    facets = client.get(f"/api/products/?category={cats['food'].id}&facets=true").data["facets"]
+    assert facets["count"] == 3
+    assert facets["stock"] == {"in_stock": 2, "out_of_stock": 1}
+    assert {c["name"]: c["count"] for c in facets["categories"]} == {"Dairy": 1, "Fruit": 2}
+    prices = {str(b["min"]): b["count"] for b in facets["price"] if b["count"]}
+    assert prices == {"0": 1, "10": 1, "25": 1}
+
+    roots = client.get("/api/products/?facets=true&in_stock=true").data["facets"]["categories"]
+    assert {c["name"]: c["count"] for c in roots} == {"Food": 2, "Tools": 1}
+
+
+def test_facet_query_count_does_not_grow_with_values(client, catalog):
+    food = catalog["cats"]["food"]
+    for i in range(20):
+        Category.objects.create(name=f"Aisle {i}", parent=food)
+    client.get(f"/api/products/?category={food.id}&facets=true")  # warm the category snapshot
+    with CaptureQueriesContext(connection) as plain:
+        client.get(f"/api/products/?category={food.id}")
+    with CaptureQueriesContext(connection) as faceted:
+        client.get(f"/api/products/?category={food.id}&facets=true")
+    assert len(faceted) - len(plain) == 2
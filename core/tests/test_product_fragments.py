@@ -0,0 +1,55 @@
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from rest_framework.test import APIClient
+
+from core import fragments
+from core.models import Category, Product
+
+
+@pytest.fixture
+def client(db):
+    cache.clear()
+    client = APIClient()
+    client.force_authenticate(user=User.objects.create_user("fay", "fay@example.com", "pwd", is_staff=True))
+    return client
+
+
+def names(client):
+    return [row["name"] for row in client.get("/api/products/").data["results"]]
+
+
+def test_list_is_served_from_fragments(client):
+    products = [Product.objects.create(name=f"P{i}", price="1.00") for i in range(3)]
+    assert names(client) == ["P0", "P1", "P2"]
+    assert fragments.stats() == {"hits": 0, "misses": 3, "hit_ratio": 0.0}
+    assert names(client) == ["P0", "P1", "P2"]
+    assert fragments.stats()["hits"] == 3
+    assert cache.get(fragments.fragment_key(products[0].pk))["name"] == "P0"
+
+
+def test_save_and_category_links_invalidate(client):
+    product = Product.objects.create(name="Old", price="1.00")
+    category = Category.objects.create(name="Misc")
+    names(client)
+
+    product.name = "New"
+    product.save()
+    assert cache.get(fragments.fragment_key(product.pk)) is None
+    assert names(client) == ["New"]
+
+    product.categories.add(category)
+    assert cache.get(fragments.fragment_key(product.pk)) is None
+    names(client)
+    category.products.clear()
+    assert cache.get(fragments.fragment_key(product.pk)) is None
+
+
+def test_cache_stats_endpoint_is_admin_only(client):
+    Product.objects.create(name="P", price="1.00")
+    names(client)
+    assert client.get("/api/products/cache-stats/").data["misses"] == 1
+
+    other = APIClient()
+    other.force_authenticate(user=User.objects.create_user("gus", "gus@example.com", "pwd"))
+    assert other.get("/api/products/cache-stats/").status_code == 403
@@ -0,0 +1,56 @@
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from core.models import Customer, Order, OrderItem, Product
+
+
+@pytest.fixture
+def client(db):
+    user = User.objects.create_user("hal", "hal@example.com", "pwd")
+    Customer.objects.create(user=user, name="Hal", email="hal@example.com", phone_number="+254700000003")
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+def product_select(queries):
+    return next(q["sql"] for q in queries if q["sql"].startswith('SELECT "core_product"'))
+
+
+def test_product_fields_narrow_select_and_output(client):
+    products = [Product.objects.create(name=f"P{i}", description="long text", price="2.50") for i in range(3)]
+    with CaptureQueriesContext(connection) as queries:
+        resp = client.get("/api/products/?fields=name,price&page_size=2")
+    assert resp.status_code == 200
+    assert resp.data["results"] == [{"name": "P0", "price": "2.50"}, {"name": "P1", "price": "2.50"}]
+    assert "description" not in product_select(queries)
+
+    # Keyset paging still works from values() rows.
+    rest = client.get(resp.data["next"]).data["results"]
+    assert rest == [{"name": "P2", "price": "2.50"}]
+
+    detail = client.get(f"/api/products/{products[0].id}/?fields=id,stock_quantity").data
+    assert detail == {"id": products[0].id, "stock_quantity": 0}
+
+
+def test_values_path_matches_serializer_output(client):
+    customer = Customer.objects.get()
+    order = Order.objects.create(customer=customer, status="shipped")
+    OrderItem.objects.create(order=order, product=Product.objects.create(name="P", price="1.00"), quantity=2)
+
+    full = client.get("/api/orders/").data["results"][0]
+    sparse = client.get("/api/orders/?fields=id,customer,created_at,status").data["results"][0]
+    assert sparse == {k: full[k] for k in ("id", "customer", "created_at", "status")}
+
+    with_items = client.get("/api/orders/?fields=id,items").data["results"][0]
+    item = {"product": order.items.get().product_id, "quantity": 2, "unit_price": "1.00", "line_total": "2.00"}
+    assert with_items == {"id": order.id, "items": [item]}
+
+
+def test_unknown_field_is_400(client):
+    resp = client.get("/api/products/?fields=name,category_ids")
+    assert resp.status_code == 400
+    assert "category_ids" in str(resp.data["fields"])
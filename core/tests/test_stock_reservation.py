@@ -0,0 +1,193 @@
+import io
+import threading
+import time
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from django.core.management import call_command
+
+from core import inventory
+from core.inventory import OutOfStock, rebalance_stock_shards, reserve_stock, shard_stock, stock_levels
+from core.models import Customer, Order, Product, StockShard
+from core.product_bulk import update_price_and_stock
+from core.product_import import import_products_csv
+
+
+@pytest.fixture
+def customer_client(db):
+    cache.clear()
+    user = User.objects.create_user("jo", "jo@example.com", "pwd")
+    customer = Customer.objects.create(user=user, name="Jo", email="jo@example.com", phone_number="+254700000001")
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client, customer
+
+
+def place(client, customer, *items):
+    items = [{"product": product.pk, "quantity": quantity} for product, quantity in items]
+    return client.post("/api/orders/", {"customer": customer.pk, "items": items}, format="json")
+
+
+def stock(product):
+    return Product.objects.values_list("stock_quantity", flat=True).get(pk=product.pk)
+
+
+def test_order_takes_items_out_of_stock(customer_client):
+    client, customer = customer_client
+    bread = Product.objects.create(name="Bread", price="1.00", stock_quantity=5)
+    milk = Product.objects.create(name="Milk", price="1.00", stock_quantity=3)
+    assert place(client, customer, (bread, 2), (milk, 1), (bread, 1)).status_code == 201
+    assert (stock(bread), stock(milk)) == (2, 2)
+
+
+def test_short_item_rejects_the_whole_order(customer_client):
+    client, customer = customer_client
+    bread = Product.objects.create(name="Bread", price="1.00", stock_quantity=5)
+    milk = Product.objects.create(name="Milk", price="1.00", stock_quantity=1)
+    response = place(client, customer, (bread, 2), (milk, 3))
+    assert response.status_code == 409
+    assert response.data["code"] == "out_of_stock"
+    assert response.data["items"] == [{"product": milk.pk, "requested": 3, "available": 1}]
+    assert (stock(bread), stock(milk)) == (5, 1)
+    assert not Order.objects.exists()
+
+
+def test_products_are_updated_in_id_order(db):
+    first = Product.objects.create(name="A", price="1.00", stock_quantity=5)
+    second = Product.objects.create(name="B", price="1.00", stock_quantity=5)
+    with CaptureQueriesContext(connection) as ctx:
+        reserve_stock([(second.pk, 1), (first.pk, 1)])
+    updates = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("UPDATE")]
+    assert [f'"id" = {first.pk}' in sql for sql in updates] == [True, False]
+    assert [f'"id" = {second.pk}' in sql for sql in updates] == [False, True]
+
+
+def shards(product):
+    return list(StockShard.objects.filter(product=product).order_by("shard").values_list("quantity", flat=True))
+
+
+def test_sharded_stock_is_spread_drained_and_rebalanced(customer_client):
+    client, customer = customer_client
+    hot = Product.objects.create(name="Hot", price="1.00", stock_quantity=10)
+    shard_stock(hot.pk, 4)
+    assert shards(hot) == [3, 3, 2, 2]
+
+    # No single shard can cover 5: it is taken across shards, in shard order.
+    assert place(client, customer, (hot, 5)).status_code == 201
+    assert sum(shards(hot)) == 5
+    assert client.get(f"/api/products/{hot.pk}/").data["stock_quantity"] == 5
+    assert client.get("/api/products/", {"fields": "id,stock_quantity"}).data["results"] == [
+        {"id": hot.pk, "stock_quantity": 5},
+    ]
+    assert stock(hot) == 10  # the total as of the last rebalance
+
+    response = place(client, customer, (hot, 6))
+    assert response.status_code == 409
+    assert response.data["items"] == [{"product": hot.pk, "requested": 6, "available": 5}]
+
+    call_command("rebalance_stock_shards")
+    assert (shards(hot), stock(hot)) == ([2, 1, 1, 1], 5)
+
+
+def test_setting_and_unsharding_sharded_stock(db):
+    cache.clear()
+    hot = Product.objects.create(name="Hot", price="1.00", stock_quantity=10)
+    shard_stock(hot.pk, 2)
+    update_price_and_stock({hot.pk: {"stock_quantity": 7}})
+    assert (shards(hot), stock(hot)) == ([4, 3], 7)
+
+    reserve_stock([(hot.pk, 2)])
+    assert shard_stock(hot.pk, 0) == 5
+    assert (shards(hot), stock(hot), stock_levels([hot.pk])) == ([], 5, {hot.pk: 5})
+    reserve_stock([(hot.pk, 5)])
+    assert rebalance_stock_shards() == {}
+
+
+def test_fallback_rereads_a_shard_drained_meanwhile(db, monkeypatch):
+    cache.clear()
+    hot = Product.objects.create(name="Hot", price="1.00", stock_quantity=6)
+    shard_stock(hot.pk, 2)
+    real_take = inventory._take
+
+    def take(product_id, shard, quantity):
+        if quantity < 5 and not hasattr(take, "drained"):
+            take.drained = True  # a concurrent order takes one unit from shard 0
+            StockShard.objects.filter(product_id=product_id, shard=0).update(quantity=F("quantity") - 1)
+        return real_take(product_id, shard, quantity)
+
+    monkeypatch.setattr(inventory, "_take", take)
+    reserve_stock([(hot.pk, 5)])
+    assert shards(hot) == [0, 0]
+
+
+def test_fallback_skips_a_shard_removed_by_a_reshard(db, monkeypatch):
+    cache.clear()
+    hot = Product.objects.create(name="Hot", price="1.00", stock_quantity=6)
+    shard_stock(hot.pk, 2)
+    real_take = inventory._take
+
+    def take(product_id, shard, quantity):
+        if quantity < 5 and not hasattr(take, "resharded"):
+            take.resharded = True  # shard 0 is folded into shard 1 meanwhile
+            StockShard.objects.filter(product_id=product_id, shard=0).delete()
+            StockShard.objects.filter(product_id=product_id, shard=1).update(quantity=6)
+        return real_take(product_id, shard, quantity)
+
+    monkeypatch.setattr(inventory, "_take", take)
+    # A clean shortage rather than StockShard.DoesNotExist.
+    with pytest.raises(OutOfStock):
+        reserve_stock([(hot.pk, 5)])
+
+
+def test_upsert_import_restocks_sharded_products(db):
+    cache.clear()
+    hot = Product.objects.create(name="Hot", price="1.00", stock_quantity=10)
+    shard_stock(hot.pk, 2)
+    csv_file = io.BytesIO(b"name,price,category_path,stock_quantity\nHot,1.00,All Products,100\n")
+    assert import_products_csv(csv_file, upsert=True)["updated"] == 1
+    assert (shards(hot), stock_levels([hot.pk])) == ([50, 50], {hot.pk: 100})
+    rebalance_stock_shards()
+    assert stock(hot) == 100
+
+
+@pytest.mark.parametrize("shard_count", [0, 4])
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_orders_never_oversell(shard_count):
+    cache.clear()
+    product = Product.objects.create(name="Hot", price="1.00", stock_quantity=10)
+    if shard_count:
+        shard_stock(product.pk, shard_count)
+    outcomes = []
+    start = threading.Barrier(20)
+
+    def buy():
+        start.wait()
+        try:
+            while True:
+                try:
+                    reserve_stock([(product.pk, 1)])
+                    outcomes.append("ok")
+                except OutOfStock:
+                    outcomes.append("short")
+                except OperationalError:
+                    # The shared-cache in-memory SQLite test database reports a
+                    # held lock instead of waiting for it.
+                    time.sleep(0.001)
+                    continue
+                break
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=buy) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(outcomes) == ["ok"] * 10 + ["short"] * 10
+    assert stock_levels([product.pk]) == {product.pk: 0}
@@ -1,48 +1,464 @@
-from django.db.models import Avg
-from rest_framework import viewsets, permissions
+import json
+import math
+import time
+from datetime import datetime, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+from django.http import HttpResponseNotModified, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import http_date, parse_etags, quote_etag
+from rest_framework import mixins, permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.serializers import as_serializer_error
 
-from .models import Category, Product, Order, Customer
-from .serializers import CategorySerializer, ProductSerializer, OrderSerializer
+from . import fragments
+from .category_tree import GENERATION as CATEGORY_GENERATION, get_category_tree
+from .facets import product_facets
+from .filters import ProductFilter
+from .generations import PRODUCT_GENERATION, get_generation, last_modified
+from .imports import create_import_job, create_json_import_job, resume
+from .inventory import sharded_product_ids, stock_levels
+from .models import Category, CategoryPriceRollup, IdempotencyKey, ImportJob, Product, Order, OrderItem
+from .orders import request_fingerprint
+from .product_bulk import update_price_and_stock
+from .product_export import FORMATS as EXPORT_FORMATS, export_rows
+from .pagination import KeysetPagination, cursor_link, decode_cursor, encode_cursor
+from .search import search_product_ids
+from .serializers import (
+    CategorySerializer, ImportJobSerializer, ProductSerializer, ProductStockPriceSerializer, OrderSerializer,
+)
+from .sparse import SparseFieldsMixin
 
 class IsCustomer(permissions.BasePermission):
     def has_permission(self, request, view):
         return bool(request.user and request.user.is_authenticated and hasattr(request.user, "customer_profile"))
 
-class CategoryViewSet(viewsets.ModelViewSet):
+def _iter_tree_json(rows, buffer_size=64 * 1024):
+    """Stream ``(id, name, parent_id, level)`` rows in MPTT order as nested JSON.
+
+    Only the current depth is kept: a node opens its ``children`` list and the
+    next row's level says how many lists to close first.
+    """
+    buf = ["["]
+    size = 1
+    prev_level = None
+    for cid, name, parent_id, level in rows:
+        if prev_level is not None and level <= prev_level:
+            buf.append("]}" * (prev_level - level + 1) + ",")
+        piece = '{"id":%d,"name":%s,"parent":%s,"children":[' % (
+            cid, json.dumps(name), "null" if parent_id is None else parent_id,
+        )
+        buf.append(piece)
+        size += len(piece)
+        prev_level = level
+        if size >= buffer_size:
+            yield "".join(buf)
+            buf, size = [], 0
+    if prev_level is not None:
+        buf.append("]}" * (prev_level + 1))
+    buf.append("]")
+    yield "".join(buf)
+
+class ConditionalGetMixin:
+    """Conditional GET for ``list`` and ``retrieve`` from change generations.
+
+    The ETag is derived from the generations named in ``conditional_generations``
+    and Last-Modified from their latest bump, so If-None-Match/If-Modified-Since
+    are answered with 304 before any row is loaded. Last-Modified has one-second
+    resolution and is rounded up, so a bump later in the second a client last
+    saw is never reported as older than that second; clients should still
+    prefer the ETag.
+    """
+    conditional_generations = ()
+
+    def get_validators(self, request):
+        generations = "-".join(str(get_generation(name)) for name in self.conditional_generations)
+        etag = quote_etag(f"{self.basename}-{request.accepted_renderer.format}-{generations}")
+        modified = math.ceil(max(last_modified(name) for name in self.conditional_generations))
+        return etag, modified
+
+    def _conditional(self, handler, request, *args, **kwargs):
+        etag, modified = self.get_validators(request)
+        response = get_conditional_response(request, etag=etag, last_modified=modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(modified)
+            response["Cache-Control"] = "no-cache"
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(super().retrieve, request, *args, **kwargs)
+
+class CategoryViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticated]
+    conditional_generations = (CATEGORY_GENERATION,)
+
+    @action(detail=False, methods=["get"])
+    def tree(self, request):
+        """
+        The whole category forest as nested JSON, streamed from one query in MPTT order.
 
-class ProductViewSet(viewsets.ModelViewSet):
+        The ETag is the category change generation, so a matching If-None-Match
+        is answered with 304 without touching the database.
+        """
+        etag = quote_etag(f"category-tree-{get_generation(CATEGORY_GENERATION)}")
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = HttpResponseNotModified()
+        else:
+            rows = (
+                Category.objects.order_by("tree_id", "lft")
+                .values_list("id", "name", "parent_id", "level")
+                .iterator(chunk_size=2000)
+            )
+            response = StreamingHttpResponse(_iter_tree_json(rows), content_type="application/json")
+        response["ETag"] = etag
+        response["Cache-Control"] = "no-cache"
+        return response
+
+class ProductViewSet(ConditionalGetMixin, SparseFieldsMixin, viewsets.ModelViewSet):
     queryset = Product.objects.all().select_related()
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ("id",)
+    filterset_class = ProductFilter
+    # Listings filter on category subtrees and facet on category names.
+    conditional_generations = (PRODUCT_GENERATION, CATEGORY_GENERATION)
+    values_fields = {name: name for name in ("id", "name", "description", "price", "stock_quantity")}
+    MAX_AVG_PRICE_BATCH = 500
+    MAX_BULK_UPDATE = 50_000
+    # Saves still in flight when an export starts commit with an earlier
+    # updated_at; the suggested next changed_since reaches back over them.
+    EXPORT_OVERLAP = timedelta(minutes=5)
+
+    def list(self, request, *args, **kwargs):
+        """
+        Filters: ?min_price=&max_price=&in_stock=true|false&category=<id> (whole subtree)
+
+        With ?facets=true the page also carries facet counts over the whole
+        filtered result: price buckets, stock availability and products per
+        child of ``category`` (per root category without one).
+        """
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200 and request.query_params.get("facets", "").lower() in ("1", "true"):
+            try:
+                category_id = int(request.query_params["category"])
+            except (KeyError, ValueError):
+                category_id = None
+            response.data["facets"] = product_facets(self.filter_queryset(self.get_queryset()), category_id)
+        return response
 
     @action(detail=False, methods=["get"], url_path="avg-price")
     def avg_price(self, request):
         """
         ?category_id=<id>  -> average price for that category + ALL descendants
+
+        Read from the precomputed CategoryPriceRollup row; a product listed in
+        several categories of the subtree counts once.
         """
         cid = request.query_params.get("category_id")
         if not cid:
             return Response({"detail": "category_id is required"}, status=400)
         try:
-            cat = Category.objects.get(id=cid)
-        except Category.DoesNotExist:
+            cid = int(cid)
+        except ValueError:
+            return Response({"detail": "category_id must be an integer"}, status=400)
+        tree = get_category_tree()
+        if cid not in tree:
             return Response({"detail": "category not found"}, status=404)
 
-        descendants = cat.get_descendants(include_self=True).values_list("id", flat=True)
-        avg = Product.objects.filter(categories__in=descendants).aggregate(avg=Avg("price"))["avg"]
-        return Response({"category": cat.name, "average_price": avg})
+        rollup = CategoryPriceRollup.objects.filter(category_id=cid).first()
+        avg = rollup.average_price if rollup else None
+        return Response({"category": tree.name(cid), "average_price": avg})
+
+    @action(detail=False, methods=["get"], url_path="avg-price/batch")
+    def avg_price_batch(self, request):
+        """
+        ?category_ids=<id>,<id>,...  -> price stats for each category + ALL descendants
+
+        One query over CategoryPriceRollup for the whole batch. Results keep the
+        requested order; unknown ids are listed under "not_found".
+        """
+        raw = request.query_params.get("category_ids", "")
+        try:
+            ids = list(dict.fromkeys(int(part) for part in raw.split(",") if part.strip()))
+        except ValueError:
+            return Response({"detail": "category_ids must be comma-separated integers"}, status=400)
+        if not ids:
+            return Response({"detail": "category_ids is required"}, status=400)
+        if len(ids) > self.MAX_AVG_PRICE_BATCH:
+            return Response({"detail": f"at most {self.MAX_AVG_PRICE_BATCH} category_ids per request"}, status=400)
+
+        tree = get_category_tree()
+        found = [cid for cid in ids if cid in tree]
+        rollups = CategoryPriceRollup.objects.in_bulk(found)
+        results = []
+        for cid in found:
+            rollup = rollups.get(cid)
+            results.append({
+                "category_id": cid,
+                "category": tree.name(cid),
+                "average_price": rollup.average_price if rollup else None,
+                "product_count": rollup.product_count if rollup else 0,
+                "min_price": rollup.min_price if rollup else None,
+                "max_price": rollup.max_price if rollup else None,
+            })
+        return Response({"results": results, "not_found": [cid for cid in ids if cid not in tree]})
+
+    def values_representation(self, rows, fields):
+        rows = list(rows)
+        data = super().values_representation(rows, fields)
+        if "stock_quantity" in fields:
+            # Sharded products: the live sum, not the total of the last rebalance.
+            sharded = sharded_product_ids()
+            levels = stock_levels([row["id"] for row in rows if row["id"] in sharded]) if sharded else {}
+            for row, item in zip(rows, data):
+                if row["id"] in levels:
+                    item["stock_quantity"] = levels[row["id"]]
+        return data
+
+    @action(detail=False, methods=["post"], url_path="bulk-update", permission_classes=[permissions.IsAdminUser])
+    def bulk_update(self, request):
+        """
+        [{"id": 1, "price": "9.99"}, {"id": 2, "stock_quantity": 0}, ...]  -> apply all in one transaction
+
+        Invalid rows and unknown ids are reported by index and skipped; a later
+        row for the same id wins. Unchanged values are not written.
+        """
+        items = request.data
+        if not isinstance(items, list):
+            return Response({"detail": "Expected a JSON array."}, status=400)
+        if len(items) > self.MAX_BULK_UPDATE:
+            return Response({"detail": f"at most {self.MAX_BULK_UPDATE} rows per request"}, status=400)
+
+        start = time.perf_counter()
+        serializer = ProductStockPriceSerializer()
+        changes, positions, errors = {}, {}, []
+        for idx, item in enumerate(items):
+            try:
+                data = serializer.run_validation(item)
+            except ValidationError as exc:
+                errors.append({"index": idx, "errors": as_serializer_error(exc)})
+                continue
+            pid = data.pop("id")
+            changes.setdefault(pid, {}).update(data)
+            positions[pid] = idx
+        updated, missing = update_price_and_stock(changes)
+        errors += [{"index": positions[pid], "errors": {"id": ["product not found"]}} for pid in missing]
+        errors.sort(key=lambda error: error["index"])
+        elapsed = time.perf_counter() - start
+        return Response({
+            "received": len(items),
+            "updated": len(updated),
+            "unchanged": len(changes) - len(updated) - len(missing),
+            "errors": errors,
+            "elapsed_ms": round(elapsed * 1000, 1),
+            "rows_per_second": round(len(items) / elapsed) if elapsed else None,
+        })
+
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        """
+        ?kind=csv|ndjson[&changed_since=<ISO date or datetime>]  -> the whole catalog, streamed
+
+        The list filters apply. Rows carry their category paths and are ordered
+        by id. X-Next-Changed-Since is the changed_since to pass next time; rows
+        may repeat across exports, so consumers should upsert by id. Category
+        relinks, renames, moves and deletions count as changes to the products
+        under them. Deletions are not reported, nor are stock-only changes of
+        sharded products (their rows carry live stock when exported).
+        """
+        kind = request.query_params.get("kind", "csv")
+        if kind not in EXPORT_FORMATS:
+            return Response({"detail": f"kind must be one of: {', '.join(EXPORT_FORMATS)}"}, status=400)
+        changed_since = None
+        raw = request.query_params.get("changed_since")
+        if raw:
+            try:
+                changed_since = parse_datetime(raw) or datetime.combine(parse_date(raw), datetime.min.time())
+            except (TypeError, ValueError):
+                return Response({"detail": "changed_since must be an ISO 8601 date or datetime"}, status=400)
+            if timezone.is_naive(changed_since):
+                changed_since = timezone.make_aware(changed_since)
+
+        started = timezone.now()
+        render, content_type = EXPORT_FORMATS[kind]
+        rows = export_rows(self.filter_queryset(Product.objects.all()), changed_since)
+        response = StreamingHttpResponse(render(rows), content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="products.{kind}"'
+        response["X-Next-Changed-Since"] = (started - self.EXPORT_OVERLAP).isoformat()
+        return response
+
+    @action(detail=False, methods=["get"], url_path="cache-stats", permission_classes=[permissions.IsAdminUser])
+    def cache_stats(self, request):
+        """Hit/miss totals of the serialized product fragment cache."""
+        return Response(fragments.stats())
+
+    @action(detail=False, methods=["get"])
+    def search(self, request):
+        """
+        ?q=<text>[&page_size=<n>][&cursor=<c>]  -> products ranked by full-text relevance
+
+        Served from the full-text index (core.search); pages continue from the
+        (score, id) of the previous page's last hit.
+        """
+        text = request.query_params.get("q", "").strip()
+        if not text:
+            return Response({"detail": "q is required"}, status=400)
+        paginator = KeysetPagination()
+        page_size = paginator.get_page_size(request)
+        after = None
+        if request.query_params.get("cursor"):
+            try:
+                score, last_id = decode_cursor(request.query_params["cursor"])
+                after = (float(score), int(last_id))
+            except (TypeError, ValueError):
+                return Response({"detail": paginator.invalid_cursor_message}, status=404)
+
+        hits = search_product_ids(text, page_size + 1, after=after)
+        has_more = len(hits) > page_size
+        hits = hits[:page_size]
+        products = Product.objects.in_bulk([pid for pid, _ in hits])
+        # Index entries of deleted products are dropped from the page, but the
+        # cursor still continues from the last hit read, so no page repeats.
+        found = [(pid, score) for pid, score in hits if pid in products]
+        rows = self.get_serializer([products[pid] for pid, _ in found], many=True).data
+        results = [dict(row, score=score) for row, (_, score) in zip(rows, found)]
+        next_link = None
+        if has_more:
+            last_id, last_score = hits[-1]
+            next_link = cursor_link(request, encode_cursor([last_score, last_id]))
+        return Response({"next": next_link, "results": results})
 
-class OrderViewSet(viewsets.ModelViewSet):
-    queryset = Order.objects.all().select_related("customer")
+
+class OrderViewSet(SparseFieldsMixin, viewsets.ModelViewSet):
+    """
+    GET /orders/       -> the customer's own orders (every order for staff)
+    GET /orders/mine/  -> the authenticated customer's orders, for staff too
+    Both newest first, keyset-paginated ([?cursor=...][&page_size=<n>]) and honour ?fields=.
+    """
+    queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated, IsCustomer]
+    pagination_class = KeysetPagination
+    # Backed by order_created_id_idx, and by order_customer_created_idx once scoped to a customer.
+    keyset_ordering = ("-created_at", "-id")
+    sparse_actions = ("list", "retrieve", "mine")
+    values_fields = {
+        name: name for name in ("id", "customer", "created_at", "status", "total_amount", "item_count")
+    }
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == "mine" or not self.request.user.is_staff:
+            queryset = queryset.filter(customer=getattr(self.request.user, "customer_profile", None))
+        fields = self.get_requested_fields()
+        if fields is None or "items" in fields:
+            # One query for the items of the whole page, however many orders it holds.
+            queryset = queryset.prefetch_related(Prefetch("items", queryset=OrderItem.objects.order_by("id")))
+        return queryset
+
+    def create(self, request, *args, **kwargs):
+        """
+        POST /orders/ with an optional ``Idempotency-Key`` header (see core/orders.py):
+        a retried key gets the first response back, marked ``Idempotent-Replayed: true``.
+        """
+        key = request.headers.get("Idempotency-Key")
+        if key is None:
+            return super().create(request, *args, **kwargs)
+        if not 0 < len(key) <= IdempotencyKey._meta.get_field("key").max_length:
+            raise ValidationError({"Idempotency-Key": "must be 1 to 255 characters"})
+        fingerprint = request_fingerprint(request.data)
+        try:
+            stored = IdempotencyKey.objects.get(user=request.user, key=key)
+        except IdempotencyKey.DoesNotExist:
+            try:
+                with transaction.atomic():
+                    response = super().create(request, *args, **kwargs)
+                    IdempotencyKey.objects.create(
+                        user=request.user, key=key, fingerprint=fingerprint, order_id=response.data["id"],
+                        status_code=response.status_code, response=response.data,
+                    )
+                return response
+            except IntegrityError:
+                # A concurrent request with this key committed first: its order
+                # stands and this one was rolled back.
+                stored = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+                if stored is None:
+                    raise
+        if stored.fingerprint != fingerprint:
+            return Response(
+                {"detail": "This Idempotency-Key was already used for a different request."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        return Response(stored.response, status=stored.status_code, headers={"Idempotent-Replayed": "true"})
 
     def perform_create(self, serializer):
-        # Always bind to the authenticated user's customer profile
-        customer = Customer.objects.get(user=self.request.user)
-        serializer.save(customer=customer)
+        # Always bind to the authenticated user's customer profile (loaded by IsCustomer)
+        serializer.save(customer=self.request.user.customer_profile)
+
+    @action(detail=False, methods=["get"])
+    def mine(self, request):
+        # Totals and item counts are stored on the order: a page is one range
+        # scan of the customer's index entries (plus the items prefetch).
+        return self.list(request)
+
+class ImportJobViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.ListModelMixin,
+                       viewsets.GenericViewSet):
+    """
+    POST /imports/  multipart ``file`` (CSV: name, price, category_path[, description, stock_quantity])
+                    or a JSON array of products with ``category_path`` lists
+                    [&upsert=true][&chunk_size=<n>]  -> 202 with the queued job
+    GET  /imports/{id}/  -> status and progress, updated after every committed chunk
+    """
+    queryset = ImportJob.objects.order_by("-id")
+    serializer_class = ImportJobSerializer
+    permission_classes = [permissions.IsAdminUser]
+    MAX_CHUNK_SIZE = 10_000
+
+    def create(self, request, *args, **kwargs):
+        upsert = str(self._option(request, "upsert", "")).lower() in ("1", "true")
+        try:
+            chunk_size = int(self._option(request, "chunk_size", 1000))
+        except (TypeError, ValueError):
+            return Response({"detail": "chunk_size must be an integer"}, status=400)
+        if not 1 <= chunk_size <= self.MAX_CHUNK_SIZE:
+            return Response({"detail": f"chunk_size must be between 1 and {self.MAX_CHUNK_SIZE}"}, status=400)
+
+        options = {"user": request.user, "upsert": upsert, "chunk_size": chunk_size}
+        if isinstance(request.data, list):
+            job = create_json_import_job(request.data, **options)
+        elif request.data.get("file"):
+            job = create_import_job(request.data["file"], ImportJob.KIND_CSV, **options)
+        else:
+            return Response({"detail": "Send a CSV 'file' or a JSON array."}, status=400)
+        data = self.get_serializer(job).data
+        return Response(data, status=status.HTTP_202_ACCEPTED, headers={"Location": f"{request.path.rstrip('/')}/{job.id}/"})
+
+    @staticmethod
+    def _option(request, name, default):
+        """Form field for multipart uploads, query parameter otherwise."""
+        if not isinstance(request.data, list) and name in request.data:
+            return request.data[name]
+        return request.query_params.get(name, default)
+
+    @action(detail=True, methods=["post"])
+    def resume(self, request, pk=None):
+        """Re-queue a failed job from its last committed chunk."""
+        job = self.get_object()
+        if not resume(job):
+            return Response({"detail": f"only failed jobs can be resumed (status: {job.status})"}, status=409)
+        job.refresh_from_db()
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
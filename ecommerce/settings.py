@@ -83,6 +83,20 @@ DATABASES = {
     }
 }
 
+# ---------------------------
+# Cache (shared by every worker)
+# ---------------------------
+# Generation counters, the category tree snapshot, product fragments and the
+# sharded-product set live here: a per-process cache would let one worker's
+# writes go unseen by the others. Without CACHE_URL a local-memory cache is
+# used, which only suits a single development or test process; with DEBUG off
+# core.E001 requires CACHE_URL to name a shared cache (e.g. redis://redis:6379/1).
+CACHE_URL = os.getenv("CACHE_URL", "locmem://")
+if CACHE_URL.startswith("locmem://"):
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+else:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": CACHE_URL}}
+
 # ---------------------------
 # Authentication / OIDC
 # ---------------------------
@@ -152,6 +166,13 @@ EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER", "your-email@gmail.com")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD", "your-email-password")
 DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "ECommerce <no-reply@example.com>")
 
+# ---------------------------
+# Order notifications (core.signals.handle_order_placed)
+# ---------------------------
+AFRICASTALKING_USERNAME = os.getenv("AFRICASTALKING_USERNAME", "sandbox")
+AFRICASTALKING_API_KEY = os.getenv("AFRICASTALKING_API_KEY", "")
+ADMIN_NOTIFICATION_EMAIL = os.getenv("ADMIN_NOTIFICATION_EMAIL", EMAIL_HOST_USER)
+
 # ---------------------------
 # Twilio SMS Settings
 # ---------------------------
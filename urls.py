@@ -1,11 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CategoryViewSet, ProductViewSet, OrderViewSet
+from .views import CategoryViewSet, ImportJobViewSet, ProductViewSet, OrderViewSet
 
 router = DefaultRouter()
 router.register(r"categories", CategoryViewSet, basename="category")
 router.register(r"products", ProductViewSet, basename="product")
 router.register(r"orders", OrderViewSet, basename="order")
+router.register(r"imports", ImportJobViewSet, basename="import")
 
 urlpatterns = [
     path("admin/", admin.site.urls),